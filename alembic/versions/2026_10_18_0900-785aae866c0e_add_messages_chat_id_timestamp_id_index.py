@@ -0,0 +1,41 @@
+"""Add composite (chat_id, timestamp, id) index to messages for keyset pagination
+
+Revision ID: 785aae866c0e
+Revises: c56f3c074774
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '785aae866c0e'
+down_revision: Union[str, None] = 'c56f3c074774'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_chat_id_timestamp_id',
+            'messages',
+            ['chat_id', 'timestamp', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_chat_id_timestamp_id',
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
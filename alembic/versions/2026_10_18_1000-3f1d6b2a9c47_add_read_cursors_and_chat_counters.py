@@ -0,0 +1,75 @@
+"""Add read cursors and chat message counters, drop messages.is_read
+
+Revision ID: 3f1d6b2a9c47
+Revises: 785aae866c0e
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1d6b2a9c47'
+down_revision: Union[str, None] = '785aae866c0e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('chats', sa.Column('message_count', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('chats', sa.Column('last_message_id', sa.UUID(), nullable=True))
+    op.execute(
+        """
+        UPDATE chats
+        SET message_count = stats.message_count, last_message_id = stats.last_message_id
+        FROM (
+            SELECT DISTINCT ON (chat_id)
+                chat_id,
+                count(*) OVER (PARTITION BY chat_id) AS message_count,
+                id AS last_message_id
+            FROM messages
+            ORDER BY chat_id, timestamp DESC, id DESC
+        ) AS stats
+        WHERE chats.id = stats.chat_id
+        """,
+    )
+
+    op.create_table(
+        'read_cursors',
+        sa.Column('user_id', sa.UUID(), nullable=False),
+        sa.Column('chat_id', sa.UUID(), nullable=False),
+        sa.Column('last_read_message_id', sa.UUID(), nullable=True),
+        sa.Column('last_read_count', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], name=op.f('fk_read_cursors_chat_id_chats')),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_read_cursors_user_id_users')),
+        sa.PrimaryKeyConstraint('user_id', 'chat_id', name=op.f('pk_read_cursors')),
+    )
+    # Existing history counts as read for current members.
+    op.execute(
+        """
+        INSERT INTO read_cursors (user_id, chat_id, last_read_message_id, last_read_count)
+        SELECT DISTINCT group_users.user_id, chats.id, chats.last_message_id, chats.message_count
+        FROM chats
+        JOIN group_users ON group_users.group_id = chats.group_id
+        WHERE group_users.user_id IS NOT NULL
+        """,
+    )
+
+    op.create_index('ix_group_users_user_id', 'group_users', ['user_id'], unique=False)
+    op.drop_column('messages', 'is_read')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('messages', sa.Column('is_read', sa.Boolean(), nullable=True))
+    op.drop_index('ix_group_users_user_id', table_name='group_users')
+    op.drop_table('read_cursors')
+    op.drop_column('chats', 'last_message_id')
+    op.drop_column('chats', 'message_count')
@@ -0,0 +1,57 @@
+"""Replace the btree index on messages.text with a generated tsvector column and a GIN index
+
+Revision ID: a8e42c1d5b90
+Revises: 3f1d6b2a9c47
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e42c1d5b90'
+down_revision: Union[str, None] = '3f1d6b2a9c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index(op.f('ix_messages_text'), table_name='messages')
+    # Adding a stored generated column rewrites the table under an exclusive lock.
+    op.add_column(
+        'messages',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', text)", persisted=True),
+            nullable=False,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_search_vector',
+            'messages',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_messages_search_vector',
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
+    op.drop_column('messages', 'search_vector')
+    op.create_index(op.f('ix_messages_text'), 'messages', ['text'], unique=False)
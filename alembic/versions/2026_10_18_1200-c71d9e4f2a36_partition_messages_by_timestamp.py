@@ -0,0 +1,123 @@
+"""Turn messages into a table range-partitioned by month on timestamp
+
+Revision ID: c71d9e4f2a36
+Revises: a8e42c1d5b90
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d9e4f2a36'
+down_revision: Union[str, None] = 'a8e42c1d5b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def _rename_old_table(old: str, new: str) -> None:
+    op.rename_table(old, new)
+    op.execute(f'ALTER TABLE {new} RENAME CONSTRAINT pk_{old} TO pk_{new}')
+    for index in ('ix_messages_id', 'ix_messages_chat_id_timestamp_id', 'ix_messages_search_vector'):
+        op.execute(f'ALTER INDEX {index} RENAME TO {index}_{new}')
+
+
+def _messages_columns() -> list:
+    return [
+        sa.Column('id', sa.UUID(), server_default=sa.text('uuid_generate_v4()'), nullable=False),
+        sa.Column('chat_id', sa.UUID(), nullable=False),
+        sa.Column('sender_id', sa.UUID(), nullable=False),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', text)", persisted=True),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(['chat_id'], ['chats.id'], name=op.f('fk_messages_chat_id_chats')),
+        sa.ForeignKeyConstraint(['sender_id'], ['users.id'], name=op.f('fk_messages_sender_id_users')),
+    ]
+
+
+def _create_messages_indexes() -> None:
+    op.create_index(op.f('ix_messages_id'), 'messages', ['id'], unique=False)
+    op.create_index('ix_messages_chat_id_timestamp_id', 'messages', ['chat_id', 'timestamp', 'id'], unique=False)
+    op.create_index(
+        'ix_messages_search_vector', 'messages', ['search_vector'], unique=False, postgresql_using='gin',
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rename_old_table('messages', 'messages_unpartitioned')
+
+    op.create_table(
+        'messages',
+        *_messages_columns(),
+        sa.PrimaryKeyConstraint('id', 'timestamp', name=op.f('pk_messages')),
+        postgresql_partition_by='RANGE (timestamp)',
+    )
+    _create_messages_indexes()
+
+    # One partition per month from the oldest message up to MONTHS_AHEAD
+    # months from now; the default partition only catches rows the
+    # maintenance job did not create a partition for in time. Bounds are
+    # whole months in UTC, as the maintenance command creates them.
+    op.execute("SET LOCAL timezone = 'UTC'")
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            bound timestamptz := date_trunc(
+                'month', coalesce((SELECT min(timestamp) FROM messages_unpartitioned), now())
+            );
+        BEGIN
+            WHILE bound <= date_trunc('month', now()) + interval '{MONTHS_AHEAD} months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_' || to_char(bound, '"y"YYYY"m"MM'), bound, bound + interval '1 month'
+                );
+                bound := bound + interval '1 month';
+            END LOOP;
+        END
+        $$
+        """,
+    )
+    op.execute('CREATE TABLE messages_default PARTITION OF messages DEFAULT')
+
+    op.execute(
+        """
+        INSERT INTO messages (id, chat_id, sender_id, text, timestamp)
+        SELECT id, chat_id, sender_id, text, timestamp FROM messages_unpartitioned
+        """,
+    )
+    op.drop_table('messages_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rename_old_table('messages', 'messages_partitioned')
+
+    op.create_table(
+        'messages',
+        *_messages_columns(),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_messages')),
+    )
+    op.execute(
+        """
+        INSERT INTO messages (id, chat_id, sender_id, text, timestamp)
+        SELECT id, chat_id, sender_id, text, timestamp FROM messages_partitioned
+        """,
+    )
+    _create_messages_indexes()
+    # Dropping the parent drops every attached partition; detached ones are left alone.
+    op.drop_table('messages_partitioned')
@@ -0,0 +1,41 @@
+"""Index group_users by group_id for member lookups
+
+Revision ID: 5b3e8f1c7d24
+Revises: c71d9e4f2a36
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b3e8f1c7d24'
+down_revision: Union[str, None] = 'c71d9e4f2a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_group_users_group_id',
+            'group_users',
+            ['group_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_group_users_group_id',
+            table_name='group_users',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,47 @@
+"""Add per-chat sequence numbers to messages
+
+Revision ID: e24a7b9d6f18
+Revises: 5b3e8f1c7d24
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e24a7b9d6f18'
+down_revision: Union[str, None] = '5b3e8f1c7d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('messages', sa.Column('seq', sa.BigInteger(), nullable=True))
+    # Numbering in (timestamp, id) order keeps the existing read cursors and
+    # chat counters valid: the n-th message of a chat gets seq n.
+    op.execute(
+        """
+        UPDATE messages
+        SET seq = numbered.seq
+        FROM (
+            SELECT id, timestamp, row_number() OVER (PARTITION BY chat_id ORDER BY timestamp, id) AS seq
+            FROM messages
+        ) AS numbered
+        WHERE messages.id = numbered.id AND messages.timestamp = numbered.timestamp
+        """,
+    )
+    op.alter_column('messages', 'seq', nullable=False)
+    # Partitioned tables cannot build indexes concurrently.
+    op.create_index('ix_messages_chat_id_seq', 'messages', ['chat_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_messages_chat_id_seq', table_name='messages')
+    op.drop_column('messages', 'seq')
@@ -0,0 +1,46 @@
+"""Add the id map and checkpoint tables of the bulk importer
+
+Revision ID: 9d6c2e5a4b71
+Revises: e24a7b9d6f18
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Union
+from collections.abc import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d6c2e5a4b71'
+down_revision: Union[str, None] = 'e24a7b9d6f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'import_id_map',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('legacy_id', sa.String(), nullable=False),
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'kind', 'legacy_id', name=op.f('pk_import_id_map')),
+    )
+    op.create_table(
+        'import_checkpoints',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('position', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('rows', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('source', name=op.f('pk_import_checkpoints')),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('import_checkpoints')
+    op.drop_table('import_id_map')
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of WebSocket frame codecs.
+
+Compares encode and decode time per frame of the stdlib json module, which
+the endpoint used before, with the orjson and msgpack codecs for new_message
+frames of growing text size.
+
+Usage:
+    python -m benchmarks.codec_bench [--iterations N]
+"""
+import argparse
+import datetime
+import json
+import timeit
+import uuid
+
+from src.managers.codecs import CODECS
+
+TEXT_SIZES = (16, 256, 4096, 65536)
+
+
+def make_frame(text_size: int) -> dict:
+    return {
+        'type': 'new_message',
+        'payload': {
+            'id': uuid.uuid4(),
+            'chat_id': uuid.uuid4(),
+            'sender_id': uuid.uuid4(),
+            'text': 'x' * text_size,
+            'timestamp': datetime.datetime.now(datetime.UTC),
+        },
+    }
+
+
+def stdlib_encode(frame: dict) -> str:
+    return json.dumps(frame, default=str)
+
+
+def measure(func, arg, iterations: int) -> float:
+    return min(timeit.repeat(lambda: func(arg), number=iterations, repeat=3)) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10000)
+    args = parser.parse_args()
+
+    codecs = [('stdlib-json', stdlib_encode, json.loads)]
+    codecs += [(name, codec.encode, codec.decode) for name, codec in CODECS.items()]
+
+    print(f'{"codec":<18} {"text":>7} {"frame":>7} {"encode us":>10} {"decode us":>10}')
+    for text_size in TEXT_SIZES:
+        frame = make_frame(text_size)
+        for name, encode, decode in codecs:
+            encoded = encode(frame)
+            encode_us = measure(encode, frame, args.iterations)
+            decode_us = measure(decode, encoded, args.iterations)
+            print(f'{name:<18} {text_size:>7} {len(encoded):>7} {encode_us:>10.2f} {decode_us:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
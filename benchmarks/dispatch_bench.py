@@ -0,0 +1,122 @@
+"""
+Micro-benchmark of decoding and validating a new_message frame.
+
+Compares, per message, the path before the schema registry with the
+current one:
+
+- before: orjson.loads into a dict, UUID conversion of the arguments,
+  MessageCreate(**payload) and a row dict built from the model; entities
+  went through model_dump, jsonable_encoder and Model(**dto);
+- now: one validate_json of the frame against the registered tagged union
+  and a row dict or ORM object built from the validated payload.
+
+Reports microseconds per message and the peak memory allocated while
+handling one message, for growing text sizes.
+
+Usage:
+    python -m benchmarks.dispatch_bench [--iterations N]
+"""
+import argparse
+import datetime
+import timeit
+import tracemalloc
+import uuid
+from typing import Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from src.managers.codecs import json_codec
+from src.managers.websocket_manager import WebSocketConnectionManager
+from src.models.entity import Message
+from src.schemas.actions import EmptyPayload, NewMessagePayload
+from src.schemas.entity import MessageCreate
+
+TEXT_SIZES = (16, 256, 4096)
+
+manager = WebSocketConnectionManager()
+
+
+@manager.handler('new_message')
+async def new_message(payload: NewMessagePayload, user_id: uuid.UUID, db=None):
+    pass
+
+
+# A second action makes the frame a tagged union, as on the server.
+@manager.handler('user_connected')
+async def user_connected(payload: EmptyPayload, user_id: uuid.UUID, db=None):
+    pass
+
+
+def make_frame(text_size: int) -> bytes:
+    return orjson.dumps({'type': 'new_message', 'payload': {'chat_id': str(uuid.uuid4()), 'text': 'x' * text_size}})
+
+
+def row(chat_id: uuid.UUID, sender_id: uuid.UUID, text: str) -> dict:
+    return {
+        'id': uuid.uuid4(),
+        'chat_id': chat_id,
+        'sender_id': sender_id,
+        'text': text,
+        'timestamp': datetime.datetime.now(datetime.UTC),
+    }
+
+
+def before(raw: bytes, user_id: uuid.UUID) -> dict:
+    data = orjson.loads(raw)
+    payload = data.get('payload') or {}
+    for name in ('chat_id', 'sender_id'):
+        if isinstance(payload.get(name), str):
+            payload[name] = uuid.UUID(payload[name])
+    message = MessageCreate(chat_id=payload['chat_id'], sender_id=user_id, text=payload['text'])
+    return row(message.chat_id, message.sender_id, message.text)
+
+
+def now(raw: bytes, user_id: uuid.UUID) -> dict:
+    _, payload = manager.decode_frame(raw, json_codec)
+    return row(payload.chat_id, user_id, payload.text)
+
+
+def before_orm(raw: bytes, user_id: uuid.UUID) -> Message:
+    data = orjson.loads(raw)['payload']
+    dto = jsonable_encoder(MessageCreate(chat_id=data['chat_id'], sender_id=user_id, text=data['text']).model_dump())
+    return Message(**dto)
+
+
+def now_orm(raw: bytes, user_id: uuid.UUID) -> Message:
+    _, payload = manager.decode_frame(raw, json_codec)
+    return Message(chat_id=payload.chat_id, sender_id=user_id, text=payload.text)
+
+
+def peak_bytes(func, raw: bytes, user_id: uuid.UUID) -> int:
+    func(raw, user_id)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func(raw, user_id)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(func, raw: bytes, user_id: uuid.UUID, iterations: int) -> float:
+    return min(timeit.repeat(lambda: func(raw, user_id), number=iterations, repeat=3)) / iterations * 1e6
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    user_id = uuid.uuid4()
+    cases = (('before, row', before), ('now, row', now), ('before, ORM', before_orm), ('now, ORM', now_orm))
+    print(f'{"text bytes":>10} {"case":<12} {"us/msg":>8} {"peak bytes":>11}')
+    for size in TEXT_SIZES:
+        raw = make_frame(size)
+        for name, func in cases:
+            latency = measure(func, raw, user_id, args.iterations)
+            print(f'{size:>10} {name:<12} {latency:>8.2f} {peak_bytes(func, raw, user_id):>11}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Load generator for the chat server.
+
+Signs up and signs in --clients users, connects them to /api/v1/ws, puts them
+into group chats of --room-size members and sends new_message frames at
+--rate messages per second in total for --duration seconds. Every client
+records when each message reaches it, which gives the end-to-end fan-out
+latency. Server CPU time is read from /metrics before and after the run.
+
+The report is written as JSON to --output (stdout by default) so runs can be
+compared between releases.
+
+With --spawn the harness starts its own server on --port with the in-memory
+broker; Postgres and Redis from .env (or docker-compose.dev.yml) are still
+needed for users, chats, messages and tokens.
+
+Usage:
+    python -m benchmarks.load --clients 100 --room-size 10 --rate 500 --duration 30
+    python -m benchmarks.load --spawn --clients 20 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is an optional dependency
+    msgpack = None
+
+ROOT = Path(__file__).resolve().parent.parent
+PASSWORD = 'bench-password'
+
+
+def percentile(values: list[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': percentile(latencies, 0.50),
+        'p90_ms': percentile(latencies, 0.90),
+        'p99_ms': percentile(latencies, 0.99),
+        'p999_ms': percentile(latencies, 0.999),
+        'max_ms': latencies[-1] if latencies else None,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else None,
+    }
+
+
+class BenchClient:
+    """
+    One simulated user with its own WebSocket.
+    """
+
+    def __init__(self, index: int, user_id: str, token: str, codec: str) -> None:
+        self.index = index
+        self.user_id = user_id
+        self.token = token
+        self.codec = codec
+        self.ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self.acks: dict[str, asyncio.Future] = {}
+        self.reader: Optional[asyncio.Task] = None
+        self.errors: list[str] = []
+
+    async def connect(self, session: aiohttp.ClientSession, ws_url: str) -> None:
+        protocols = (f'chat.v1.{self.codec}',)
+        self.ws = await session.ws_connect(f'{ws_url}?token={self.token}', protocols=protocols, max_msg_size=0)
+
+    def encode(self, frame: dict):
+        if self.codec == 'msgpack':
+            return msgpack.packb(frame)
+        return orjson.dumps(frame).decode()
+
+    async def send(self, frame: dict) -> None:
+        data = self.encode(frame)
+        if isinstance(data, bytes):
+            await self.ws.send_bytes(data)
+        else:
+            await self.ws.send_str(data)
+
+    async def request(self, action: str, payload: dict, timeout: float = 10) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        self.acks.setdefault(action, future)
+        if self.acks[action] is not future:
+            raise RuntimeError(f'Concurrent {action} requests on one client')
+        try:
+            await self.send({'type': action, 'payload': payload})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.acks.pop(action, None)
+
+
+class LoadRun:
+    """
+    State and results of one benchmark run.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.base_url = args.url.rstrip('/')
+        self.ws_url = self.base_url.replace('http', 'ws', 1) + '/api/v1/ws'
+        self.run_id = uuid.uuid4().hex[:8]
+        self.clients: list[BenchClient] = []
+        self.rooms: list[tuple[str, list[BenchClient]]] = []
+        self.sent: dict[str, float] = {}
+        self.sent_to: dict[str, int] = {}
+        self.delivery_latencies: list[float] = []
+        self.ack_latencies: list[float] = []
+        self.deliveries = 0
+        self.errors = 0
+
+    async def register(self, session: aiohttp.ClientSession, index: int) -> BenchClient:
+        name = f'bench_{self.run_id}_{index}'
+        async with session.post(
+            f'{self.base_url}/api/v1/auth/signup',
+            json={'name': name, 'email': f'{name}@bench.local', 'password': PASSWORD},
+        ) as response:
+            response.raise_for_status()
+            user = await response.json()
+        async with session.post(
+            f'{self.base_url}/api/v1/auth/signin', data={'username': name, 'password': PASSWORD},
+        ) as response:
+            response.raise_for_status()
+            tokens = await response.json()
+        return BenchClient(index, user['id'], tokens['access_token'], self.args.codec)
+
+    async def read(self, client: BenchClient) -> None:
+        async for message in client.ws:
+            received = time.perf_counter()
+            if message.type == aiohttp.WSMsgType.BINARY:
+                frame = msgpack.unpackb(message.data)
+            elif message.type == aiohttp.WSMsgType.TEXT:
+                frame = orjson.loads(message.data)
+            else:
+                break
+            kind = frame.get('type')
+            if kind == 'new_message':
+                started = self.sent.get(frame['payload']['text'])
+                if started is not None:
+                    self.deliveries += 1
+                    self.delivery_latencies.append((received - started) * 1000)
+            elif kind == 'ack':
+                future = client.acks.get(frame.get('action'))
+                if future is not None and not future.done():
+                    future.set_result(frame.get('payload'))
+            elif kind == 'error':
+                self.errors += 1
+                client.errors.append(frame.get('error', ''))
+                future = client.acks.get(frame.get('action'))
+                if future is not None and not future.done():
+                    future.set_exception(RuntimeError(frame.get('error')))
+
+    async def create_rooms(self) -> None:
+        size = self.args.room_size
+        for start in range(0, len(self.clients), size):
+            members = self.clients[start:start + size]
+            owner = members[0]
+            created = await owner.request(
+                'create_group_chat',
+                {'chat_title': f'bench {self.run_id} {start}', 'group_title': f'bench {self.run_id} {start}'},
+            )
+            for member in members[1:]:
+                await owner.request('add_user_to_group', {'group_id': created['group_id'], 'member_id': member.user_id})
+            self.rooms.append((str(created['chat_id']), members))
+
+    async def send_loop(self, client: BenchClient, chat_id: str, room_size: int, interval: float, deadline: float):
+        loop = asyncio.get_running_loop()
+        next_send = loop.time() + interval * client.index / len(self.clients)
+        sequence = 0
+        while True:
+            delay = next_send - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if loop.time() >= deadline:
+                return
+            text = f'{self.run_id}:{client.index}:{sequence}'
+            sequence += 1
+            self.sent[text] = time.perf_counter()
+            self.sent_to[text] = room_size
+            started = time.perf_counter()
+            try:
+                await client.request('new_message', {'chat_id': chat_id, 'text': text})
+                self.ack_latencies.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                self.errors += 1
+                client.errors.append(str(e))
+            next_send += interval
+
+    async def scrape(self, session: aiohttp.ClientSession) -> dict[str, float]:
+        wanted = ('process_cpu_seconds_total', 'chat_ws_frames_sent_total', 'chat_ws_frames_dropped_total')
+        try:
+            async with session.get(f'{self.base_url}/metrics') as response:
+                text = await response.text()
+        except aiohttp.ClientError:
+            return {}
+        values = {}
+        for line in text.splitlines():
+            name, _, value = line.partition(' ')
+            if name in wanted:
+                values[name] = float(value)
+        return values
+
+    async def run(self) -> dict:
+        args = self.args
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def setup(index: int) -> BenchClient:
+                async with semaphore:
+                    client = await self.register(session, index)
+                    await client.connect(session, self.ws_url)
+                    client.reader = asyncio.create_task(self.read(client))
+                    return client
+
+            setup_started = time.perf_counter()
+            self.clients = list(await asyncio.gather(*(setup(index) for index in range(args.clients))))
+            await self.create_rooms()
+            setup_seconds = time.perf_counter() - setup_started
+            await asyncio.sleep(args.settle)
+
+            before = await self.scrape(session)
+            interval = len(self.clients) / args.rate
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + args.duration
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self.send_loop(client, chat_id, len(members), interval, deadline)
+                for chat_id, members in self.rooms
+                for client in members
+            ))
+            send_seconds = time.perf_counter() - started
+            await asyncio.sleep(args.drain)
+            elapsed = time.perf_counter() - started
+            after = await self.scrape(session)
+
+            for client in self.clients:
+                await client.ws.close()
+                client.reader.cancel()
+
+        sent = len(self.sent)
+        expected = sum(self.sent_to.values())
+        cpu_seconds = after.get('process_cpu_seconds_total', 0) - before.get('process_cpu_seconds_total', 0)
+        return {
+            'run_id': self.run_id,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'config': {key: value for key, value in vars(args).items() if key != 'output'},
+            'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+            'setup_seconds': setup_seconds,
+            'messages': {
+                'sent': sent,
+                'acked': len(self.ack_latencies),
+                'errors': self.errors,
+                'per_second': len(self.ack_latencies) / send_seconds if send_seconds else 0,
+            },
+            'deliveries': {
+                'expected': expected,
+                'received': self.deliveries,
+                'lost': expected - self.deliveries,
+                'per_second': self.deliveries / elapsed if elapsed else 0,
+            },
+            'fanout_latency': summarize(self.delivery_latencies),
+            'ack_latency': summarize(self.ack_latencies),
+            'server': {
+                'cpu_seconds': cpu_seconds if before else None,
+                'cpu_ms_per_message': cpu_seconds * 1000 / sent if before and sent else None,
+                'frames_sent': (
+                    after.get('chat_ws_frames_sent_total', 0) - before.get('chat_ws_frames_sent_total', 0)
+                    if before else None
+                ),
+                'frames_dropped': (
+                    after.get('chat_ws_frames_dropped_total', 0) - before.get('chat_ws_frames_dropped_total', 0)
+                    if before else None
+                ),
+            },
+            'sample_errors': [error for client in self.clients for error in client.errors][:20],
+        }
+
+
+async def wait_for_server(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f'{url}/health') as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'Server at {url} did not become healthy')
+            await asyncio.sleep(0.2)
+
+
+def spawn_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'PYTHONPATH': str(ROOT),
+        'broker__backend': 'memory',
+        'history_cache__redis_enabled': 'false',
+    }
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=ROOT / 'src',
+        env=env,
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--room-size', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=200, help='messages per second over all clients')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--codec', choices=('json', 'msgpack'), default='json')
+    parser.add_argument('--concurrency', type=int, default=20, help='parallel signups and connects')
+    parser.add_argument('--settle', type=float, default=1, help='pause between setup and sending, in seconds')
+    parser.add_argument('--drain', type=float, default=2, help='wait for late deliveries, in seconds')
+    parser.add_argument('--spawn', action='store_true', help='start a server with the in-memory broker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+    if args.codec == 'msgpack' and msgpack is None:
+        parser.error('msgpack is not installed')
+
+    server = None
+    if args.spawn:
+        args.url = f'http://127.0.0.1:{args.port}'
+        server = spawn_server(args.port)
+    try:
+        await wait_for_server(args.url.rstrip('/'), timeout=30)
+        report = await LoadRun(args).run()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark of logging on the WebSocket hot path.
+
+Measures the cost a logging call adds to the caller, which on the server is
+the event loop, for a record of a new_message frame:
+
+- logging off (the record's level is disabled);
+- a synchronous StreamHandler, text and JSON;
+- the queue pipeline, text and JSON, where formatting and writing happen
+  on the listener thread;
+- the queue pipeline with 1% sampling.
+
+Records are written to /dev/null so the numbers do not depend on a terminal.
+
+Usage:
+    python -m benchmarks.logging_bench [--iterations N]
+"""
+import argparse
+import logging
+import os
+import time
+import uuid
+
+from src.core.logger import LOG_FORMAT, JsonFormatter, LogPipeline
+
+ROOT = logging.getLogger()
+
+
+def measure(logger: logging.Logger, iterations: int) -> float:
+    chat_id = uuid.uuid4()
+    started = time.perf_counter()
+    for index in range(iterations):
+        logger.info(f'New message created {chat_id=} {index=}')
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run(name: str, formatter: logging.Formatter, iterations: int, queued: bool, sampling: float = 1.0) -> None:
+    stream = open(os.devnull, 'w')
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(formatter)
+    for existing in list(ROOT.handlers):
+        ROOT.removeHandler(existing)
+    ROOT.addHandler(handler)
+    ROOT.setLevel(logging.INFO)
+
+    pipeline = LogPipeline()
+    if queued:
+        pipeline.install(queue_size=iterations, sampling={'bench': sampling}, rate_limits={})
+    logger = logging.getLogger('bench')
+    caller_us = measure(logger, iterations)
+    started = time.perf_counter()
+    pipeline.stop()
+    drain_us = (time.perf_counter() - started) / iterations * 1e6
+    print(f'{name:<24} {caller_us:>9.3f} {caller_us + drain_us:>9.3f} {1e6 / caller_us:>12.0f}')
+
+    for existing in list(ROOT.handlers):
+        ROOT.removeHandler(existing)
+    stream.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    text = logging.Formatter(LOG_FORMAT)
+    print(f'{"case":<24} {"us/call":>9} {"us/total":>9} {"calls/s":>12}')
+    ROOT.setLevel(logging.WARNING)
+    print(f'{"off":<24} {measure(logging.getLogger("bench"), args.iterations):>9.3f}')
+    run('sync text', text, args.iterations, queued=False)
+    run('sync json', JsonFormatter(), args.iterations, queued=False)
+    run('queue text', text, args.iterations, queued=True)
+    run('queue json', JsonFormatter(), args.iterations, queued=True)
+    run('queue json, 1% sampled', JsonFormatter(), args.iterations, queued=True, sampling=0.01)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of the WebSocket rate limiters.
+
+Measures the per-frame cost of the in-process token bucket for an action
+with its own limit, for an action falling back to the '*' limit and for a
+rejected call. With --redis-url it also measures the round trip of the
+cluster-wide sliding window, which is only paid by actions that have a
+per-user limit.
+
+Usage:
+    python -m benchmarks.rate_limit_bench [--iterations N] [--redis-url redis://localhost:6379]
+"""
+import argparse
+import asyncio
+import time
+import timeit
+import uuid
+
+from src.managers.rate_limit import ConnectionRateLimiter, SlidingWindowLimiter
+
+
+def measure(func, iterations: int) -> float:
+    return min(timeit.repeat(func, number=iterations, repeat=5)) / iterations * 1e6
+
+
+async def measure_redis(redis_url: str, iterations: int) -> float:
+    from redis.asyncio import Redis
+
+    client = Redis.from_url(redis_url)
+    limiter = SlidingWindowLimiter(client, {'new_message': (iterations * 2, 60)}, key_prefix='rate_bench')
+    user_id = uuid.uuid4()
+    try:
+        await limiter.acquire(user_id, 'new_message')
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await limiter.acquire(user_id, 'new_message')
+        return (time.perf_counter() - started) / iterations * 1e6
+    finally:
+        await client.delete(limiter.key(user_id, 'new_message'))
+        await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100000)
+    parser.add_argument('--redis-url', help='Also measure the Redis sliding window against this server')
+    args = parser.parse_args()
+
+    unlimited = 1e12
+    allowed = ConnectionRateLimiter({'*': (unlimited, 1), 'new_message': (unlimited, 1)})
+    rejected = ConnectionRateLimiter({'new_message': (1e-9, 1)})
+    rejected.acquire('new_message')
+
+    print(f'{"case":<28} {"us/frame":>9}')
+    print(f'{"bucket, own limit":<28} {measure(lambda: allowed.acquire("new_message"), args.iterations):>9.3f}')
+    print(f'{"bucket, * limit":<28} {measure(lambda: allowed.acquire("mark_read"), args.iterations):>9.3f}')
+    print(f'{"bucket, rejected":<28} {measure(lambda: rejected.acquire("new_message"), args.iterations):>9.3f}')
+    if args.redis_url:
+        redis_us = asyncio.run(measure_redis(args.redis_url, min(args.iterations, 10000)))
+        print(f'{"redis sliding window":<28} {redis_us:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 import logging
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer
+from jwt import InvalidTokenError
 from typing import Annotated
 from src.services.users_service import CustomUserService
 from src.services.token_service import JWTManageService
@@ -10,6 +11,7 @@ from src.depends.dependencies import (
     validate_user,
     get_token_service,
     get_current_auth_user_for_refresh,
+    oauth2_scheme,
 )
 from src.schemas.entity import UserCreate, User
 from src.schemas.token import TokenInfo
@@ -65,3 +67,22 @@ async def refresh(
     refresh_token = await token_service.create_refresh_token(user)
     token_data = TokenInfo(access_token=access_token, refresh_token=refresh_token)
     return token_data
+
+
+@router.post(
+    '/signout',
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary='Sign out user',
+    description='Revoke the given token on all nodes',
+)
+async def signout(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    token_service: Annotated[JWTManageService, Depends(get_token_service)],
+):
+    try:
+        await token_service.revoke_token(token)
+    except InvalidTokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"invalid token error: {e}",
+        )
@@ -1,11 +1,16 @@
 import logging
 
-from fastapi import APIRouter, Depends, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import StreamingResponse
 from typing import Annotated
 from uuid import UUID
-from src.schemas.entity import Message
+from typing import Optional
+from src.core.config import settings
+from src.core.resources import Resources
+from src.schemas.entity import MessagePage, User
 from src.depends.dependencies import CustomHistoryService, get_history_service
-from src.depends.dependencies import get_pagination_params
+from src.depends.dependencies import get_current_auth_user, get_cursor_params, get_resources
+from src.services.history_service import HistoryCursor, export_chat
 
 
 logger = logging.getLogger(__name__)
@@ -17,15 +22,51 @@ router = APIRouter()
 @router.get(
     '/history/{chat_id}',
     summary='Get chat history',
-    description='Get messages in the chat',
-    response_model=list[Message],
+    description='Get messages in the chat, newest first. Pass next_cursor to get older messages '
+                'and prev_cursor to get newer ones',
+    response_model=MessagePage,
 )
 async def get_chat_history(
-    pagination: Annotated[tuple[int, int], Depends(get_pagination_params)],
+    pagination: Annotated[tuple[int, Optional[HistoryCursor]], Depends(get_cursor_params)],
     history_service: Annotated[CustomHistoryService, Depends(get_history_service)],
     chat_id: Annotated[UUID, Path()],
 ):
     logger.info(f'Get chat history for chat_id: {chat_id}')
-    limit, offset = pagination
-    messages = await history_service.get_history(chat_id=chat_id, limit=limit, offset=offset)
-    return messages
+    limit, cursor = pagination
+    page = await history_service.get_history(chat_id=chat_id, limit=limit, cursor=cursor)
+    return page
+
+
+@router.get(
+    '/history/{chat_id}/export',
+    summary='Export chat history',
+    description='Stream every message of the chat, oldest first, as newline-delimited JSON. '
+                'Pass gzip=true to get the stream gzip-compressed',
+    response_class=StreamingResponse,
+)
+async def export_chat_history(
+    user: Annotated[User, Depends(get_current_auth_user)],
+    resources: Annotated[Resources, Depends(get_resources)],
+    history_service: Annotated[CustomHistoryService, Depends(get_history_service)],
+    chat_id: Annotated[UUID, Path()],
+    gzip: Annotated[bool, Query()] = False,
+):
+    if not await history_service.is_member(user.id, chat_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Not a member of the chat')
+    logger.info(f'Export chat history for chat_id: {chat_id}')
+
+    filename = f'chat-{chat_id}.ndjson'
+    media_type = 'application/x-ndjson'
+    if gzip:
+        filename += '.gz'
+        media_type = 'application/gzip'
+    return StreamingResponse(
+        export_chat(
+            resources.session_factory,
+            chat_id,
+            batch_size=settings.export.batch_size,
+            compress_level=settings.export.gzip_level if gzip else None,
+        ),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,38 @@
+import logging
+
+from fastapi import APIRouter, Depends, Query
+from typing import Annotated, Optional
+from uuid import UUID
+from src.schemas.entity import SearchPage, User
+from src.depends.dependencies import (
+    CustomSearchService,
+    get_current_auth_user,
+    get_search_cursor_params,
+    get_search_service,
+)
+from src.services.search_service import SearchCursor
+
+
+logger = logging.getLogger(__name__)
+
+
+router = APIRouter()
+
+
+@router.get(
+    '/search',
+    summary='Search messages',
+    description='Full-text search over the messages of the chats the user belongs to. Pages go from newer to '
+                'older messages, best matches first within a page. Pass next_cursor to get the following results',
+    response_model=SearchPage,
+)
+async def search_messages(
+    user: Annotated[User, Depends(get_current_auth_user)],
+    pagination: Annotated[tuple[int, Optional[SearchCursor]], Depends(get_search_cursor_params)],
+    search_service: Annotated[CustomSearchService, Depends(get_search_service)],
+    q: Annotated[str, Query(min_length=1, max_length=256)],
+    chat_id: Annotated[Optional[UUID], Query()] = None,
+):
+    logger.info(f'Search messages for user_id: {user.id}')
+    limit, cursor = pagination
+    return await search_service.search(user_id=user.id, query=q, limit=limit, cursor=cursor, chat_id=chat_id)
@@ -0,0 +1,38 @@
+import logging
+
+from fastapi import APIRouter
+
+from src.core.logger import log_pipeline
+from src.db.postgres import get_pool_status, get_query_status
+from src.services.message_writer import message_writer
+from src.services.password_hasher import password_hasher
+from src.services.token_cache import revocation_list, verified_token_cache
+from src.services.websocket import bootstrap_cache, history_cache, presence_service, websocket_manager
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get(
+    '/stats',
+    summary='Get runtime statistics',
+    description='Get outbound queue depths, send counters, message writer timings, '
+                'history cache and presence counters, database pool usage, query and logging counters of this node',
+)
+async def get_stats():
+    return {
+        'websocket': websocket_manager.stats(),
+        'message_writer': {'pending': message_writer.pending, **message_writer.stats.as_dict()},
+        'history_cache': history_cache.info(),
+        'presence': presence_service.info(),
+        'bootstrap_cache': bootstrap_cache.info(),
+        'password_hasher': password_hasher.info(),
+        'auth': {
+            'token_cache': {'size': len(verified_token_cache), **verified_token_cache.stats.as_dict()},
+            'revocation_filter': revocation_list.info(),
+        },
+        'db_pool': get_pool_status(),
+        'db_queries': get_query_status(),
+        'logging': log_pipeline.info(),
+    }
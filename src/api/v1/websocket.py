@@ -1,66 +1,151 @@
 import logging
-from typing import Annotated
+import math
+from typing import Annotated, Union
+from uuid import UUID
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 
+from src.core.metrics import ws_frames_received_total, ws_rate_limited_total
 from src.depends.dependencies import (
     get_current_user,
     get_token,
 )
-from src.services.websocket import websocket_manager
-from src.db.postgres import get_session
-from sqlalchemy.ext.asyncio import AsyncSession
-from json.decoder import JSONDecodeError
+from src.managers.codecs import FrameDecodeError, json_codec, negotiate_codec
+from src.managers.connection import WebSocketConnection
+from src.services.websocket import load_bootstrap, user_rate_limiter, websocket_manager
+from src.db.postgres import async_session
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+_frames_received = ws_frames_received_total.labels()
+
+
+async def receive_frame(websocket: WebSocket) -> Union[str, bytes]:
+    """
+    Receive the next text or binary frame.
+
+    Args:
+        websocket (WebSocket): The WebSocket to read from.
+
+    Returns:
+        Union[str, bytes]: The raw frame.
+    """
+    message = await websocket.receive()
+    if message['type'] == 'websocket.disconnect':
+        raise WebSocketDisconnect(message.get('code', 1000), message.get('reason'))
+    if message.get('text') is not None:
+        return message['text']
+    return message.get('bytes') or b''
+
+
+async def check_rate_limits(user_id: UUID, connection: WebSocketConnection, action: str) -> float:
+    """
+    Count an action against the connection's token bucket, then the user's cluster-wide window.
+
+    The Redis window is only consulted for calls the local bucket let through.
+
+    Args:
+        user_id (UUID): The connected user's identifier.
+        connection (WebSocketConnection): The connection the frame came from.
+        action (str): The action name.
+
+    Returns:
+        float: 0 if the action may run, otherwise the seconds to wait before retrying.
+    """
+    if connection.rate_limiter is not None:
+        retry_after = connection.rate_limiter.acquire(action)
+        if retry_after:
+            ws_rate_limited_total.labels(action, 'connection').inc()
+            return retry_after
+    retry_after = await user_rate_limiter.acquire(user_id, action)
+    if retry_after:
+        ws_rate_limited_total.labels(action, 'user').inc()
+    return retry_after
+
+
+async def dispatch(user_id: UUID, connection: WebSocketConnection, raw: Union[str, bytes]) -> None:
+    """
+    Decode and validate a frame, run its handler and queue the acknowledgement or error frame.
+
+    Text frames are always JSON, binary frames use the connection's codec.
+
+    Args:
+        user_id (UUID): The connected user's identifier.
+        connection (WebSocketConnection): The connection the frame came from.
+        raw (Union[str, bytes]): The raw frame.
+    """
+    _frames_received.inc()
+    codec = connection.codec if isinstance(raw, bytes) else json_codec
+    try:
+        action, payload = websocket_manager.decode_frame(raw, codec)
+    except FrameDecodeError as e:
+        logger.error(f'Error receiving message: {e}')
+        error = {'type': 'error', 'error': str(e)}
+        if e.action is not None:
+            error['action'] = e.action
+        if e.details is not None:
+            error['details'] = e.details
+        connection.send(error)
+        return
+
+    try:
+        retry_after = await check_rate_limits(user_id, connection, action)
+        if retry_after:
+            connection.send({
+                'type': 'error',
+                'action': action,
+                'error': 'rate_limited',
+                'retry_after': math.ceil(retry_after * 1000) / 1000,
+            })
+            return
+
+        async with async_session() as db:
+            result = await websocket_manager.handlers[action](payload, user_id=user_id, db=db)
+    except (ValueError, TypeError) as e:
+        logger.error(f'Value error : {e}')
+        connection.send({'type': 'error', 'action': action, 'error': f'Value error: {e}'})
+        return
+    except Exception as e:
+        # Pool timeouts, database, Redis or writer failures fail the frame, not the socket.
+        logger.exception(f'Handler of {action} failed for {user_id=}: {e}')
+        connection.send({'type': 'error', 'action': action, 'error': 'Internal error'})
+        return
+    connection.send({'type': 'ack', 'action': action, 'payload': result})
+
 
 @router.websocket('')
 async def websocket_endpoint(
     websocket: WebSocket,
     token: Annotated[str, Depends(get_token)],
-    db: Annotated[AsyncSession, Depends(get_session)],
 ):
-    user_id = get_current_user(token)
+    """
+    Serve a user's WebSocket.
+
+    The frame codec is negotiated through the Sec-WebSocket-Protocol header:
+    chat.v1.msgpack selects binary MessagePack frames, chat.v1.json or no
+    subprotocol selects JSON text frames.
+
+    The socket holds no database session: every handler call checks one out
+    for its own unit of work and returns it right away, so idle sockets do
+    not pin pool connections.
+
+    Right after connecting the client gets a bootstrap frame with its chats,
+    their last messages, unread counts and members. The same payload fills the
+    chat membership index, so connecting costs one cached, single-flight query.
+    """
+    user_id = UUID(get_current_user(token))
 
-    await websocket_manager.connect(user_id, websocket)
+    codec, subprotocol = negotiate_codec(websocket.scope.get('subprotocols', ()))
+    connection = await websocket_manager.connect(user_id, websocket, codec, subprotocol)
+    # Whatever ends the socket, the connection, its chats, subscriptions and presence are released.
     try:
+        # The bootstrap lists every chat of the user, so it also fills the membership index.
+        bootstrap = await load_bootstrap(user_id)
+        await websocket_manager.join_chats(user_id, [chat['id'] for chat in bootstrap['chats']])
+        connection.send({'type': 'bootstrap', 'payload': bootstrap})
         while True:
-            try:
-                data = await websocket.receive_json()
-
-                action = data.get('type')
-                if not action:
-                    logger.error('No type in message')
-                    await websocket.send_text('No type in message')
-                    continue
-
-                handler = websocket_manager.handlers.get(action)
-
-                if not handler:
-                    logger.error(f'No handler for type: {action}')
-                    await websocket.send_text('No handler for this action')
-                    continue
-
-                payload = data.get('payload')
-                logger.info(f'Got payload: {payload=}')
-                if not payload:
-                    logger.error('No payload in message')
-                    await websocket.send_text('No payload in message')
-                    continue
-                payload['user_id'] = user_id
-                logger.info(f'New payload: {payload=}')
-                await handler(**payload, db=db)
-
-            except (JSONDecodeError, AttributeError) as e:
-                logger.error(f'Error receiving message: {e}')
-                await websocket.send_text('Wrong message format')
-                continue
-            except ValueError as e:
-                logger.error(f'Value error : {e}')
-                await websocket.send_text(f'Value error: {e}')
-                continue
-
-            await websocket_manager.send_message(user_id, f'resp: {data}', websocket)
+            await dispatch(user_id, connection, await receive_frame(websocket))
     except WebSocketDisconnect:
-        await websocket_manager.disconnect(user_id, websocket)
+        pass
+    finally:
+        await websocket_manager.disconnect(user_id, connection)
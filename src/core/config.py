@@ -1,11 +1,11 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import Optional
+from typing import Literal, Optional
 import os
 import logging
 from logging import config as logging_config
 
-from src.core.logger import LOGGING
+from src.core.logger import LOGGING, log_pipeline
 
 logging_config.dictConfig(LOGGING)
 
@@ -18,6 +18,83 @@ logger = logging.getLogger(__name__)
 class RedisConfig(BaseSettings):
     host: str = Field(default='localhost')
     port: int = Field(default=6379)
+    max_connections: int = Field(default=100, gt=0)
+    warm_up_connections: int = Field(default=5, ge=0)
+
+
+class BrokerConfig(BaseSettings):
+    backend: Literal['memory', 'redis'] = Field(default='redis')
+    channel_prefix: str = Field(default='chat_sphere')
+
+
+class WebSocketConfig(BaseSettings):
+    send_queue_size: int = Field(default=256, gt=0)
+    overflow_policy: Literal['drop_oldest', 'coalesce', 'disconnect'] = Field(default='drop_oldest')
+    per_message_deflate: bool = Field(default=False)
+    resume_max_messages: int = Field(default=200, gt=0)
+
+
+class MessageWriterConfig(BaseSettings):
+    max_batch_size: int = Field(default=500, gt=0)
+    max_delay_ms: float = Field(default=5, ge=0)
+    max_pending: int = Field(default=10000, gt=0)
+
+
+class HistoryCacheConfig(BaseSettings):
+    max_messages_per_chat: int = Field(default=100, gt=0)
+    max_bytes: int = Field(default=64 * 1024 * 1024, gt=0)
+    redis_enabled: bool = Field(default=False)
+    redis_ttl_seconds: int = Field(default=24 * 60 * 60, gt=0)
+
+
+class ExportConfig(BaseSettings):
+    batch_size: int = Field(default=1000, gt=0)
+    gzip_level: int = Field(default=6, ge=1, le=9)
+
+
+class ImportConfig(BaseSettings):
+    batch_size: int = Field(default=5000, gt=0)
+    report_interval_seconds: float = Field(default=5, gt=0)
+
+
+class RateLimitConfig(BaseSettings):
+    # Token bucket of every connection: action -> (rate per second, burst). '*' covers the other actions.
+    connection_limits: dict[str, tuple[float, int]] = Field(default={
+        '*': (20, 40),
+        'new_message': (10, 20),
+        'create_group_chat': (0.2, 3),
+        'create_personal_chat': (0.2, 3),
+        'add_user_to_group': (1, 10),
+    })
+    # Sliding window of every user across nodes: action -> (calls, window in seconds).
+    user_limits: dict[str, tuple[int, float]] = Field(default={
+        'new_message': (600, 60),
+        'create_group_chat': (20, 3600),
+        'create_personal_chat': (50, 3600),
+        'add_user_to_group': (200, 3600),
+    })
+
+
+class BootstrapConfig(BaseSettings):
+    cache_ttl_seconds: float = Field(default=2, gt=0)
+    cache_max_size: int = Field(default=50000, gt=0)
+    max_concurrency: int = Field(default=20, gt=0)
+    member_preview: int = Field(default=10, ge=0)
+
+
+class PartitionConfig(BaseSettings):
+    months_ahead: int = Field(default=3, ge=1)
+    retention_months: int = Field(default=12, ge=1)
+    archive_schema: str = Field(default='archive')
+    create_on_startup: bool = Field(default=True)
+    history_recent_days: float = Field(default=31, gt=0)
+
+
+class PresenceConfig(BaseSettings):
+    ttl_seconds: float = Field(default=30, gt=0)
+    heartbeat_seconds: float = Field(default=10, gt=0)
+    flush_interval_ms: float = Field(default=250, gt=0)
+    max_query_users: int = Field(default=500, gt=0)
 
 
 class SecurityConfig(BaseSettings):
@@ -25,6 +102,25 @@ class SecurityConfig(BaseSettings):
     algorithm: str = Field(default='HS256')
     access_token_expire_minutes: int = Field(default=30)
     refresh_token_expire_days: int = Field(default=7)
+    token_cache_size: int = Field(default=10000, gt=0)
+    token_cache_ttl_seconds: float = Field(default=60, ge=0)
+    revocation_filter_capacity: int = Field(default=100000, gt=0)
+    revocation_filter_error_rate: float = Field(default=0.001, gt=0, lt=1)
+    revocation_refresh_seconds: float = Field(default=300, gt=0)
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31)
+    hasher_workers: int = Field(default=2, gt=0)
+    hasher_max_queue: int = Field(default=32, ge=0)
+
+
+class LoggingConfig(BaseSettings):
+    format: Literal['text', 'json'] = Field(default='text')
+    queue_size: int = Field(default=10000, gt=0)
+    # Fraction of the debug and info records kept, per logger and its children.
+    sampling: dict[str, float] = Field(default_factory=dict)
+    # Maximum records per second of any level, per logger and its children.
+    rate_limits: dict[str, float] = Field(
+        default_factory=lambda: {'src.api.v1.websocket': 50, 'src.managers.connection': 50},
+    )
 
 
 class PostgresConfig(BaseSettings):
@@ -34,6 +130,19 @@ class PostgresConfig(BaseSettings):
     postgres_user: str = Field(default='app')
     postgres_password: Optional[str] = Field(default='123qwe')
     postgres_driver: str = Field(default='postgresql+asyncpg')
+    pool_size: int = Field(default=10, gt=0)
+    max_overflow: int = Field(default=20, ge=0)
+    pool_timeout: float = Field(default=5, gt=0)
+    pool_recycle: int = Field(default=1800)
+    warm_up_connections: int = Field(default=5, ge=0)
+    echo: bool = Field(default=False)
+    # Prepared statements kept per connection by the asyncpg dialect; 0 disables them (e.g. behind PgBouncer).
+    statement_cache_size: int = Field(default=100, ge=0)
+    # Compiled SQL strings kept by SQLAlchemy for the whole engine.
+    query_cache_size: int = Field(default=500, ge=0)
+    # Statements slower than this are logged with their parameters; 0 disables the log.
+    slow_query_ms: float = Field(default=200, ge=0)
+    slow_query_max_parameters_length: int = Field(default=1000, gt=0)
 
     @property
     def dsn(self) -> str:
@@ -50,8 +159,25 @@ class PostgresConfig(BaseSettings):
 class Settings(BaseSettings):
     db: PostgresConfig = PostgresConfig()
     redis: RedisConfig = RedisConfig()
+    broker: BrokerConfig = BrokerConfig()
+    websocket: WebSocketConfig = WebSocketConfig()
+    message_writer: MessageWriterConfig = MessageWriterConfig()
+    history_cache: HistoryCacheConfig = HistoryCacheConfig()
+    presence: PresenceConfig = PresenceConfig()
+    partitions: PartitionConfig = PartitionConfig()
+    bootstrap: BootstrapConfig = BootstrapConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    export: ExportConfig = ExportConfig()
+    bulk_import: ImportConfig = ImportConfig()
     security: SecurityConfig = SecurityConfig()
+    logging: LoggingConfig = LoggingConfig()
 
 
 settings = Settings()
+log_pipeline.install(
+    log_format=settings.logging.format,
+    queue_size=settings.logging.queue_size,
+    sampling=settings.logging.sampling,
+    rate_limits=settings.logging.rate_limits,
+)
 logger.info(settings.security)
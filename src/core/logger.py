@@ -1,3 +1,16 @@
+import atexit
+import datetime
+import logging
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
+from src.managers.rate_limit import TokenBucket
+
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = [
     'console',
@@ -55,3 +68,192 @@ LOGGING = {
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 }
+
+
+# Attributes every LogRecord has; anything else on a record came from extra=.
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line.
+
+    The object has ts, level, logger and message, the exception if any and
+    every field passed with extra=.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.UTC).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        for name, value in vars(record).items():
+            if name not in RESERVED_ATTRS:
+                entry[name] = value
+        return orjson.dumps(entry, default=str).decode()
+
+
+class LogSamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the debug and info records of some loggers and caps the record rate of others.
+
+    A rule applies to the named logger and its children; the most specific
+    rule wins. Sampling never drops warnings or errors, the rate cap drops
+    any level so an error raised per frame cannot flood the log either.
+    """
+
+    def __init__(self, sampling: dict[str, float], rate_limits: dict[str, float]) -> None:
+        """
+        Initialize the LogSamplingFilter.
+
+        Args:
+            sampling (dict[str, float]): The fraction of records below WARNING kept, per logger name.
+            rate_limits (dict[str, float]): The maximum records per second, per logger name.
+        """
+        super().__init__()
+        self.sampling = sampling
+        self.rate_limits = rate_limits
+        self.sampled_out = 0
+        self.rate_limited = 0
+        self._rules: dict[str, tuple[Optional[float], Optional[TokenBucket]]] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _rule(self, name: str) -> tuple[Optional[float], Optional[TokenBucket]]:
+        rule = self._rules.get(name)
+        if rule is None:
+            fraction = rate_name = None
+            for candidate in _ancestors(name):
+                if fraction is None and candidate in self.sampling:
+                    fraction = self.sampling[candidate]
+                if rate_name is None and candidate in self.rate_limits:
+                    rate_name = candidate
+            # Children without a rule of their own share their ancestor's bucket.
+            bucket = None
+            if rate_name is not None:
+                bucket = self._buckets.get(rate_name)
+                if bucket is None:
+                    rate = self.rate_limits[rate_name]
+                    bucket = self._buckets[rate_name] = TokenBucket(rate, max(1, int(rate)), time.monotonic())
+            rule = self._rules[name] = (fraction, bucket)
+        return rule
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        fraction, bucket = self._rule(record.name)
+        if fraction is not None and record.levelno < logging.WARNING and random.random() >= fraction:
+            self.sampled_out += 1
+            return False
+        if bucket is not None and bucket.acquire(time.monotonic()):
+            self.rate_limited += 1
+            return False
+        return True
+
+
+def _ancestors(name: str):
+    while name:
+        yield name
+        name = name.rpartition('.')[0]
+    # The root logger's rule, named '', covers every logger.
+    yield ''
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops records instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only the message is rendered here; formatting is left to the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Moves the handlers of the root logger behind a bounded queue drained by a background thread.
+
+    Logging calls then only filter the record and put it on the queue; the
+    formatting and the writes to the streams happen on the listener thread.
+    """
+
+    def __init__(self) -> None:
+        self.handler: Optional[DroppingQueueHandler] = None
+        self.sampling_filter: Optional[LogSamplingFilter] = None
+        self.listener: Optional[QueueListener] = None
+
+    def install(
+        self,
+        log_format: str = 'text',
+        queue_size: int = 10000,
+        sampling: Optional[dict[str, float]] = None,
+        rate_limits: Optional[dict[str, float]] = None,
+    ) -> None:
+        """
+        Install the pipeline in front of the current root handlers.
+
+        Args:
+            log_format (str): text keeps the handlers' formatters, json replaces them with JsonFormatter.
+            queue_size (int): The maximum number of queued records; records beyond it are dropped.
+            sampling (Optional[dict[str, float]]): The fraction of records below WARNING kept, per logger name.
+            rate_limits (Optional[dict[str, float]]): The maximum records per second, per logger name.
+        """
+        if self.listener is not None:
+            return
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        if log_format == 'json':
+            for handler in handlers:
+                handler.setFormatter(JsonFormatter())
+
+        self.handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.sampling_filter = LogSamplingFilter(sampling or {}, rate_limits or {})
+        self.handler.addFilter(self.sampling_filter)
+        self.listener = QueueListener(self.handler.queue, *handlers, respect_handler_level=True)
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """
+        Write out the queued records and stop the listener thread.
+        """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def info(self) -> dict:
+        if self.handler is None:
+            return {'installed': False}
+        return {
+            'installed': self.listener is not None,
+            'queued': self.handler.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'sampled_out': self.sampling_filter.sampled_out,
+            'rate_limited': self.sampling_filter.rate_limited,
+        }
+
+
+log_pipeline = LogPipeline()
@@ -0,0 +1,256 @@
+import bisect
+import time
+from typing import Callable, Iterable, Union
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _format_labels(labelnames: tuple[str, ...], labelvalues: tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: Union[int, float]) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+
+    def labels(self, *labelvalues: str):
+        """
+        Get the child for a label combination, creating it on first use.
+
+        Hot paths should look the child up once and keep it.
+        """
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            child = self._children[labelvalues] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labelvalues, child in self._children.items():
+            lines.extend(self._render_child(labelvalues, child))
+        return lines
+
+    def _render_child(self, labelvalues: tuple[str, ...], child) -> list[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}']
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: Union[int, float] = 1) -> None:
+        self.value += amount
+
+    def set(self, value: Union[int, float]) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """
+    Histogram with fixed upper bounds; observing is one bisect and three increments.
+    """
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, labelvalues: tuple[str, ...], child: _HistogramChild) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(bound)}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, labelvalues)
+        lines.append(f'{self.name}_sum{labels} {_format_value(child.sum)}')
+        lines.append(f'{self.name}_count{labels} {child.count}')
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    Counter or gauge read from existing state when scraped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        callback: Callable[[], Union[int, float, dict[tuple[str, ...], Union[int, float]]]],
+        labelnames: Iterable[str] = (),
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in values.items():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        callback: Callable,
+        labelnames: Iterable[str] = (),
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, callback, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class HttpMetricsMiddleware:
+    """
+    ASGI middleware that records the latency of HTTP requests per route template.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            http_request_seconds.labels(scope['method'], path).observe(time.perf_counter() - started)
+
+
+registry = MetricsRegistry()
+
+ws_handler_seconds = registry.histogram(
+    'chat_ws_handler_seconds', 'Latency of WebSocket action handlers.', ('action',),
+)
+ws_handler_errors_total = registry.counter(
+    'chat_ws_handler_errors_total', 'WebSocket action handlers that raised.', ('action',),
+)
+ws_rate_limited_total = registry.counter(
+    'chat_ws_rate_limited_total', 'WebSocket actions rejected by a rate limit.', ('action', 'scope'),
+)
+ws_frames_received_total = registry.counter(
+    'chat_ws_frames_received_total', 'WebSocket frames received from clients.',
+)
+db_pool_wait_seconds = registry.histogram(
+    'chat_db_pool_wait_seconds', 'Time spent waiting for a database pool connection.',
+)
+redis_command_seconds = registry.histogram(
+    'chat_redis_command_seconds', 'Round-trip time of Redis commands issued by the token storage.', ('command',),
+)
+http_request_seconds = registry.histogram(
+    'chat_http_request_seconds', 'Latency of HTTP requests by route.', ('method', 'route'),
+)
+registry.callback(
+    'process_cpu_seconds_total', 'Total user and system CPU time spent in seconds.', 'counter', time.process_time,
+)
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+from redis.asyncio import ConnectionPool, Redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from src.db.postgres import async_session, engine
+from src.db.redis import redis_client, redis_pool
+from src.db.token_storage import RedisStorage
+from src.services.token_cache import revocation_list, verified_token_cache
+from src.services.token_service import JWTManageService
+
+logger = logging.getLogger(__name__)
+
+
+class Resources:
+    """
+    Process-wide connection pools and stateless services, opened in the app lifespan.
+
+    Request dependencies take what they need from here instead of building
+    pools or services per call; only objects bound to a request's database
+    session are created per request.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        session_factory: async_sessionmaker[AsyncSession],
+        redis_pool: ConnectionPool,
+        redis_client: Redis,
+    ) -> None:
+        """
+        Initialize the Resources.
+
+        Args:
+            engine (AsyncEngine): The database engine.
+            session_factory (async_sessionmaker[AsyncSession]): The factory of database sessions.
+            redis_pool (ConnectionPool): The shared Redis connection pool.
+            redis_client (Redis): The Redis client on top of the pool.
+        """
+        self.engine = engine
+        self.session_factory = session_factory
+        self.redis_pool = redis_pool
+        self.redis = redis_client
+        self.token_storage = RedisStorage(redis_client)
+        self.token_service = JWTManageService(
+            storage=self.token_storage,
+            secret=settings.security.secret_key,
+            algorithm=settings.security.algorithm,
+            access_token_expire_minutes=settings.security.access_token_expire_minutes,
+            refresh_token_expire_days=settings.security.refresh_token_expire_days,
+            token_cache=verified_token_cache,
+            revocation_list=revocation_list,
+        )
+
+    @classmethod
+    def create(cls) -> 'Resources':
+        return cls(engine=engine, session_factory=async_session, redis_pool=redis_pool, redis_client=redis_client)
+
+    async def warm_up(self, postgres_connections: int, redis_connections: int) -> None:
+        """
+        Open pool connections ahead of the first requests.
+
+        Failures are logged and left to the pools to retry on demand.
+
+        Args:
+            postgres_connections (int): The number of database connections to open.
+            redis_connections (int): The number of Redis connections to open.
+        """
+        try:
+            async with AsyncExitStack() as stack:
+                connections = await asyncio.gather(
+                    *(stack.enter_async_context(self.engine.connect()) for _ in range(postgres_connections)),
+                )
+                for connection in connections:
+                    await connection.execute(text('SELECT 1'))
+            logger.info(f'Opened {postgres_connections} database connections')
+        except Exception as e:
+            logger.error(f'Failed to warm up database pool: {e}')
+
+        try:
+            await asyncio.gather(*(self.redis.ping() for _ in range(redis_connections)))
+            logger.info(f'Opened {redis_connections} redis connections')
+        except Exception as e:
+            logger.error(f'Failed to warm up redis pool: {e}')
+
+    async def close(self) -> None:
+        """
+        Close all pooled connections.
+        """
+        await self.redis.aclose()
+        await self.redis_pool.disconnect()
+        await self.engine.dispose()
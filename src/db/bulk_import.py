@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import logging
+import secrets
+import time
+import uuid
+from typing import Iterator, Optional
+
+import orjson
+
+from src.core.config import settings
+from src.db.partitions import PartitionMaintainer, month_start
+from src.db.postgres import engine
+from src.services.password_hasher import password_hasher
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = ('id', 'chat_id', 'sender_id', 'text', 'timestamp', 'seq')
+ID_NAMESPACE = uuid.UUID('8b0f5d62-2c1e-4f7e-9a55-6d3c1f0e2a94')
+
+
+class ArchiveRecord:
+    """
+    One message of an archive.
+
+    Archives are NDJSON or CSV with the fields id, chat_id, text, timestamp
+    and sender_email, and optionally chat_title, chat_type ('group' or
+    'personal'), group and sender_name. Ids are the old system's and may be
+    any string. Messages of a chat are numbered in archive order.
+    """
+
+    __slots__ = (
+        'id', 'chat_id', 'chat_title', 'chat_type', 'group', 'sender_email', 'sender_name', 'text', 'timestamp',
+    )
+
+    def __init__(self, data: dict) -> None:
+        self.id = str(data['id'])
+        self.chat_id = str(data['chat_id'])
+        self.chat_title = data.get('chat_title') or self.chat_id
+        self.chat_type = data.get('chat_type') or 'group'
+        self.group = data.get('group') or self.chat_title
+        self.sender_email = data['sender_email']
+        self.sender_name = data.get('sender_name') or self.sender_email.partition('@')[0]
+        self.text = data['text']
+        timestamp = datetime.datetime.fromisoformat(data['timestamp'])
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=datetime.UTC)
+        self.timestamp = timestamp
+
+
+def read_archive(path: str, archive_format: str) -> Iterator[dict]:
+    """
+    Stream the records of an archive, gzip-compressed if the path ends with .gz.
+
+    Args:
+        path (str): The archive file.
+        archive_format (str): Either ndjson or csv.
+
+    Yields:
+        dict: The raw records.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as file:
+        if archive_format == 'csv':
+            yield from csv.DictReader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+            return
+        for line in file:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+class BulkImporter:
+    """
+    Loads a message archive with COPY in batches, one transaction per batch.
+
+    Users are matched by email, groups and chats through the import_id_map
+    table; all three are kept in in-memory maps so a batch only touches the
+    database for entities it has not seen before, which it creates. Every
+    batch COPYs its messages, moves the chats' counters, adds the senders to
+    the groups and advances the archive's checkpoint in the same
+    transaction, so an interrupted import resumes after the last committed
+    batch and never loads a message twice.
+    """
+
+    def __init__(self, connection, source: str, batch_size: int = 5000) -> None:
+        """
+        Initialize the BulkImporter.
+
+        Args:
+            connection: The asyncpg connection to load with.
+            source (str): The name of the archive, the key of its checkpoint and id map entries.
+            batch_size (int): The number of messages per COPY and transaction.
+        """
+        self.connection = connection
+        self.source = source
+        self.batch_size = batch_size
+        self.users: dict[str, uuid.UUID] = {}
+        self.groups: dict[str, uuid.UUID] = {}
+        self.chats: dict[str, uuid.UUID] = {}
+        self.chat_seqs: dict[uuid.UUID, int] = {}
+        self.memberships: set[tuple[uuid.UUID, uuid.UUID]] = set()
+        self.partitions: set[datetime.datetime] = set()
+        self.placeholder_password: Optional[str] = None
+        self.position = 0
+        self.rows = 0
+
+    async def load_state(self) -> None:
+        """
+        Load the checkpoint and the id maps of earlier runs.
+        """
+        checkpoint = await self.connection.fetchrow(
+            'SELECT position, rows FROM import_checkpoints WHERE source = $1', self.source,
+        )
+        if checkpoint is not None:
+            self.position, self.rows = checkpoint['position'], checkpoint['rows']
+
+        for row in await self.connection.fetch('SELECT email, id FROM users'):
+            self.users[row['email']] = row['id']
+        for row in await self.connection.fetch(
+            'SELECT kind, legacy_id, id FROM import_id_map WHERE source = $1', self.source,
+        ):
+            (self.groups if row['kind'] == 'group' else self.chats)[row['legacy_id']] = row['id']
+        if self.chats:
+            for row in await self.connection.fetch(
+                'SELECT id, message_count FROM chats WHERE id = ANY($1::uuid[])', list(self.chats.values()),
+            ):
+                self.chat_seqs[row['id']] = row['message_count']
+        if self.groups:
+            for row in await self.connection.fetch(
+                'SELECT group_id, user_id FROM group_users WHERE group_id = ANY($1::uuid[])',
+                list(self.groups.values()),
+            ):
+                self.memberships.add((row['group_id'], row['user_id']))
+        partitions = await PartitionMaintainer(engine).list_partitions()
+        self.partitions = {partition.lower for partition in partitions}
+
+    async def run(self, records: Iterator[dict], report_every: float = 5) -> None:
+        """
+        Import the records that follow the checkpoint.
+
+        Args:
+            records (Iterator[dict]): The raw records of the archive, in archive order.
+            report_every (float): How often progress is logged, in seconds.
+        """
+        skipped = self.position
+        started = last_report = time.perf_counter()
+        imported = 0
+        batch: list[ArchiveRecord] = []
+        for index, data in enumerate(records):
+            if index < skipped:
+                continue
+            batch.append(ArchiveRecord(data))
+            if len(batch) >= self.batch_size:
+                await self.load_batch(batch)
+                imported += len(batch)
+                batch = []
+                if time.perf_counter() - last_report >= report_every:
+                    last_report = time.perf_counter()
+                    rate = imported / (last_report - started)
+                    logger.info(f'{self.source}: {self.rows} rows imported, {rate:.0f} rows/s')
+        if batch:
+            await self.load_batch(batch)
+            imported += len(batch)
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        logger.info(
+            f'{self.source}: imported {imported} rows in {elapsed:.1f} s ({rate:.0f} rows/s), '
+            f'skipped {skipped} already imported',
+        )
+
+    async def load_batch(self, batch: list[ArchiveRecord]) -> None:
+        """
+        Load a batch of records in one transaction.
+
+        Args:
+            batch (list[ArchiveRecord]): The records.
+        """
+        await self._ensure_partitions(batch)
+        async with self.connection.transaction():
+            rows = []
+            last_messages: dict[uuid.UUID, uuid.UUID] = {}
+            new_members: set[tuple[uuid.UUID, uuid.UUID]] = set()
+            for record in batch:
+                sender_id = await self._user(record)
+                group_id = await self._group(record, sender_id)
+                chat_id = await self._chat(record, group_id)
+                if (group_id, sender_id) not in self.memberships:
+                    new_members.add((group_id, sender_id))
+                    self.memberships.add((group_id, sender_id))
+
+                seq = self.chat_seqs[chat_id] = self.chat_seqs[chat_id] + 1
+                message_id = uuid.uuid5(ID_NAMESPACE, f'{self.source}:message:{record.id}')
+                last_messages[chat_id] = message_id
+                rows.append((message_id, chat_id, sender_id, record.text, record.timestamp, seq))
+
+            await self.connection.copy_records_to_table('messages', records=rows, columns=MESSAGE_COLUMNS)
+            await self.connection.executemany(
+                'UPDATE chats SET message_count = $2, last_message_id = $3 WHERE id = $1',
+                [(chat_id, self.chat_seqs[chat_id], message_id) for chat_id, message_id in last_messages.items()],
+            )
+            if new_members:
+                await self.connection.executemany(
+                    'INSERT INTO group_users (group_id, user_id) VALUES ($1, $2)', sorted(new_members),
+                )
+            self.position += len(batch)
+            self.rows += len(rows)
+            await self.connection.execute(
+                """
+                INSERT INTO import_checkpoints (source, position, rows) VALUES ($1, $2, $3)
+                ON CONFLICT (source) DO UPDATE
+                SET position = excluded.position, rows = excluded.rows, updated_at = now()
+                """,
+                self.source, self.position, self.rows,
+            )
+
+    async def mark_read(self) -> None:
+        """
+        Count the imported history as read by every member of the imported chats.
+        """
+        if not self.chats:
+            return
+        await self.connection.execute(
+            """
+            INSERT INTO read_cursors (user_id, chat_id, last_read_message_id, last_read_count)
+            SELECT group_users.user_id, chats.id, chats.last_message_id, chats.message_count
+            FROM chats
+            JOIN group_users ON group_users.group_id = chats.group_id
+            WHERE chats.id = ANY($1::uuid[]) AND group_users.user_id IS NOT NULL
+            ON CONFLICT (user_id, chat_id) DO UPDATE
+            SET last_read_message_id = excluded.last_read_message_id,
+                last_read_count = excluded.last_read_count,
+                updated_at = now()
+            WHERE read_cursors.last_read_count < excluded.last_read_count
+            """,
+            list(self.chats.values()),
+        )
+
+    async def _ensure_partitions(self, batch: list[ArchiveRecord]) -> None:
+        months = {month_start(record.timestamp) for record in batch} - self.partitions
+        if months:
+            await PartitionMaintainer(engine).create_months(months)
+            self.partitions |= months
+
+    async def _user(self, record: ArchiveRecord) -> uuid.UUID:
+        user_id = self.users.get(record.sender_email)
+        if user_id is not None:
+            return user_id
+        # Imported users get the hash of a password nobody knows and have to reset it.
+        if self.placeholder_password is None:
+            self.placeholder_password = await password_hasher.hash(secrets.token_urlsafe(32))
+        user_id = await self.connection.fetchval(
+            """
+            INSERT INTO users (name, email, password) VALUES ($1, $2, $3)
+            ON CONFLICT (email) DO UPDATE SET email = excluded.email
+            RETURNING id
+            """,
+            record.sender_name, record.sender_email, self.placeholder_password,
+        )
+        self.users[record.sender_email] = user_id
+        return user_id
+
+    async def _group(self, record: ArchiveRecord, creator_id: uuid.UUID) -> uuid.UUID:
+        group_id = self.groups.get(record.group)
+        if group_id is not None:
+            return group_id
+        # Group titles are unique; a title taken outside this archive gets the archive's name.
+        for title in (record.group, f'{record.group} ({self.source})'):
+            group_id = await self.connection.fetchval(
+                """
+                INSERT INTO groups (title, creator_id) VALUES ($1, $2)
+                ON CONFLICT (title) DO NOTHING
+                RETURNING id
+                """,
+                title, creator_id,
+            )
+            if group_id is not None:
+                break
+        else:
+            raise ValueError(f'Group title {record.group!r} is taken')
+        await self._remember('group', record.group, group_id)
+        self.groups[record.group] = group_id
+        return group_id
+
+    async def _chat(self, record: ArchiveRecord, group_id: uuid.UUID) -> uuid.UUID:
+        chat_id = self.chats.get(record.chat_id)
+        if chat_id is not None:
+            return chat_id
+        chat_id = await self.connection.fetchval(
+            'INSERT INTO chats (title, chat_type, group_id) VALUES ($1, $2, $3) RETURNING id',
+            record.chat_title, record.chat_type, group_id,
+        )
+        await self._remember('chat', record.chat_id, chat_id)
+        self.chats[record.chat_id] = chat_id
+        self.chat_seqs[chat_id] = 0
+        return chat_id
+
+    async def _remember(self, kind: str, legacy_id: str, entity_id: uuid.UUID) -> None:
+        await self.connection.execute(
+            'INSERT INTO import_id_map (source, kind, legacy_id, id) VALUES ($1, $2, $3, $4)',
+            self.source, kind, legacy_id, entity_id,
+        )
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Import a chat archive into messages, chats and groups.')
+    parser.add_argument('path', help='The NDJSON or CSV archive, optionally gzip-compressed')
+    parser.add_argument('--format', choices=('ndjson', 'csv'), help='Guessed from the file name if omitted')
+    parser.add_argument('--source', help='The name of the archive used for resuming. Defaults to the file name')
+    parser.add_argument('--batch-size', type=int, default=settings.bulk_import.batch_size)
+    parser.add_argument('--no-mark-read', action='store_true', help='Leave the imported history unread')
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    archive_format = args.format or ('csv' if '.csv' in args.path else 'ndjson')
+    source = args.source or args.path.rsplit('/', 1)[-1]
+
+    try:
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            importer = BulkImporter(raw.driver_connection, source, batch_size=args.batch_size)
+            await importer.load_state()
+            if importer.position:
+                logger.info(f'{source}: resuming after record {importer.position}')
+            await importer.run(
+                read_archive(args.path, archive_format), report_every=settings.bulk_import.report_interval_seconds,
+            )
+            if not args.no_mark_read:
+                await importer.mark_read()
+    finally:
+        await password_hasher.shutdown()
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import re
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.core.config import settings
+from src.db.postgres import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$')
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: datetime.datetime
+    upper: datetime.datetime
+
+
+def month_start(value: datetime.datetime, months: int = 0) -> datetime.datetime:
+    """
+    Get the first instant of a month in UTC.
+
+    Args:
+        value (datetime.datetime): Any instant of the month.
+        months (int): How many months to move forward (or backwards when negative).
+
+    Returns:
+        datetime.datetime: The start of the month.
+    """
+    value = value.astimezone(datetime.UTC)
+    index = value.year * 12 + value.month - 1 + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1, tzinfo=datetime.UTC)
+
+
+def partition_for(table: str, month: datetime.datetime) -> Partition:
+    lower = month_start(month)
+    return Partition(f'{table}_y{lower.year:04d}m{lower.month:02d}', lower, month_start(lower, 1))
+
+
+class PartitionMaintainer:
+    """
+    Creates the partitions of a range-partitioned table ahead of time and archives old ones.
+
+    Partitions cover whole UTC months and are named <table>_yYYYYmMM. The
+    table also has a default partition, <table>_default, so rows outside the
+    created months are never rejected; creating a month moves its rows out of
+    the default partition.
+    """
+
+    def __init__(self, engine: AsyncEngine, table: str = 'messages') -> None:
+        """
+        Initialize the PartitionMaintainer.
+
+        Args:
+            engine (AsyncEngine): The database engine.
+            table (str): The partitioned table.
+        """
+        self.engine = engine
+        self.table = table
+
+    async def list_partitions(self) -> list[Partition]:
+        """
+        List the attached monthly partitions, oldest first.
+
+        Returns:
+            list[Partition]: The partitions.
+        """
+        stmt = text(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+            """,
+        )
+        async with self.engine.connect() as conn:
+            res = await conn.execute(stmt, {'table': self.table})
+            names = res.scalars().all()
+
+        partitions = []
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match is None or match['table'] != self.table:
+                continue
+            month = datetime.datetime(int(match['year']), int(match['month']), 1, tzinfo=datetime.UTC)
+            partitions.append(partition_for(self.table, month))
+        return sorted(partitions, key=lambda partition: partition.lower)
+
+    async def create_ahead(self, months_ahead: int, now: Optional[datetime.datetime] = None) -> list[Partition]:
+        """
+        Create the partitions of the current month and the next months_ahead months.
+
+        Args:
+            months_ahead (int): How many months after the current one must exist.
+            now (Optional[datetime.datetime]): The current time. Defaults to now.
+
+        Returns:
+            list[Partition]: The partitions that were created.
+        """
+        now = now or datetime.datetime.now(datetime.UTC)
+        return await self.create_months(month_start(now, offset) for offset in range(months_ahead + 1))
+
+    async def create_months(self, months: Iterable[datetime.datetime]) -> list[Partition]:
+        """
+        Create the partitions of the given months that do not exist yet.
+
+        Rows of a month that already landed in the default partition would make
+        CREATE TABLE ... PARTITION OF fail, so in that case the default partition
+        is detached, the month is created, its rows are moved into it and the
+        default partition is attached again, all in one transaction. The table
+        is locked for writes while the rows are moved.
+
+        Args:
+            months (Iterable[datetime.datetime]): Any instant of every month.
+
+        Returns:
+            list[Partition]: The partitions that were created.
+        """
+        existing = {partition.name for partition in await self.list_partitions()}
+        created = []
+        for partition in sorted({partition_for(self.table, month) for month in months}):
+            if partition.name in existing:
+                continue
+            async with self.engine.begin() as conn:
+                # Serializes the app instances and the maintenance command creating the same month.
+                await conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:table))'), {'table': self.table})
+                exists = await conn.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': partition.name})
+                if exists.scalar():
+                    continue
+                moved = await self._create_partition(conn, partition)
+            logger.info(f'Created partition {partition.name}')
+            if moved:
+                logger.warning(f'Moved {moved} rows of {partition.name} out of the default partition')
+            created.append(partition)
+        return created
+
+    async def _create_partition(self, conn: AsyncConnection, partition: Partition) -> int:
+        """
+        Create a partition, moving its rows out of the default partition first if there are any.
+
+        Args:
+            conn (AsyncConnection): The connection, inside a transaction.
+            partition (Partition): The partition to create.
+
+        Returns:
+            int: How many rows were moved from the default partition.
+        """
+        default = f'{self.table}_default'
+        bounds = {'lower': partition.lower, 'upper': partition.upper}
+        create = text(
+            f'CREATE TABLE "{partition.name}" PARTITION OF "{self.table}" '
+            f"FOR VALUES FROM ('{partition.lower.isoformat()}') TO ('{partition.upper.isoformat()}')",
+        )
+
+        has_default = await conn.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': default})
+        if has_default.scalar():
+            res = await conn.execute(
+                text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE timestamp >= :lower AND timestamp < :upper)'),
+                bounds,
+            )
+            has_rows = res.scalar()
+        else:
+            has_rows = False
+        if not has_rows:
+            await conn.execute(create)
+            return 0
+
+        await conn.execute(text(f'ALTER TABLE "{self.table}" DETACH PARTITION "{default}"'))
+        await conn.execute(create)
+        res = await conn.execute(
+            text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE timestamp >= :lower AND timestamp < :upper RETURNING *) '
+                f'INSERT INTO "{partition.name}" SELECT * FROM moved',
+            ),
+            bounds,
+        )
+        await conn.execute(text(f'ALTER TABLE "{self.table}" ATTACH PARTITION "{default}" DEFAULT'))
+        return res.rowcount
+
+    async def archive_older_than(
+        self,
+        retention_months: int,
+        archive_schema: str = 'archive',
+        drop: bool = False,
+        export_dir: Optional[str] = None,
+        now: Optional[datetime.datetime] = None,
+    ) -> list[Partition]:
+        """
+        Detach the partitions that ended more than retention_months months ago.
+
+        A detached partition is optionally exported as gzipped CSV, then either
+        moved to archive_schema, where it stays queryable, or dropped.
+
+        Args:
+            retention_months (int): How many whole months before the current one stay attached.
+            archive_schema (str): The schema detached partitions are moved to.
+            drop (bool): Drop detached partitions instead of moving them.
+            export_dir (Optional[str]): The directory to export detached partitions to.
+            now (Optional[datetime.datetime]): The current time. Defaults to now.
+
+        Returns:
+            list[Partition]: The partitions that were detached.
+        """
+        cutoff = month_start(now or datetime.datetime.now(datetime.UTC), -retention_months)
+        expired = [partition for partition in await self.list_partitions() if partition.upper <= cutoff]
+        for partition in expired:
+            async with self.engine.begin() as conn:
+                await conn.execute(text(f'ALTER TABLE "{self.table}" DETACH PARTITION "{partition.name}"'))
+            logger.info(f'Detached partition {partition.name}')
+
+            if export_dir is not None:
+                path = await self.export(partition.name, export_dir)
+                logger.info(f'Exported partition {partition.name} to {path}')
+
+            async with self.engine.begin() as conn:
+                if drop:
+                    await conn.execute(text(f'DROP TABLE "{partition.name}"'))
+                else:
+                    await conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"'))
+                    await conn.execute(text(f'ALTER TABLE "{partition.name}" SET SCHEMA "{archive_schema}"'))
+        return expired
+
+    async def export(self, name: str, export_dir: str) -> str:
+        """
+        Stream a table to a gzipped CSV file with COPY.
+
+        Args:
+            name (str): The table to export.
+            export_dir (str): The directory of the file.
+
+        Returns:
+            str: The path of the file.
+        """
+        os.makedirs(export_dir, exist_ok=True)
+        path = os.path.join(export_dir, f'{name}.csv.gz')
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            with gzip.open(path, 'wb') as file:
+                async def write(chunk: bytes) -> None:
+                    file.write(chunk)
+
+                await raw.driver_connection.copy_from_table(name, output=write, format='csv', header=True)
+        return path
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Maintain the monthly partitions of the messages table.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='List the attached monthly partitions')
+
+    create = commands.add_parser('create', help='Create the partitions of the coming months')
+    create.add_argument('--months-ahead', type=int, default=settings.partitions.months_ahead)
+
+    archive = commands.add_parser('archive', help='Detach the partitions past the retention period')
+    archive.add_argument('--retention-months', type=int, default=settings.partitions.retention_months)
+    archive.add_argument('--schema', default=settings.partitions.archive_schema)
+    archive.add_argument('--drop', action='store_true', help='Drop detached partitions instead of archiving them')
+    archive.add_argument('--export-dir', help='Export detached partitions as gzipped CSV to this directory')
+    return parser.parse_args(argv)
+
+
+async def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    maintainer = PartitionMaintainer(engine)
+    try:
+        if args.command == 'list':
+            for partition in await maintainer.list_partitions():
+                print(f'{partition.name}\t{partition.lower.isoformat()}\t{partition.upper.isoformat()}')
+        elif args.command == 'create':
+            created = await maintainer.create_ahead(args.months_ahead)
+            print(f'Created {len(created)} partitions')
+        else:
+            detached = await maintainer.archive_older_than(
+                args.retention_months,
+                archive_schema=args.schema,
+                drop=args.drop,
+                export_dir=args.export_dir,
+            )
+            print(f'Detached {len(detached)} partitions')
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,11 +1,19 @@
-from sqlalchemy import MetaData
+import logging
+import time
+
+from sqlalchemy import MetaData, event, exc
+from sqlalchemy.engine.interfaces import CacheStats
 from sqlalchemy.ext.asyncio import (
     AsyncSession, async_sessionmaker,
     create_async_engine,
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.core.config import settings
+from src.core.metrics import db_pool_wait_seconds, registry
+
+logger = logging.getLogger(__name__)
 
 meta = MetaData(
     naming_convention={
@@ -22,8 +30,186 @@ class Base(DeclarativeBase):
     metadata = meta
 
 
-engine = create_async_engine(settings.db.dsn, echo=True, future=True)
+class PoolStats:
+    """
+    Checkout counters and wait times of the connection pool.
+    """
+
+    __slots__ = ('checkouts', 'timeouts', 'total_wait_ms', 'max_wait_ms', 'last_wait_ms')
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.last_wait_ms = 0.0
+
+    def record(self, wait_ms: float) -> None:
+        self.checkouts += 1
+        self.total_wait_ms += wait_ms
+        self.last_wait_ms = wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats['avg_wait_ms'] = self.total_wait_ms / self.checkouts if self.checkouts else 0
+        return stats
+
+
+pool_stats = PoolStats()
+_pool_wait_seconds = db_pool_wait_seconds.labels()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long every checkout waited for a connection.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        pool_stats.record(waited * 1000)
+        _pool_wait_seconds.observe(waited)
+        return connection
+
+
+class QueryStats:
+    """
+    Statement counters: how many were slow and how the compiled SQL cache served them.
+
+    A cache miss means SQLAlchemy compiled the statement to a string; a miss
+    that keeps growing under steady traffic points at statements built in a
+    way that defeats the cache, such as literal values inlined into them.
+    """
+
+    __slots__ = ('queries', 'slow_queries', 'max_ms', 'cache_hits', 'cache_misses', 'cache_disabled')
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.slow_queries = 0
+        self.max_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_disabled = 0
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        compiled = self.cache_hits + self.cache_misses
+        stats['cache_hit_ratio'] = self.cache_hits / compiled if compiled else 0
+        return stats
+
+
+query_stats = QueryStats()
+
+
+def format_parameters(parameters, max_length: int) -> str:
+    text = repr(parameters)
+    if len(text) > max_length:
+        return f'{text[:max_length]}... ({len(text)} chars)'
+    return text
+
+
+def instrument_queries(engine, slow_query_ms: float, max_parameters_length: int) -> None:
+    """
+    Count the statements of an engine and log the slow ones.
+
+    Timing starts when the statement is handed to the driver and ends when
+    the driver returns, so pool waits and result processing are not included.
+
+    Args:
+        engine: The engine; the listeners go on its sync engine.
+        slow_query_ms (float): The threshold of the slow query log, in milliseconds. 0 disables the log.
+        max_parameters_length (int): The maximum length of the logged parameters.
+    """
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is None:
+            return
+        elapsed_ms = (time.perf_counter() - context.query_started) * 1000
+        query_stats.queries += 1
+        query_stats.max_ms = max(query_stats.max_ms, elapsed_ms)
+        if context.compiled is not None:
+            if context.cache_hit is CacheStats.CACHE_HIT:
+                query_stats.cache_hits += 1
+            elif context.cache_hit is CacheStats.CACHE_MISS:
+                query_stats.cache_misses += 1
+            else:
+                query_stats.cache_disabled += 1
+
+        if slow_query_ms and elapsed_ms >= slow_query_ms:
+            query_stats.slow_queries += 1
+            kind = 'executemany' if executemany else 'execute'
+            logger.warning(
+                f'Slow query ({elapsed_ms:.1f} ms, {kind}): {statement} '
+                f'parameters={format_parameters(parameters, max_parameters_length)}',
+            )
+
+
+def get_pool_status() -> dict:
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        **pool_stats.as_dict(),
+    }
+
+
+def get_query_status() -> dict:
+    compiled_cache = engine.sync_engine._compiled_cache
+    return {'compiled_cache_size': len(compiled_cache) if compiled_cache is not None else 0, **query_stats.as_dict()}
+
+
+engine = create_async_engine(
+    settings.db.dsn,
+    echo=settings.db.echo,
+    future=True,
+    query_cache_size=settings.db.query_cache_size,
+    connect_args={'prepared_statement_cache_size': settings.db.statement_cache_size},
+    poolclass=InstrumentedAsyncPool,
+    pool_size=settings.db.pool_size,
+    max_overflow=settings.db.max_overflow,
+    pool_timeout=settings.db.pool_timeout,
+    pool_recycle=settings.db.pool_recycle,
+)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+instrument_queries(engine, settings.db.slow_query_ms, settings.db.slow_query_max_parameters_length)
+
+registry.callback('chat_db_pool_size', 'Configured size of the database pool.', 'gauge', lambda: engine.pool.size())
+registry.callback(
+    'chat_db_pool_checked_out', 'Database connections currently in use.', 'gauge', lambda: engine.pool.checkedout(),
+)
+registry.callback(
+    'chat_db_pool_overflow', 'Database connections open beyond the pool size.', 'gauge', lambda: engine.pool.overflow(),
+)
+registry.callback(
+    'chat_db_pool_timeouts_total', 'Checkouts that timed out waiting for a connection.', 'counter',
+    lambda: pool_stats.timeouts,
+)
+registry.callback(
+    'chat_db_slow_queries_total', 'Statements slower than the slow query threshold.', 'counter',
+    lambda: query_stats.slow_queries,
+)
+registry.callback(
+    'chat_db_compiled_cache_hits_total', 'Statements served from the compiled SQL cache.', 'counter',
+    lambda: query_stats.cache_hits,
+)
+registry.callback(
+    'chat_db_compiled_cache_misses_total', 'Statements compiled because they were not in the cache.', 'counter',
+    lambda: query_stats.cache_misses,
+)
 
 
 async def get_session() -> AsyncSession:
@@ -0,0 +1,10 @@
+from redis.asyncio import ConnectionPool, Redis
+
+from src.core.config import settings
+
+redis_pool = ConnectionPool(
+    host=settings.redis.host,
+    port=settings.redis.port,
+    max_connections=settings.redis.max_connections,
+)
+redis_client = Redis(connection_pool=redis_pool)
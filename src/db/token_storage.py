@@ -1,10 +1,19 @@
+import time
 from abc import ABC, abstractmethod
 from typing import Any, Optional
 
 from redis.asyncio import Redis
 
+from src.core.metrics import redis_command_seconds
 from src.schemas.token import TokenType
 
+_set_seconds = redis_command_seconds.labels('set')
+_get_seconds = redis_command_seconds.labels('get')
+_delete_seconds = redis_command_seconds.labels('delete')
+_add_user_token_seconds = redis_command_seconds.labels('add_user_token')
+_blacklist_seconds = redis_command_seconds.labels('blacklist_token')
+_is_blacklisted_seconds = redis_command_seconds.labels('is_token_blacklisted')
+
 
 class AsyncKeyValueStorage(ABC):
     @abstractmethod
@@ -30,11 +39,11 @@ class AsyncKeyValueStorage(ABC):
     #     pass
 
     @abstractmethod
-    async def blacklist_token(self, token: str, expire: int) -> None:
+    async def blacklist_token(self, jti: str, expire: int) -> None:
         pass
 
     @abstractmethod
-    async def is_token_blacklisted(self, token: str) -> bool:
+    async def is_token_blacklisted(self, jti: str) -> bool:
         pass
 
 
@@ -66,7 +75,9 @@ class RedisStorage(AsyncKeyValueStorage):
             value (Any): The value to store.
             expire (Optional[int]): The expiration time in seconds.
         """
+        started = time.perf_counter()
         await self.redis_client.set(key, value, ex=expire)
+        _set_seconds.observe(time.perf_counter() - started)
 
     async def get(self, key: str) -> Optional[Any]:
         """
@@ -78,7 +89,10 @@ class RedisStorage(AsyncKeyValueStorage):
         Returns:
             Optional[Any]: The retrieved value or None if the key does not exist.
         """
-        return await self.redis_client.get(key)
+        started = time.perf_counter()
+        value = await self.redis_client.get(key)
+        _get_seconds.observe(time.perf_counter() - started)
+        return value
 
     async def delete(self, key: str) -> None:
         """
@@ -87,7 +101,9 @@ class RedisStorage(AsyncKeyValueStorage):
         Args:
             key (str): The key of the value to delete.
         """
+        started = time.perf_counter()
         await self.redis_client.delete(key)
+        _delete_seconds.observe(time.perf_counter() - started)
 
     async def add_user_token(
         self, user_id: str, token: str, token_type: TokenType, expire: int,
@@ -102,10 +118,12 @@ class RedisStorage(AsyncKeyValueStorage):
             expire (int): The expiration time in seconds.
         """
         key = f"user:{user_id}:{token_type.value}_tokens"
+        started = time.perf_counter()
         async with self.redis_client.pipeline() as pipe:
             await pipe.sadd(key, token)
             await pipe.expire(key, expire)
             await pipe.execute()
+        _add_user_token_seconds.observe(time.perf_counter() - started)
 
     # async def get_user_tokens(self, user_id: str, token_type: TokenType) -> set[bytes]:
     #     """
@@ -121,26 +139,31 @@ class RedisStorage(AsyncKeyValueStorage):
     #     key = f"user:{user_id}:{token_type.value}_tokens"
     #     return await self.redis_client.smembers(key)
 
-    async def blacklist_token(self, token: str, expire: int) -> None:
+    async def blacklist_token(self, jti: str, expire: int) -> None:
         """
-        Blacklist a token by adding it to Redis with an expiration time.
+        Blacklist a token by adding its id to Redis with an expiration time.
 
         Args:
-            token (str): The token to blacklist.
+            jti (str): The id of the token to blacklist.
             expire (int): The expiration time in seconds.
         """
-        key = f"blacklist:{token}"
+        key = f"blacklist:{jti}"
+        started = time.perf_counter()
         await self.redis_client.set(key, 'revoked', ex=expire)
+        _blacklist_seconds.observe(time.perf_counter() - started)
 
-    async def is_token_blacklisted(self, token: str) -> bool:
+    async def is_token_blacklisted(self, jti: str) -> bool:
         """
         Check if a token is blacklisted.
 
         Args:
-            token (str): The token to check.
+            jti (str): The id of the token to check.
 
         Returns:
             bool: True if the token is blacklisted, False otherwise.
         """
-        key = f"blacklist:{token}"
-        return await self.redis_client.exists(key) == 1
+        key = f"blacklist:{jti}"
+        started = time.perf_counter()
+        exists = await self.redis_client.exists(key)
+        _is_blacklisted_seconds.observe(time.perf_counter() - started)
+        return exists == 1
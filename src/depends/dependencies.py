@@ -1,25 +1,26 @@
+import datetime
 import logging
 import jwt
-import redis.asyncio as redis
 
-from functools import lru_cache
 from jwt import InvalidTokenError
 
 from fastapi import Depends, HTTPException, status, Form, WebSocket, Query, WebSocketException
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Optional
 from redis.asyncio import Redis
 
 from src.core.config import settings
+from src.core.resources import Resources
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.services.users_service import CustomUserService
-from src.db.postgres import get_session
 from src.db.token_storage import RedisStorage
 from src.schemas.entity import User
 from src.schemas.token import TokenType
 from src.services.token_service import JWTManageService
-from src.managers.websocket_manager import WebSocketConnectionManager
-from src.services.history_service import CustomHistoryService
+from src.services.history_service import CustomHistoryService, HistoryCursor
+from src.services.search_service import CustomSearchService, SearchCursor
+from src.services.websocket import history_cache
 
 
 logger = logging.getLogger(__name__)
@@ -28,11 +29,28 @@ logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='api/v1/auth/signin')
 
 
-def get_pagination_params(
-    limit: int = Query(10, le=100),
-    offset: int = Query(0),
-):
-    return limit, offset
+def get_cursor_params(
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+) -> tuple[int, Optional[HistoryCursor]]:
+    if cursor is None:
+        return limit, None
+    try:
+        return limit, HistoryCursor.decode(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def get_search_cursor_params(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+) -> tuple[int, Optional[SearchCursor]]:
+    if cursor is None:
+        return limit, None
+    try:
+        return limit, SearchCursor.decode(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 async def get_token(
@@ -61,16 +79,31 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> str:
     return user_id
 
 
-@lru_cache
+def get_resources(connection: HTTPConnection) -> Resources:
+    return connection.app.state.resources
+
+
+async def get_session(resources: Annotated[Resources, Depends(get_resources)]) -> AsyncIterator[AsyncSession]:
+    async with resources.session_factory() as session:
+        yield session
+
+
 def get_user_service(
     db: AsyncSession = Depends(get_session),
 ) -> CustomUserService:
     return CustomUserService(db=db)
 
 
-@lru_cache
 def get_history_service(db: AsyncSession = Depends(get_session)) -> CustomHistoryService:
-    return CustomHistoryService(db=db)
+    return CustomHistoryService(
+        db=db,
+        cache=history_cache,
+        recent_window=datetime.timedelta(days=settings.partitions.history_recent_days),
+    )
+
+
+def get_search_service(db: AsyncSession = Depends(get_session)) -> CustomSearchService:
+    return CustomSearchService(db=db)
 
 
 async def validate_user(
@@ -86,7 +119,7 @@ async def validate_user(
             headers={'WWW-Authenticate': 'Bearer'},
         )
 
-    if not user_service.verify_password(
+    if not await user_service.verify_password(
             hashed_password=user.password,
             provided_password=password,
     ):
@@ -100,31 +133,16 @@ async def validate_user(
     return user
 
 
-def get_redis() -> Redis:
-    pool = redis.ConnectionPool(
-        host=settings.redis.host,
-        port=settings.redis.port,
-        decode_responses=True,
-    )
-    return redis.Redis(connection_pool=pool)
+def get_redis(resources: Annotated[Resources, Depends(get_resources)]) -> Redis:
+    return resources.redis
 
 
-@lru_cache
-def get_redis_storage(redis_client: Redis = Depends(get_redis)) -> RedisStorage:
-    return RedisStorage(redis_client)
+def get_redis_storage(resources: Annotated[Resources, Depends(get_resources)]) -> RedisStorage:
+    return resources.token_storage
 
 
-@lru_cache
-def get_token_service(
-    token_storage: Annotated[RedisStorage, Depends(get_redis_storage)],
-) -> JWTManageService:
-    return JWTManageService(
-        storage=token_storage,
-        secret=settings.security.secret_key,
-        algorithm=settings.security.algorithm,
-        access_token_expire_minutes=settings.security.access_token_expire_minutes,
-        refresh_token_expire_days=settings.security.refresh_token_expire_days,
-    )
+def get_token_service(resources: Annotated[Resources, Depends(get_resources)]) -> JWTManageService:
+    return resources.token_service
 
 
 async def get_current_token_payload(
@@ -132,15 +150,7 @@ async def get_current_token_payload(
     token_service: JWTManageService = Depends(get_token_service),
 ) -> dict:
     try:
-        payload = token_service.decode_jwt(
-            token=token,
-            secret_key=token_service.secret,
-            algorithm=token_service.algorithm,
-        )
-        await token_service.validate_token(
-            token=token,
-            token_type=payload.get('type'),
-        )
+        payload = await token_service.validate_token(token=token)
     except InvalidTokenError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -149,11 +159,6 @@ async def get_current_token_payload(
     return payload
 
 
-@lru_cache
-def get_websocket_manager() -> WebSocketConnectionManager:
-    return WebSocketConnectionManager()
-
-
 class UserGetterFromToken:
     def __init__(
         self,
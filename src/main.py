@@ -2,13 +2,21 @@ import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 
 from api.v1.websocket import router as websocket_router
 from api.v1.auth import router as auth_router
 from api.v1.history import router as history_router
-from core.logger import LOGGING
-from db.postgres import get_session
+from api.v1.search import router as search_router
+from api.v1.stats import router as stats_router
+from src.core.config import settings
+from src.core.metrics import HttpMetricsMiddleware, registry
+from src.core.resources import Resources
+from src.db.partitions import PartitionMaintainer
+from src.services.message_writer import message_writer
+from src.services.password_hasher import password_hasher
+from src.services.token_cache import revocation_list
+from src.services.websocket import presence_service, websocket_manager
 
 
 logger = logging.getLogger(__name__)
@@ -17,9 +25,29 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info('Application is started')
-    pg_session = get_session()
+    resources = Resources.create()
+    await resources.warm_up(
+        postgres_connections=settings.db.warm_up_connections,
+        redis_connections=settings.redis.warm_up_connections,
+    )
+    app.state.resources = resources
+    if settings.partitions.create_on_startup:
+        try:
+            await PartitionMaintainer(resources.engine).create_ahead(settings.partitions.months_ahead)
+        except Exception as e:
+            # The default partition still takes the rows; the daily job retries.
+            logger.error(f'Could not create the message partitions: {e}')
+    await websocket_manager.start()
+    await presence_service.start()
+    await message_writer.start()
+    await revocation_list.start()
     yield
-    await pg_session.aclose()
+    await revocation_list.stop()
+    await message_writer.stop()
+    await presence_service.stop()
+    await websocket_manager.stop()
+    await password_hasher.shutdown()
+    await resources.close()
     logger.info('Application is stopped')
 
 
@@ -31,9 +59,13 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(HttpMetricsMiddleware)
+
 app.include_router(websocket_router, prefix='/api/v1/ws', tags=['ws'])
 app.include_router(auth_router, prefix='/api/v1/auth', tags=['auth'])
 app.include_router(history_router, prefix='/api/v1', tags=['history'])
+app.include_router(search_router, prefix='/api/v1', tags=['search'])
+app.include_router(stats_router, prefix='/api/v1', tags=['stats'])
 
 
 @app.get('/health')
@@ -47,6 +79,17 @@ async def health():
     return {'status': 'healthy'}
 
 
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics endpoint in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: The current values of all registered metrics.
+    """
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     import uvicorn
 
@@ -54,6 +97,8 @@ if __name__ == '__main__':
         app,
         host='0.0.0.0',
         port=8000,
-        log_config=LOGGING,
+        # Logging is configured on import of the settings; uvicorn's records go through the same queue.
+        log_config=None,
         log_level=logging.DEBUG,
+        ws_per_message_deflate=settings.websocket.per_message_deflate,
     )
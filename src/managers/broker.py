@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+BrokerListener = Callable[[str, bytes], Awaitable[None]]
+GapListener = Callable[[], None]
+
+
+class MessageBroker(ABC):
+    """
+    Abstract pub/sub backend used to fan messages out between application nodes.
+
+    A node subscribes only to the channels it currently has local recipients for,
+    and every message published on such a channel is passed to the listener.
+    """
+
+    def __init__(self) -> None:
+        self._listener: Optional[BrokerListener] = None
+        self._gap_listener: Optional[GapListener] = None
+
+    def set_listener(self, listener: BrokerListener) -> None:
+        """
+        Set the coroutine called for every message received on a subscribed channel.
+
+        Args:
+            listener (BrokerListener): The coroutine accepting channel name and raw message.
+        """
+        self._listener = listener
+
+    def set_gap_listener(self, listener: GapListener) -> None:
+        """
+        Set the callback called when messages of subscribed channels may have been missed.
+
+        Args:
+            listener (GapListener): The callback.
+        """
+        self._gap_listener = listener
+
+    def _notify_gap(self) -> None:
+        if self._gap_listener is None:
+            return
+        try:
+            self._gap_listener()
+        except Exception as e:
+            logger.error(f'Error handling broker gap: {e}')
+
+    async def _dispatch(self, channel: str, message: bytes) -> None:
+        if self._listener is None:
+            return
+        try:
+            await self._listener(channel, message)
+        except Exception as e:
+            logger.error(f'Error handling broker message on {channel}: {e}')
+
+    @abstractmethod
+    async def start(self) -> None:
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, message: bytes) -> None:
+        pass
+
+    @abstractmethod
+    async def subscribe(self, *channels: str) -> None:
+        pass
+
+    @abstractmethod
+    async def unsubscribe(self, *channels: str) -> None:
+        pass
+
+
+class InMemoryHub:
+    """
+    Process-local channel registry shared by InMemoryBroker instances.
+
+    Several brokers attached to one hub behave like separate nodes talking
+    through a real pub/sub server, which is handy for tests.
+    """
+
+    def __init__(self) -> None:
+        self.subscribers: dict[str, set['InMemoryBroker']] = {}
+
+
+class InMemoryBroker(MessageBroker):
+    """
+    In-memory broker implementation for tests and single-process deployments.
+    """
+
+    def __init__(self, hub: Optional[InMemoryHub] = None) -> None:
+        """
+        Initialize the InMemoryBroker.
+
+        Args:
+            hub (Optional[InMemoryHub]): The hub to attach to. A private hub is created if omitted.
+        """
+        super().__init__()
+        self.hub = hub or InMemoryHub()
+        self.channels: set[str] = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        await self.unsubscribe(*self.channels)
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        for broker in list(self.hub.subscribers.get(channel, ())):
+            await broker._dispatch(channel, message)
+
+    async def subscribe(self, *channels: str) -> None:
+        for channel in channels:
+            self.hub.subscribers.setdefault(channel, set()).add(self)
+            self.channels.add(channel)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        for channel in list(channels):
+            subscribers = self.hub.subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self.hub.subscribers[channel]
+            self.channels.discard(channel)
+
+
+class RedisBroker(MessageBroker):
+    """
+    Redis pub/sub broker implementation.
+
+    Attributes:
+        redis_client (Redis): The Redis client used for publishing and subscribing.
+    """
+
+    def __init__(self, redis_client: Redis, poll_timeout: float = 1.0) -> None:
+        """
+        Initialize the RedisBroker.
+
+        Args:
+            redis_client (Redis): The Redis client instance.
+            poll_timeout (float): How long a single read from the subscription waits, in seconds.
+        """
+        super().__init__()
+        if redis_client is None:
+            raise ValueError('Redis client is required')
+        self.redis_client = redis_client
+        self.poll_timeout = poll_timeout
+        self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        await self._pubsub.aclose()
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self.redis_client.publish(channel, message)
+
+    async def subscribe(self, *channels: str) -> None:
+        if channels:
+            await self._pubsub.subscribe(*channels)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        if channels:
+            await self._pubsub.unsubscribe(*channels)
+
+    async def _read_loop(self) -> None:
+        failed = False
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(self.poll_timeout)
+                continue
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.poll_timeout,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Error reading from redis pub/sub: {e}')
+                # Messages published until the subscription is restored are lost.
+                failed = True
+                self._notify_gap()
+                await asyncio.sleep(self.poll_timeout)
+                continue
+            if failed:
+                failed = False
+                logger.info('Redis pub/sub reading resumed')
+                self._notify_gap()
+            if message is None or message['type'] != 'message':
+                continue
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            await self._dispatch(channel, message['data'])
@@ -0,0 +1,99 @@
+from uuid import UUID
+
+
+class ChatMembershipIndex:
+    """
+    In-memory index of the chats of users that are online on this node.
+
+    It maps every chat to its locally connected members and every local user
+    to their chats, so delivering a chat message touches only the sockets of
+    online members and needs no database round trip.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty index.
+        """
+        self.chat_users: dict[UUID, set[UUID]] = {}
+        self.user_chats: dict[UUID, set[UUID]] = {}
+
+    def __len__(self) -> int:
+        return len(self.chat_users)
+
+    def __contains__(self, chat_id: UUID) -> bool:
+        return chat_id in self.chat_users
+
+    def add(self, user_id: UUID, chat_id: UUID) -> bool:
+        """
+        Add a user to a chat.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+
+        Returns:
+            bool: True if the chat had no local members before.
+        """
+        self.user_chats.setdefault(user_id, set()).add(chat_id)
+        members = self.chat_users.get(chat_id)
+        if members is None:
+            self.chat_users[chat_id] = {user_id}
+            return True
+        members.add(user_id)
+        return False
+
+    def remove(self, user_id: UUID, chat_id: UUID) -> bool:
+        """
+        Remove a user from a chat.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+
+        Returns:
+            bool: True if the chat has no local members left.
+        """
+        chats = self.user_chats.get(user_id)
+        if chats is not None:
+            chats.discard(chat_id)
+            if not chats:
+                del self.user_chats[user_id]
+
+        members = self.chat_users.get(chat_id)
+        if members is None:
+            return False
+        members.discard(user_id)
+        if not members:
+            del self.chat_users[chat_id]
+            return True
+        return False
+
+    def remove_user(self, user_id: UUID) -> list[UUID]:
+        """
+        Remove a user from all of their chats.
+
+        Args:
+            user_id (UUID): The user's identifier.
+
+        Returns:
+            list[UUID]: The chats that have no local members left.
+        """
+        emptied = []
+        for chat_id in self.user_chats.pop(user_id, ()):
+            members = self.chat_users.get(chat_id)
+            if members is None:
+                continue
+            members.discard(user_id)
+            if not members:
+                del self.chat_users[chat_id]
+                emptied.append(chat_id)
+        return emptied
+
+    def members(self, chat_id: UUID) -> set[UUID]:
+        return self.chat_users.get(chat_id, set())
+
+    def chats(self, user_id: UUID) -> set[UUID]:
+        return self.user_chats.get(user_id, set())
+
+    def is_member(self, user_id: UUID, chat_id: UUID) -> bool:
+        return chat_id in self.user_chats.get(user_id, ())
@@ -0,0 +1,142 @@
+import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Iterable, Optional, Union
+from uuid import UUID
+
+import orjson
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is an optional dependency
+    msgpack = None
+
+
+class FrameDecodeError(ValueError):
+    """
+    A frame that could not be decoded or does not match its action's schema.
+
+    Attributes:
+        action (Optional[str]): The frame's action if it was recognized.
+        details (Optional[list[dict]]): The schema violations of the payload.
+    """
+
+    def __init__(self, message: str, action: Optional[str] = None, details: Optional[list[dict]] = None) -> None:
+        super().__init__(message)
+        self.action = action
+        self.details = details
+
+
+class FrameCodec(ABC):
+    """
+    Wire format of WebSocket frames, negotiated through the subprotocol header.
+    """
+
+    subprotocol: str
+    binary: bool
+
+    @abstractmethod
+    def encode(self, frame: dict) -> Union[str, bytes]:
+        pass
+
+    @abstractmethod
+    def decode(self, data: Union[str, bytes]) -> dict:
+        pass
+
+
+class OrjsonCodec(FrameCodec):
+    """
+    JSON text frames encoded and decoded with orjson.
+    """
+
+    subprotocol = 'chat.v1.json'
+    binary = False
+
+    def encode(self, frame: dict) -> str:
+        return orjson.dumps(frame).decode('utf-8')
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        try:
+            frame = orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise FrameDecodeError(f'Invalid JSON frame: {e}') from e
+        if not isinstance(frame, dict):
+            raise FrameDecodeError('Frame must be an object')
+        return frame
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+class MsgpackCodec(FrameCodec):
+    """
+    MessagePack binary frames. UUIDs and datetimes are sent as strings.
+    """
+
+    subprotocol = 'chat.v1.msgpack'
+    binary = True
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise RuntimeError('msgpack is not installed')
+
+    def encode(self, frame: dict) -> bytes:
+        return msgpack.packb(frame, default=_msgpack_default)
+
+    def decode(self, data: Union[str, bytes]) -> dict:
+        if isinstance(data, str):
+            return json_codec.decode(data)
+        try:
+            frame = msgpack.unpackb(data)
+        except (ValueError, TypeError) as e:
+            raise FrameDecodeError(f'Invalid msgpack frame: {e}') from e
+        if not isinstance(frame, dict):
+            raise FrameDecodeError('Frame must be a map')
+        return frame
+
+
+json_codec = OrjsonCodec()
+
+CODECS: dict[str, FrameCodec] = {json_codec.subprotocol: json_codec}
+if msgpack is not None:
+    CODECS[MsgpackCodec.subprotocol] = MsgpackCodec()
+
+
+def negotiate_codec(subprotocols: Iterable[str]) -> tuple[FrameCodec, Optional[str]]:
+    """
+    Pick the codec for a connection from the subprotocols offered by the client.
+
+    Args:
+        subprotocols (Iterable[str]): The subprotocols in the client's order of preference.
+
+    Returns:
+        tuple[FrameCodec, Optional[str]]: The codec and the subprotocol to accept,
+        which is None if the client offered none of ours.
+    """
+    for subprotocol in subprotocols:
+        codec = CODECS.get(subprotocol)
+        if codec is not None:
+            return codec, subprotocol
+    return json_codec, None
+
+
+class OutboundFrame:
+    """
+    A frame sent to many connections, encoded at most once per codec.
+    """
+
+    __slots__ = ('data', '_encoded')
+
+    def __init__(self, data: dict) -> None:
+        self.data = data
+        self._encoded: dict[str, Union[str, bytes]] = {}
+
+    def encode(self, codec: FrameCodec) -> Union[str, bytes]:
+        encoded = self._encoded.get(codec.subprotocol)
+        if encoded is None:
+            encoded = self._encoded[codec.subprotocol] = codec.encode(self.data)
+        return encoded
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import deque
+from enum import Enum
+from typing import Optional, Union
+from uuid import UUID
+
+from fastapi import WebSocket, status
+
+from src.managers.codecs import FrameCodec, OutboundFrame, json_codec
+from src.managers.rate_limit import ConnectionRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = 'drop_oldest'
+    COALESCE = 'coalesce'
+    DISCONNECT = 'disconnect'
+
+
+class SendQueueStats:
+    """
+    Counters shared by all outbound queues of a connection manager.
+    """
+
+    __slots__ = ('sent', 'dropped', 'coalesced', 'disconnected')
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.disconnected = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class WebSocketConnection:
+    """
+    A WebSocket with its own bounded outbound queue.
+
+    Frames are queued without waiting and written to the socket by a
+    dedicated writer task, so a slow client only delays its own messages.
+    The writer encodes frames with the codec negotiated for the connection.
+    When the queue is full the overflow policy decides what happens:
+
+    - drop_oldest: the oldest queued message is discarded;
+    - coalesce: a queued message with the same coalesce key is replaced by
+      the new one, otherwise the oldest queued message is discarded;
+    - disconnect: the queue is cleared and the socket is closed.
+    """
+
+    def __init__(
+        self,
+        user_id: UUID,
+        websocket: WebSocket,
+        max_queue_size: int,
+        overflow_policy: OverflowPolicy,
+        stats: SendQueueStats,
+        codec: FrameCodec = json_codec,
+        rate_limiter: Optional[ConnectionRateLimiter] = None,
+    ) -> None:
+        """
+        Initialize the connection.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            websocket (WebSocket): The underlying WebSocket.
+            max_queue_size (int): The maximum number of queued outbound messages.
+            overflow_policy (OverflowPolicy): What to do when the queue is full.
+            stats (SendQueueStats): The counters to update.
+            codec (FrameCodec): The wire format of the connection.
+            rate_limiter (Optional[ConnectionRateLimiter]): The token buckets of the connection's actions.
+        """
+        if max_queue_size <= 0:
+            raise ValueError('max_queue_size must be greater than 0')
+        self.user_id = user_id
+        self.websocket = websocket
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.stats = stats
+        self.codec = codec
+        self.rate_limiter = rate_limiter
+        self.closed = False
+        self._queue: deque[tuple[Optional[str], OutboundFrame]] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._closer: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        """
+        Start the writer task.
+        """
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self, code: Optional[int] = None) -> None:
+        """
+        Stop the writer task and optionally close the socket.
+
+        Args:
+            code (Optional[int]): The close code. The socket is left as is if omitted.
+        """
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self._writer = None
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception as e:
+                logger.debug(f'Error closing websocket for {self.user_id=}: {e}')
+
+    def send(self, frame: Union[OutboundFrame, dict], coalesce_key: Optional[str] = None) -> bool:
+        """
+        Queue a frame for the writer task without waiting.
+
+        Args:
+            frame (Union[OutboundFrame, dict]): The frame to send.
+            coalesce_key (Optional[str]): Frames with equal keys may replace each other on overflow.
+
+        Returns:
+            bool: False if the frame was not queued.
+        """
+        if self.closed:
+            return False
+        if not isinstance(frame, OutboundFrame):
+            frame = OutboundFrame(frame)
+
+        if len(self._queue) >= self.max_queue_size:
+            if self.overflow_policy is OverflowPolicy.DISCONNECT:
+                self.stats.dropped += len(self._queue) + 1
+                self.stats.disconnected += 1
+                logger.warning(f'Disconnect slow consumer {self.user_id=}')
+                self.closed = True
+                self._queue.clear()
+                self._closer = asyncio.create_task(self.close(code=status.WS_1013_TRY_AGAIN_LATER))
+                return False
+
+            if self.overflow_policy is OverflowPolicy.COALESCE and coalesce_key is not None:
+                for index, (key, _) in enumerate(self._queue):
+                    if key == coalesce_key:
+                        self._queue[index] = (coalesce_key, frame)
+                        self.stats.coalesced += 1
+                        return True
+
+            self._queue.popleft()
+            self.stats.dropped += 1
+
+        self._queue.append((coalesce_key, frame))
+        self._ready.set()
+        return True
+
+    async def _write_loop(self) -> None:
+        while True:
+            while not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+            _, frame = self._queue.popleft()
+            try:
+                if self.codec.binary:
+                    await self.websocket.send_bytes(frame.encode(self.codec))
+                else:
+                    await self.websocket.send_text(frame.encode(self.codec))
+            except Exception as e:
+                logger.debug(f'Stop writing to websocket for {self.user_id=}: {e}')
+                self.closed = True
+                self._queue.clear()
+                return
+            self.stats.sent += 1
@@ -0,0 +1,160 @@
+import logging
+import time
+import uuid
+from typing import Optional
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACTION = '*'
+
+# Trims the window, then admits the call if fewer than the limit fall in it.
+# Otherwise returns when the oldest call in the window leaves it, in seconds.
+# Redis time is used so nodes with skewed clocks share one window.
+SLIDING_WINDOW_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local window = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+    return '0'
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return tostring(tonumber(oldest[2]) + window - now)
+"""
+
+
+class TokenBucket:
+    """
+    Allows rate calls per second on average with bursts of up to capacity calls.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: int, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def acquire(self, now: float) -> float:
+        """
+        Take a token if one is available.
+
+        Args:
+            now (float): The current monotonic time.
+
+        Returns:
+            float: 0 if the call is allowed, otherwise the seconds until a token is available.
+        """
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if tokens >= 1:
+            self.tokens = tokens - 1
+            return 0.0
+        self.tokens = tokens
+        return (1 - tokens) / self.rate
+
+
+class ConnectionRateLimiter:
+    """
+    Token buckets of one connection, one per limited action.
+
+    Actions without their own limit share the bucket of the '*' limit; if
+    there is no '*' limit they are not limited.
+    """
+
+    __slots__ = ('limits', 'buckets')
+
+    def __init__(self, limits: dict[str, tuple[float, int]]) -> None:
+        """
+        Initialize the ConnectionRateLimiter.
+
+        Args:
+            limits (dict[str, tuple[float, int]]): The rate per second and the burst per action name.
+        """
+        self.limits = limits
+        self.buckets: dict[str, TokenBucket] = {}
+
+    def acquire(self, action: str) -> float:
+        """
+        Count a call of an action.
+
+        Args:
+            action (str): The action name.
+
+        Returns:
+            float: 0 if the call is allowed, otherwise the seconds to wait before retrying.
+        """
+        bucket = self.buckets.get(action)
+        if bucket is None:
+            if action not in self.limits:
+                action = DEFAULT_ACTION
+                bucket = self.buckets.get(action)
+            if bucket is None:
+                limit = self.limits.get(action)
+                if limit is None:
+                    return 0.0
+                rate, burst = limit
+                bucket = self.buckets[action] = TokenBucket(rate, burst, time.monotonic())
+        return bucket.acquire(time.monotonic())
+
+
+class SlidingWindowLimiter:
+    """
+    Per-user limits shared by all nodes, kept as Redis sorted sets of call times.
+
+    Only actions with a configured limit cost a Redis round trip. When Redis
+    is unavailable calls are let through rather than failing the action.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        limits: dict[str, tuple[int, float]],
+        key_prefix: str = 'rate',
+    ) -> None:
+        """
+        Initialize the SlidingWindowLimiter.
+
+        Args:
+            redis_client (Redis): The Redis client.
+            limits (dict[str, tuple[int, float]]): The maximum number of calls and the window
+                in seconds per action name.
+            key_prefix (str): The prefix of the Redis keys.
+        """
+        self.redis_client = redis_client
+        self.limits = limits
+        self.key_prefix = key_prefix
+        self._script = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def key(self, user_id: UUID, action: str) -> str:
+        return f'{self.key_prefix}:{action}:{user_id}'
+
+    async def acquire(self, user_id: UUID, action: str) -> float:
+        """
+        Count a call of an action by a user.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            action (str): The action name.
+
+        Returns:
+            float: 0 if the call is allowed, otherwise the seconds to wait before retrying.
+        """
+        limit: Optional[tuple[int, float]] = self.limits.get(action)
+        if limit is None:
+            return 0.0
+        calls, window = limit
+        try:
+            retry_after = await self._script(
+                keys=[self.key(user_id, action)], args=[window, calls, uuid.uuid4().hex],
+            )
+        except Exception as e:
+            logger.error(f'Rate limit check of {action} for {user_id} failed: {e}')
+            return 0.0
+        return max(0.0, float(retry_after))
@@ -1,7 +1,20 @@
+import functools
+import inspect
 import logging
-from fastapi import WebSocket
-from uuid import UUID
-from typing import Callable
+import time
+from fastapi import WebSocket, status
+from uuid import UUID, uuid4
+from typing import Annotated, Any, Awaitable, Callable, Iterable, Literal, Optional, Union
+
+import orjson
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, create_model
+
+from src.core.metrics import ws_handler_errors_total, ws_handler_seconds
+from src.managers.broker import InMemoryBroker, MessageBroker
+from src.managers.chat_index import ChatMembershipIndex
+from src.managers.codecs import FrameCodec, FrameDecodeError, OutboundFrame, json_codec
+from src.managers.connection import OverflowPolicy, SendQueueStats, WebSocketConnection
+from src.managers.rate_limit import ConnectionRateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -12,22 +25,76 @@ class WebSocketConnectionManager:
 
     This class manages active WebSocket connections for users,
     allowing them to connect, disconnect, and send messages.
+
+    Messages are fanned out through a broker: the node delivers to its own
+    sockets right away and publishes the message on the user or chat channel,
+    so other nodes holding sockets for the same recipients deliver it as well.
+    A node is subscribed only to the channels of users and chats it holds.
+
+    Every connection owns a bounded outbound queue drained by its own writer
+    task, so sending never waits for a client.
+
+    The chats of online users are kept in a ChatMembershipIndex, so a chat
+    message is delivered only to the sockets of its online members.
+    chat_message_listeners are called for chat messages published by other
+    nodes and chat_release_listeners when this node stops receiving a chat.
+    broker_gap_listeners are called when the broker may have missed messages,
+    so state kept complete from them must be dropped.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        broker: Optional[MessageBroker] = None,
+        channel_prefix: str = 'chat_sphere',
+        send_queue_size: int = 256,
+        overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        connection_rate_limits: Optional[dict[str, tuple[float, int]]] = None,
+    ) -> None:
         """
         Initialize the connection manager.
 
         Creates a dictionary to store active connections and a dictionary for
         storing action handlers.
+
+        Args:
+            broker (Optional[MessageBroker]): The pub/sub backend. Defaults to an in-memory broker.
+            channel_prefix (str): The prefix of every broker channel name.
+            send_queue_size (int): The maximum number of queued outbound messages per connection.
+            overflow_policy (OverflowPolicy): What to do when a connection's queue is full.
+            connection_rate_limits (Optional[dict[str, tuple[float, int]]]): The rate per second and the burst
+                of every connection per action name. Connections are not limited if omitted.
         """
-        self.active_connections: dict[UUID, set[WebSocket]] = {}
+        self.active_connections: dict[UUID, set[WebSocketConnection]] = {}
+        self.chat_index = ChatMembershipIndex()
         self.handlers: dict[str, Callable] = {}
+        self.frame_models: dict[str, type[BaseModel]] = {}
+        self._frame_adapter: Optional[TypeAdapter] = None
+        self.chat_message_listeners: list[Callable[[UUID, dict], Awaitable[None]]] = []
+        self.chat_release_listeners: list[Callable[[UUID], None]] = []
+        self.user_online_listeners: list[Callable[[UUID], None]] = []
+        self.user_offline_listeners: list[Callable[[UUID, list[UUID]], None]] = []
+        self.broker_gap_listeners: list[Callable[[], None]] = []
+        self.node_id = uuid4().hex
+        self.channel_prefix = channel_prefix
+        self.broker = broker or InMemoryBroker()
+        self.broker.set_listener(self._on_broker_message)
+        self.broker.set_gap_listener(self._on_broker_gap)
+        self.send_queue_size = send_queue_size
+        self.overflow_policy = OverflowPolicy(overflow_policy)
+        self.connection_rate_limits = connection_rate_limits
+        self.send_stats = SendQueueStats()
 
     def handler(self, action: str) -> Callable:
         """
         Decorator for registering action handlers.
 
+        A handler takes the validated payload as its payload argument, annotated
+        with the pydantic model of the payload, and the user_id and db keywords.
+        The frame model {type: action, payload: model} is built here, once, so
+        dispatch validates a frame in a single pass with decode_frame.
+
+        The registered handler records its latency and errors per action.
+
         Args:
             action (str): The name of the action for which the handler is registered.
 
@@ -35,49 +102,355 @@ class WebSocketConnectionManager:
             Callable: The wrapped handler function.
         """
         def wrapper(func: Callable) -> Callable:
-            self.handlers[action] = func
+            param = inspect.signature(func).parameters.get('payload')
+            schema = param.annotation if param is not None else None
+            if not (inspect.isclass(schema) and issubclass(schema, BaseModel)):
+                raise TypeError(f'Handler of {action} must annotate its payload with a pydantic model')
+            latency = ws_handler_seconds.labels(action)
+            errors = ws_handler_errors_total.labels(action)
+
+            @functools.wraps(func)
+            async def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    latency.observe(time.perf_counter() - started)
+
+            self.handlers[action] = timed
+            # A missing payload is validated as an empty object, so only actions without required fields accept it.
+            self.frame_models[action] = create_model(
+                f'{schema.__name__}Frame',
+                type=(Literal[action], ...),
+                payload=(schema, Field(default_factory=dict, validate_default=True)),
+            )
+            self._frame_adapter = None
             return func
         return wrapper
 
-    async def connect(self, user_id: UUID, websocket: WebSocket) -> None:
+    @property
+    def frame_adapter(self) -> TypeAdapter:
+        """
+        The validator of all registered frames, a union tagged by the type field.
+
+        Built on first use after the last registration.
+        """
+        if self._frame_adapter is None:
+            models = tuple(self.frame_models.values())
+            frame = models[0] if len(models) == 1 else Annotated[Union[models], Field(discriminator='type')]
+            self._frame_adapter = TypeAdapter(frame)
+        return self._frame_adapter
+
+    def decode_frame(self, raw: Union[str, bytes], codec: FrameCodec) -> tuple[str, Any]:
+        """
+        Decode a frame and validate its payload against its action's model.
+
+        JSON frames are parsed and validated by pydantic in one pass, without
+        building an intermediate dict; other codecs decode first.
+
+        Args:
+            raw (Union[str, bytes]): The raw frame.
+            codec (FrameCodec): The codec of the frame.
+
+        Returns:
+            tuple[str, Any]: The action and its validated payload.
+
+        Raises:
+            FrameDecodeError: If the frame is malformed, has an unknown type or an invalid payload.
+        """
+        try:
+            if codec is json_codec:
+                frame = self.frame_adapter.validate_json(raw)
+            else:
+                frame = self.frame_adapter.validate_python(codec.decode(raw))
+        except ValidationError as e:
+            raise self._frame_error(e) from e
+        return frame.type, frame.payload
+
+    def _frame_error(self, e: ValidationError) -> FrameDecodeError:
+        error = e.errors(include_url=False)[0]
+        loc = error['loc']
+        if not loc:
+            if error['type'] == 'union_tag_not_found':
+                return FrameDecodeError('No type in message')
+            if error['type'] == 'union_tag_invalid':
+                return FrameDecodeError('No handler for this action', action=str(error['ctx']['tag']))
+            return FrameDecodeError('Wrong message format')
+        if loc == ('type',):
+            if error['type'] == 'missing':
+                return FrameDecodeError('No type in message')
+            return FrameDecodeError('No handler for this action', action=str(error['input']))
+
+        # Errors of a tagged union are located under the tag, those of a single model are not.
+        if loc[0] == 'payload':
+            action, offset = next(iter(self.frame_models)), 1
+        else:
+            action, offset = loc[0], 2
+        details = [
+            {'loc': list(item['loc'][offset:]), 'msg': item['msg']}
+            for item in e.errors(include_url=False, include_input=False, include_context=False)
+        ]
+        return FrameDecodeError('Invalid payload', action=action, details=details)
+
+    def user_channel(self, user_id: UUID) -> str:
+        return f'{self.channel_prefix}:user:{user_id}'
+
+    def chat_channel(self, chat_id: UUID) -> str:
+        return f'{self.channel_prefix}:chat:{chat_id}'
+
+    async def start(self) -> None:
+        """
+        Start receiving messages from the broker.
+        """
+        await self.broker.start()
+
+    async def stop(self) -> None:
+        """
+        Stop the broker and drop its subscriptions.
+        """
+        await self.broker.stop()
+
+    async def connect(
+        self,
+        user_id: UUID,
+        websocket: WebSocket,
+        codec: FrameCodec = json_codec,
+        subprotocol: Optional[str] = None,
+    ) -> WebSocketConnection:
         """
         Establish a WebSocket connection for a user.
 
         Args:
             user_id (UUID): The user's identifier.
             websocket (WebSocket): The WebSocket object for the connection.
+            codec (FrameCodec): The negotiated wire format.
+            subprotocol (Optional[str]): The subprotocol to confirm to the client.
+
+        Returns:
+            WebSocketConnection: The connection wrapping the accepted WebSocket.
         """
+        # Accept before registering, so a failed handshake leaves nothing behind.
+        await websocket.accept(subprotocol=subprotocol)
+        connection = WebSocketConnection(
+            user_id=user_id,
+            websocket=websocket,
+            max_queue_size=self.send_queue_size,
+            overflow_policy=self.overflow_policy,
+            stats=self.send_stats,
+            codec=codec,
+            rate_limiter=ConnectionRateLimiter(self.connection_rate_limits) if self.connection_rate_limits else None,
+        )
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
-        await websocket.accept()
-        self.active_connections[user_id].add(websocket)
+            try:
+                await self.broker.subscribe(self.user_channel(user_id))
+            except Exception:
+                # Other sockets of the user may have registered while subscribing; they keep the entry.
+                if not self.active_connections.get(user_id):
+                    self.active_connections.pop(user_id, None)
+                await connection.close(code=status.WS_1011_INTERNAL_ERROR)
+                raise
+        connection.start()
+        self.active_connections[user_id].add(connection)
+        if len(self.active_connections[user_id]) == 1:
+            for listener in self.user_online_listeners:
+                listener(user_id)
         logger.debug(f"Connect for {user_id=} connections: {len(self.active_connections[user_id])}")
+        return connection
 
-    async def disconnect(self, user_id: UUID, websocket: WebSocket) -> None:
+    async def disconnect(self, user_id: UUID, connection: WebSocketConnection) -> None:
         """
         Disconnect a WebSocket connection for a user.
 
         Args:
             user_id (UUID): The user's identifier.
-            websocket (WebSocket): The WebSocket object for the disconnection.
+            connection (WebSocketConnection): The connection to drop.
         """
-        self.active_connections[user_id].remove(websocket)
-        logger.info(f"Disconnect for {user_id=} connections: {len(self.active_connections[user_id])}")
+        await connection.close()
+        connections = self.active_connections.get(user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        logger.info(f"Disconnect for {user_id=} connections: {len(connections)}")
 
-        if not self.active_connections[user_id]:
+        if not connections:
             del self.active_connections[user_id]
+            channels = [self.user_channel(user_id)]
+            chat_ids = list(self.chat_index.chats(user_id))
+            for chat_id in self.chat_index.remove_user(user_id):
+                channels.append(self.chat_channel(chat_id))
+                self._release_chat(chat_id)
+            for listener in self.user_offline_listeners:
+                listener(user_id, chat_ids)
+            await self.broker.unsubscribe(*channels)
+
+    async def join_chats(self, user_id: UUID, chat_ids: Iterable[UUID]) -> None:
+        """
+        Register a locally connected user as a recipient of chats' messages.
 
-    async def send_message(self, user_id: UUID, message: str, current_websocket: WebSocket) -> None:
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_ids (Iterable[UUID]): The chats' identifiers.
+        """
+        if user_id not in self.active_connections:
+            return
+        channels = [
+            self.chat_channel(chat_id)
+            for chat_id in chat_ids
+            if self.chat_index.add(user_id, chat_id)
+        ]
+        if channels:
+            await self.broker.subscribe(*channels)
+
+    async def join_chat(self, user_id: UUID, chat_id: UUID) -> None:
+        """
+        Register a locally connected user as a recipient of a chat's messages.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+        """
+        await self.join_chats(user_id, (chat_id,))
+
+    async def leave_chat(self, user_id: UUID, chat_id: UUID) -> None:
+        """
+        Stop delivering a chat's messages to a local user.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+        """
+        if self.chat_index.remove(user_id, chat_id):
+            self._release_chat(chat_id)
+            await self.broker.unsubscribe(self.chat_channel(chat_id))
+
+    async def add_to_chat(self, user_id: UUID, chat_id: UUID) -> None:
+        """
+        Make a user a recipient of a chat's messages on every node holding their sockets.
+
+        Called after the user became a member of the chat in the database.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+        """
+        await self.join_chat(user_id, chat_id)
+        await self._publish(self.user_channel(user_id), None, control={'join_chat': str(chat_id)})
+
+    async def send_message(
+        self,
+        user_id: UUID,
+        message: dict,
+        current_connection: Optional[WebSocketConnection] = None,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
         """
         Send a message to all connected WebSockets except the current one.
 
+        Sockets on this node get the message queued directly, sockets on other
+        nodes get it through the user's broker channel.
+
         Args:
             user_id (UUID): The user's identifier.
-            message (str): The message to send.
-            current_websocket (WebSocket): The current WebSocket that should not receive the message.
-        """
-        if user_id in self.active_connections:
-            for websocket in self.active_connections[user_id]:
-                if websocket != current_websocket:
-                    await websocket.send_text(message)
-                    logger.info(f"Send message {message} for {websocket=}.")
+            message (dict): The frame to send.
+            current_connection (Optional[WebSocketConnection]): The connection that should not receive the message.
+            coalesce_key (Optional[str]): Queued messages with the same key may be replaced on overflow.
+        """
+        self._deliver_to_user(user_id, OutboundFrame(message), current_connection, coalesce_key)
+        await self._publish(self.user_channel(user_id), message, coalesce_key)
+
+    async def send_chat_message(self, chat_id: UUID, message: dict, coalesce_key: Optional[str] = None) -> None:
+        """
+        Send a message to every online member of a chat on every node.
+
+        The frame is encoded at most once per codec, however many sockets get it.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            message (dict): The frame to send.
+            coalesce_key (Optional[str]): Queued messages with the same key may be replaced on overflow.
+        """
+        self._deliver_to_chat(chat_id, OutboundFrame(message), coalesce_key)
+        await self._publish(self.chat_channel(chat_id), message, coalesce_key)
+
+    def stats(self) -> dict:
+        """
+        Collect outbound queue statistics.
+
+        Returns:
+            dict: Connection counts, queue depths and the send counters.
+        """
+        depths = [
+            connection.queue_depth
+            for connections in self.active_connections.values()
+            for connection in connections
+        ]
+        return {
+            'users': len(self.active_connections),
+            'connections': len(depths),
+            'chats': len(self.chat_index),
+            'queue_depth_total': sum(depths),
+            'queue_depth_max': max(depths, default=0),
+            'queue_size': self.send_queue_size,
+            'overflow_policy': self.overflow_policy.value,
+            **self.send_stats.as_dict(),
+        }
+
+    def _on_broker_gap(self) -> None:
+        for listener in self.broker_gap_listeners:
+            listener()
+
+    def _release_chat(self, chat_id: UUID) -> None:
+        for listener in self.chat_release_listeners:
+            listener(chat_id)
+
+    def _deliver_to_user(
+        self,
+        user_id: UUID,
+        frame: OutboundFrame,
+        exclude: Optional[WebSocketConnection] = None,
+        coalesce_key: Optional[str] = None,
+    ) -> None:
+        for connection in self.active_connections.get(user_id, ()):
+            if connection is not exclude:
+                connection.send(frame, coalesce_key)
+
+    def _deliver_to_chat(self, chat_id: UUID, frame: OutboundFrame, coalesce_key: Optional[str] = None) -> None:
+        for user_id in self.chat_index.members(chat_id):
+            self._deliver_to_user(user_id, frame, coalesce_key=coalesce_key)
+
+    async def _publish(
+        self,
+        channel: str,
+        message: Optional[dict],
+        coalesce_key: Optional[str] = None,
+        control: Optional[dict] = None,
+    ) -> None:
+        envelope = orjson.dumps({'origin': self.node_id, 'data': message, 'key': coalesce_key, 'control': control})
+        try:
+            await self.broker.publish(channel, envelope)
+        except Exception as e:
+            logger.error(f'Failed to publish message to {channel}: {e}')
+
+    async def _on_broker_message(self, channel: str, raw: bytes) -> None:
+        envelope = orjson.loads(raw)
+        if envelope['origin'] == self.node_id:
+            return
+
+        kind, _, target = channel[len(self.channel_prefix) + 1:].partition(':')
+        control = envelope.get('control')
+        if control is not None:
+            if kind == 'user' and 'join_chat' in control:
+                await self.join_chat(UUID(target), UUID(control['join_chat']))
+            return
+
+        if kind == 'user':
+            self._deliver_to_user(UUID(target), OutboundFrame(envelope['data']), coalesce_key=envelope.get('key'))
+        elif kind == 'chat':
+            chat_id = UUID(target)
+            self._deliver_to_chat(chat_id, OutboundFrame(envelope['data']), envelope.get('key'))
+            for listener in self.chat_message_listeners:
+                await listener(chat_id, envelope['data'])
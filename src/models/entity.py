@@ -1,20 +1,24 @@
 from datetime import datetime
 
 from sqlalchemy import (
-    Boolean, CheckConstraint, Column, DateTime, ForeignKey,
-    String, Table,
+    BigInteger, CheckConstraint, Column, Computed, DateTime, ForeignKey,
+    Index, String, Table,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 from sqlalchemy.sql import func
 
 from src.db.postgres import Base
 
+SEARCH_CONFIG = 'simple'
+
 group_users = Table(
     'group_users',
     Base.metadata,
     Column('group_id', UUID, ForeignKey('groups.id')),
     Column('user_id', UUID, ForeignKey('users.id')),
+    Index('ix_group_users_user_id', 'user_id'),
+    Index('ix_group_users_group_id', 'group_id'),
 )
 
 
@@ -49,6 +53,8 @@ class Chat(Base):
     title: Mapped[str] = mapped_column(String, index=True)
     chat_type: Mapped[str] = mapped_column(String, nullable=False)
     group_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('groups.id'))
+    message_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+    last_message_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
 
     group = relationship('Group', back_populates='chats')
     # users = relationship('User', back_populates='chats')
@@ -90,7 +96,13 @@ class Group(Base):
 
 class Message(Base):
     __tablename__ = 'messages'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_messages_chat_id_timestamp_id', 'chat_id', 'timestamp', 'id'),
+        Index('ix_messages_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_messages_chat_id_seq', 'chat_id', 'seq'),
+        {'extend_existing': True, 'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+    __mapper_args__ = {'eager_defaults': True}
 
     id: Mapped[UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -100,8 +112,63 @@ class Message(Base):
     )
     chat_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('chats.id'))
     sender_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id'))
-    text: Mapped[str] = mapped_column(String, index=True)
+    text: Mapped[str] = mapped_column(String)
     timestamp: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_default=func.now(),
+        DateTime(timezone=True), primary_key=True, server_default=func.now(),
+    )
+    # Position in the chat, 1-based and gap-free; allocated from chats.message_count.
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR, Computed(f"to_tsvector('{SEARCH_CONFIG}', text)", persisted=True), deferred=True,
+    )
+
+
+class ReadCursor(Base):
+    """
+    How far a user has read a chat.
+
+    last_read_count is the seq of the last read message, which equals the
+    chat's message_count at that message, so the unread count is
+    chats.message_count - last_read_count.
+    """
+
+    __tablename__ = 'read_cursors'
+    __table_args__ = {'extend_existing': True}
+
+    user_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('users.id'), primary_key=True)
+    chat_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), ForeignKey('chats.id'), primary_key=True)
+    last_read_message_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    last_read_count: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
+    )
+
+
+class ImportIdMap(Base):
+    """
+    Which row an entity of an imported archive became, so a resumed import finds it again.
+    """
+
+    __tablename__ = 'import_id_map'
+    __table_args__ = {'extend_existing': True}
+
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    kind: Mapped[str] = mapped_column(String, primary_key=True)
+    legacy_id: Mapped[str] = mapped_column(String, primary_key=True)
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+
+
+class ImportCheckpoint(Base):
+    """
+    How many records of an archive are committed, updated in the transaction of every batch.
+    """
+
+    __tablename__ = 'import_checkpoints'
+    __table_args__ = {'extend_existing': True}
+
+    source: Mapped[str] = mapped_column(String, primary_key=True)
+    position: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+    rows: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
     )
-    is_read: Mapped[bool] = mapped_column(Boolean, default=False)
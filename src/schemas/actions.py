@@ -0,0 +1,48 @@
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class EmptyPayload(BaseModel):
+    pass
+
+
+class NewMessagePayload(BaseModel):
+    chat_id: UUID
+    text: str
+    sender_id: Optional[UUID] = None
+
+
+class MarkReadPayload(BaseModel):
+    chat_id: UUID
+    message_id: Optional[UUID] = None
+    seq: Optional[int] = None
+
+
+class ResumePayload(BaseModel):
+    chats: dict[UUID, int]
+
+
+class SetPresencePayload(BaseModel):
+    state: str
+
+
+class PresenceQueryPayload(BaseModel):
+    user_ids: list[UUID]
+
+
+class AddUserToGroupPayload(BaseModel):
+    group_id: UUID
+    member_id: Optional[UUID] = None
+
+
+class CreateGroupChatPayload(BaseModel):
+    chat_title: str
+    group_title: str
+    creator_id: Optional[UUID] = None
+
+
+class CreatePersonalChatPayload(BaseModel):
+    other_user_id: UUID
+    creator_id: Optional[UUID] = None
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -58,7 +59,28 @@ class MessageCreate(MessageBase):
 class Message(MessageBase):
     id: UUID
     timestamp: datetime
-    is_read: bool = False
+    seq: Optional[int] = None
 
     class Config:
         from_attributes = True
+
+
+class MessagePage(BaseModel):
+    items: list[Message]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class ChatReplay(BaseModel):
+    chat_id: UUID
+    items: list[Message]
+    truncated: bool = False
+
+
+class SearchHit(Message):
+    rank: float
+
+
+class SearchPage(BaseModel):
+    items: list[SearchHit]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,221 @@
+import asyncio
+import datetime
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import func, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.entity import Chat, Group, Message, ReadCursor, User, group_users
+
+
+class CustomBootstrapService:
+    """
+    Service for the session bootstrap a client gets on connect.
+
+    The bootstrap holds everything needed to render the inbox: all chats of
+    the user with their last message, unread count and a member summary.
+    It is built by a single query; the last message and the members are
+    LATERAL lookups on the (chat_id, timestamp, id) and group_id indexes,
+    and unread counts come from the maintained counters.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        """
+        Initialize the CustomBootstrapService.
+
+        Args:
+            db (AsyncSession): The database session for interacting with the database.
+        """
+        self.db = db
+
+    async def load(self, user_id: UUID, member_preview: int = 10) -> dict:
+        """
+        Build the bootstrap payload of a user.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            member_preview (int): How many members of each chat are listed by name.
+
+        Returns:
+            dict: The chats, newest activity first, and when the payload was built.
+        """
+        last_message = (
+            select(Message.id, Message.sender_id, Message.text, Message.timestamp, Message.seq)
+            .where(Message.chat_id == Chat.id)
+            .order_by(Message.timestamp.desc(), Message.id.desc())
+            .limit(1)
+            .lateral('last_message')
+        )
+        members = (
+            select(
+                func.count().label('count'),
+                func.array_agg(aggregate_order_by(User.id, User.name, User.id))[1:member_preview].label('ids'),
+                func.array_agg(aggregate_order_by(User.name, User.name, User.id))[1:member_preview].label('names'),
+            )
+            .select_from(group_users)
+            .join(User, User.id == group_users.c.user_id)
+            .where(group_users.c.group_id == Chat.group_id)
+            .lateral('members')
+        )
+        member_of = group_users.alias('member_of')
+        stmt = (
+            select(
+                Chat.id,
+                Chat.title,
+                Chat.chat_type,
+                Chat.group_id,
+                Group.title.label('group_title'),
+                (Chat.message_count - func.coalesce(ReadCursor.last_read_count, 0)).label('unread'),
+                last_message.c.id.label('message_id'),
+                last_message.c.sender_id,
+                last_message.c.text,
+                last_message.c.timestamp,
+                last_message.c.seq,
+                members.c.count.label('member_count'),
+                members.c.ids.label('member_ids'),
+                members.c.names.label('member_names'),
+            )
+            .select_from(member_of)
+            .join(Chat, Chat.group_id == member_of.c.group_id)
+            .join(Group, Group.id == Chat.group_id)
+            .outerjoin(ReadCursor, (ReadCursor.chat_id == Chat.id) & (ReadCursor.user_id == user_id))
+            .outerjoin(last_message, true())
+            .join(members, true())
+            .where(member_of.c.user_id == user_id)
+            .order_by(last_message.c.timestamp.desc().nulls_last(), Chat.id)
+        )
+        res = await self.db.execute(stmt)
+
+        chats = []
+        for row in res.all():
+            last = None
+            if row.message_id is not None:
+                last = {
+                    'id': row.message_id,
+                    'chat_id': row.id,
+                    'sender_id': row.sender_id,
+                    'text': row.text,
+                    'timestamp': row.timestamp,
+                    'seq': row.seq,
+                }
+            chats.append({
+                'id': row.id,
+                'title': row.title,
+                'chat_type': row.chat_type,
+                'group_id': row.group_id,
+                'group_title': row.group_title,
+                'unread': max(0, row.unread),
+                'last_message': last,
+                'members': {
+                    'count': row.member_count,
+                    'preview': [
+                        {'id': member_id, 'name': name}
+                        for member_id, name in zip(row.member_ids or (), row.member_names or ())
+                    ],
+                },
+            })
+        return {'chats': chats, 'generated_at': datetime.datetime.now(datetime.UTC)}
+
+
+class BootstrapCacheStats:
+    """
+    Counters of the bootstrap cache.
+    """
+
+    __slots__ = ('hits', 'misses', 'coalesced', 'invalidations')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BootstrapCache:
+    """
+    Short-lived per-user cache of bootstrap payloads with single-flight loading.
+
+    Concurrent requests for the same user share one load, and at most
+    max_concurrency loads run at once on this node, so a reconnect storm
+    queues on the node instead of opening a query per socket. Entries live
+    for ttl seconds; anything that changes a user's chat list or read state
+    should invalidate their entry.
+    """
+
+    def __init__(self, ttl: float = 2, max_size: int = 50000, max_concurrency: int = 20) -> None:
+        """
+        Initialize the BootstrapCache.
+
+        Args:
+            ttl (float): How long a payload is served from the cache, in seconds.
+            max_size (int): The maximum number of cached payloads.
+            max_concurrency (int): The maximum number of loads running at once.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = BootstrapCacheStats()
+        self._entries: OrderedDict[UUID, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[UUID, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, user_id: UUID, loader: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Get a user's payload from the cache, a load in flight or a new load.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            loader (Callable[[], Awaitable[dict]]): Builds the payload on a miss.
+
+        Returns:
+            dict: The payload.
+        """
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.stats.hits += 1
+                return entry[1]
+            del self._entries[user_id]
+
+        task = self._inflight.get(user_id)
+        if task is not None:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+            task = asyncio.create_task(self._load(user_id, loader))
+            self._inflight[user_id] = task
+        # A waiter that goes away must not cancel the load the others share.
+        return await asyncio.shield(task)
+
+    def invalidate(self, user_id: UUID) -> None:
+        self.stats.invalidations += 1
+        self._entries.pop(user_id, None)
+        self._inflight.pop(user_id, None)
+
+    async def _load(self, user_id: UUID, loader: Callable[[], Awaitable[dict]]) -> dict:
+        task = asyncio.current_task()
+        try:
+            async with self._semaphore:
+                payload = await loader()
+        finally:
+            current = self._inflight.get(user_id) is task
+            if current:
+                del self._inflight[user_id]
+        # A payload loaded across an invalidation may already be stale, so it is not kept.
+        if current:
+            self._entries[user_id] = (time.monotonic() + self.ttl, payload)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return payload
+
+    def info(self) -> dict:
+        return {'size': len(self._entries), 'inflight': len(self._inflight), **self.stats.as_dict()}
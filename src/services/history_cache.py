@@ -0,0 +1,362 @@
+import bisect
+import datetime
+import logging
+from collections import OrderedDict
+from typing import Callable, Optional
+from uuid import UUID
+
+import orjson
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[datetime.datetime, UUID]
+
+
+class HistoryCacheStats:
+    """
+    Counters of the hot history cache.
+    """
+
+    __slots__ = ('hits', 'redis_hits', 'misses', 'evictions')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class _ChatRing:
+    """
+    The newest messages of one chat in (timestamp, id) order.
+
+    complete is True when no older message of the chat exists, so a window
+    reaching past the oldest entry is still fully covered. seqs holds the
+    per-chat sequence number of every entry, None for entries without one.
+    """
+
+    __slots__ = ('keys', 'entries', 'seqs', 'size', 'complete')
+
+    def __init__(self) -> None:
+        self.keys: list[CacheKey] = []
+        self.entries: list[bytes] = []
+        self.seqs: list[Optional[int]] = []
+        self.size = 0
+        self.complete = False
+
+    def insert(self, key: CacheKey, entry: bytes, seq: Optional[int], capacity: int) -> int:
+        index = bisect.bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return 0
+        self.keys.insert(index, key)
+        self.entries.insert(index, entry)
+        self.seqs.insert(index, seq)
+        added = len(entry)
+        while len(self.keys) > capacity:
+            del self.keys[0]
+            del self.seqs[0]
+            added -= len(self.entries.pop(0))
+            self.complete = False
+        self.size += added
+        return added
+
+
+def _entry_key(message: dict) -> CacheKey:
+    timestamp = message['timestamp']
+    if isinstance(timestamp, str):
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+    message_id = message['id']
+    if not isinstance(message_id, UUID):
+        message_id = UUID(message_id)
+    return timestamp, message_id
+
+
+def _select_since(seqs: list[Optional[int]], after_seq: int) -> Optional[list[int]]:
+    """
+    Find the entries following a sequence number.
+
+    Args:
+        seqs (list[Optional[int]]): The sequence numbers of the entries.
+        after_seq (int): The last sequence number the reader has.
+
+    Returns:
+        Optional[list[int]]: The indexes of the newer entries in seq order, or None
+        if the entries are not known to be gap-free after after_seq.
+    """
+    known = [seq for seq in seqs if seq is not None]
+    if not known:
+        return None
+    newer = sorted((seq, index) for index, seq in enumerate(seqs) if seq is not None and seq > after_seq)
+    for expected, (seq, _) in enumerate(newer, after_seq + 1):
+        if seq != expected:
+            return None
+    return [index for _, index in newer]
+
+
+def _is_contiguous(seqs: list[Optional[int]], start: int, end: int, complete: bool) -> bool:
+    """
+    Tell whether a window of entries holds consecutive messages with no gap on either edge.
+
+    Entries are ordered by (timestamp, id), which can differ slightly from seq
+    order across nodes, so the window's seqs are compared as a set. The
+    entries right before and after the window must continue the range, so a
+    message missing next to the window (such as the one before a page's
+    anchor) is caught too; at the oldest end of a complete chat the window
+    must start at seq 1. Entries without a seq cannot be checked and make
+    the window not contiguous.
+
+    Args:
+        seqs (list[Optional[int]]): The sequence numbers of all entries.
+        start (int): The index of the first entry of the window.
+        end (int): The index after the last entry of the window.
+        complete (bool): True if no message older than the first entry exists.
+
+    Returns:
+        bool: Whether the window can be served.
+    """
+    window = seqs[start:end]
+    if any(seq is None for seq in window):
+        return False
+    if not window:
+        return end >= len(seqs) or (complete and seqs[end] == 1)
+    low, high = min(window), max(window)
+    if len(set(window)) != len(window) or high - low + 1 != len(window):
+        return False
+    if start > 0:
+        if seqs[start - 1] != low - 1:
+            return False
+    elif complete and low != 1:
+        return False
+    return end >= len(seqs) or seqs[end] == high + 1
+
+
+def _select_window(
+    keys: list[CacheKey], before: Optional[CacheKey], limit: int, complete: bool,
+) -> Optional[tuple[int, int, bool]]:
+    end = len(keys) if before is None else bisect.bisect_left(keys, before)
+    if end >= limit:
+        return end - limit, end, end > limit or not complete
+    if complete:
+        return 0, end, False
+    return None
+
+
+class HotHistoryCache:
+    """
+    Write-through cache of the newest serialized messages of every chat.
+
+    The in-process tier keeps up to max_messages_per_chat messages per chat in
+    LRU order and evicts whole chats once max_bytes is exceeded. It is only
+    trusted for chats this node receives every message of, which is decided
+    by the is_live callback; other chats are dropped by release().
+
+    The optional Redis tier keeps a capped list per chat that is shared by all
+    nodes and filled only by write-through, so it covers a window once it holds
+    enough messages.
+
+    A window is only served when its seq numbers have no gap; a message lost
+    on the way to a tier, through a pub/sub outage or a failed write-through,
+    turns the window into a miss instead of a page with a hole.
+    """
+
+    def __init__(
+        self,
+        max_messages_per_chat: int = 100,
+        max_bytes: int = 64 * 1024 * 1024,
+        is_live: Optional[Callable[[UUID], bool]] = None,
+        redis_client: Optional[Redis] = None,
+        redis_ttl: int = 24 * 60 * 60,
+        key_prefix: str = 'history',
+    ) -> None:
+        """
+        Initialize the HotHistoryCache.
+
+        Args:
+            max_messages_per_chat (int): The number of newest messages kept per chat.
+            max_bytes (int): The memory cap of the in-process tier, in bytes of serialized messages.
+            is_live (Optional[Callable[[UUID], bool]]): Tells whether this node sees every message of a chat.
+            redis_client (Optional[Redis]): The Redis client of the shared tier. The tier is off if omitted.
+            redis_ttl (int): The expiration time of a chat's Redis list, in seconds.
+            key_prefix (str): The prefix of the Redis keys.
+        """
+        if max_messages_per_chat <= 0:
+            raise ValueError('max_messages_per_chat must be greater than 0')
+        self.max_messages_per_chat = max_messages_per_chat
+        self.max_bytes = max_bytes
+        self.is_live = is_live or (lambda chat_id: True)
+        self.redis_client = redis_client
+        self.redis_ttl = redis_ttl
+        self.key_prefix = key_prefix
+        self.stats = HistoryCacheStats()
+        self.size = 0
+        self._chats: OrderedDict[UUID, _ChatRing] = OrderedDict()
+
+    def redis_key(self, chat_id: UUID) -> str:
+        return f'{self.key_prefix}:{chat_id}'
+
+    def info(self) -> dict:
+        return {'chats': len(self._chats), 'bytes': self.size, 'max_bytes': self.max_bytes, **self.stats.as_dict()}
+
+    async def get_page(
+        self, chat_id: UUID, limit: int, before: Optional[CacheKey] = None,
+    ) -> Optional[tuple[list[dict], bool]]:
+        """
+        Get up to limit messages older than before, newest first.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            limit (int): The number of messages.
+            before (Optional[CacheKey]): The (timestamp, id) position to start after. The newest messages if omitted.
+
+        Returns:
+            Optional[tuple[list[dict], bool]]: The messages and whether older ones exist,
+            or None if the cache does not cover the window.
+        """
+        ring = self._chats.get(chat_id)
+        if ring is not None and self.is_live(chat_id):
+            window = _select_window(ring.keys, before, limit, ring.complete)
+            if window is not None and _is_contiguous(ring.seqs, window[0], window[1], ring.complete):
+                self._chats.move_to_end(chat_id)
+                self.stats.hits += 1
+                start, end, has_older = window
+                return [orjson.loads(entry) for entry in reversed(ring.entries[start:end])], has_older
+
+        if self.redis_client is not None:
+            try:
+                entries = await self.redis_client.lrange(self.redis_key(chat_id), 0, -1)
+            except Exception as e:
+                logger.error(f'Failed to read history cache for {chat_id}: {e}')
+                entries = []
+            keyed = sorted(((_entry_key(message), message) for message in map(orjson.loads, entries)),
+                           key=lambda item: item[0])
+            window = _select_window([key for key, _ in keyed], before, limit, False)
+            seqs = [message.get('seq') for _, message in keyed]
+            if window is not None and _is_contiguous(seqs, window[0], window[1], False):
+                self.stats.redis_hits += 1
+                start, end, has_older = window
+                return [message for _, message in reversed(keyed[start:end])], has_older
+
+        self.stats.misses += 1
+        return None
+
+    async def get_since(self, chat_id: UUID, after_seq: int) -> Optional[list[dict]]:
+        """
+        Get the messages of a chat following a sequence number, oldest first.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            after_seq (int): The last sequence number the reader has.
+
+        Returns:
+            Optional[list[dict]]: The messages, or None if the cache does not hold all of them.
+        """
+        ring = self._chats.get(chat_id)
+        if ring is not None and self.is_live(chat_id):
+            indexes = _select_since(ring.seqs, after_seq)
+            if indexes is not None:
+                self._chats.move_to_end(chat_id)
+                self.stats.hits += 1
+                return [orjson.loads(ring.entries[index]) for index in indexes]
+
+        if self.redis_client is not None:
+            try:
+                entries = await self.redis_client.lrange(self.redis_key(chat_id), 0, -1)
+            except Exception as e:
+                logger.error(f'Failed to read history cache for {chat_id}: {e}')
+                entries = []
+            messages = [orjson.loads(entry) for entry in entries]
+            indexes = _select_since([message.get('seq') for message in messages], after_seq)
+            if indexes is not None:
+                self.stats.redis_hits += 1
+                return [messages[index] for index in indexes]
+
+        self.stats.misses += 1
+        return None
+
+    def fill(self, chat_id: UUID, messages: list[dict], complete: bool) -> None:
+        """
+        Merge the newest messages read from the database into the in-process tier.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            messages (list[dict]): The newest messages of the chat.
+            complete (bool): True if the chat has no messages older than these.
+        """
+        if not self.is_live(chat_id):
+            return
+        ring = self._ring(chat_id)
+        if complete:
+            ring.complete = True
+        for message in messages:
+            self._insert(ring, message)
+        self._enforce_cap()
+
+    async def append(self, chat_id: UUID, message: dict, write_redis: bool = True) -> None:
+        """
+        Write a newly stored message through to the cache.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            message (dict): The stored message.
+            write_redis (bool): Whether to also push the message to the Redis tier.
+        """
+        if self.is_live(chat_id):
+            self._insert(self._ring(chat_id), message)
+            self._enforce_cap()
+
+        if write_redis and self.redis_client is not None:
+            key = self.redis_key(chat_id)
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.rpush(key, orjson.dumps(message))
+                    pipe.ltrim(key, -self.max_messages_per_chat, -1)
+                    pipe.expire(key, self.redis_ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.error(f'Failed to write history cache for {chat_id}: {e}')
+                # The list now misses this message; dropping it lets the next write-throughs refill it.
+                try:
+                    await self.redis_client.delete(key)
+                except Exception as e:
+                    logger.error(f'Failed to drop history cache for {chat_id}: {e}')
+
+    def release(self, chat_id: UUID) -> None:
+        """
+        Drop a chat from the in-process tier once its messages stop arriving on this node.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+        """
+        ring = self._chats.pop(chat_id, None)
+        if ring is not None:
+            self.size -= ring.size
+
+    def clear(self) -> None:
+        """
+        Drop every chat from the in-process tier, when this node may have missed messages.
+        """
+        self._chats.clear()
+        self.size = 0
+
+    def _ring(self, chat_id: UUID) -> _ChatRing:
+        ring = self._chats.get(chat_id)
+        if ring is None:
+            ring = self._chats[chat_id] = _ChatRing()
+        else:
+            self._chats.move_to_end(chat_id)
+        return ring
+
+    def _insert(self, ring: _ChatRing, message: dict) -> None:
+        self.size += ring.insert(
+            _entry_key(message), orjson.dumps(message), message.get('seq'), self.max_messages_per_chat,
+        )
+
+    def _enforce_cap(self) -> None:
+        while self.size > self.max_bytes and self._chats:
+            _, ring = self._chats.popitem(last=False)
+            self.size -= ring.size
+            self.stats.evictions += 1
@@ -1,8 +1,65 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+import base64
+import binascii
+import datetime
+import zlib
+from enum import Enum
+from typing import AsyncIterator, NamedTuple, Optional
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import BigInteger, column, exists, select, true, tuple_, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from uuid import UUID
-from src.models.entity import Message
-from collections.abc import Sequence
+from src.models.entity import Chat, Message, group_users
+from src.schemas.entity import ChatReplay, Message as MessageSchema, MessagePage
+from src.services.history_cache import HotHistoryCache
+
+
+class CursorDirection(str, Enum):
+    BEFORE = 'before'
+    AFTER = 'after'
+
+
+class HistoryCursor(NamedTuple):
+    """
+    Position in a chat's history, ordered by (timestamp, id).
+
+    A cursor selects the messages strictly before (older than) or after
+    (newer than) the position.
+    """
+
+    direction: CursorDirection
+    timestamp: datetime.datetime
+    id: UUID
+
+    def encode(self) -> str:
+        raw = orjson.dumps([self.direction.value, self.timestamp, self.id])
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode(cls, value: str) -> 'HistoryCursor':
+        """
+        Decode an opaque cursor.
+
+        Args:
+            value (str): The cursor returned by a previous page.
+
+        Returns:
+            HistoryCursor: The decoded cursor.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+            direction, timestamp, message_id = orjson.loads(raw)
+            return cls(
+                CursorDirection(direction),
+                datetime.datetime.fromisoformat(timestamp),
+                UUID(message_id),
+            )
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid cursor: {e}') from e
 
 
 class CustomHistoryService:
@@ -10,33 +67,244 @@ class CustomHistoryService:
     Service for managing chat message history.
 
     This service provides methods to retrieve message history for a specific chat.
+    History is paginated with keyset cursors over (timestamp, id), backed by
+    the (chat_id, timestamp, id) index, so every page costs the same no matter
+    how deep it is. Pages of older messages covered by the hot history cache
+    are served without touching the database. Every query bounds the
+    timestamp explicitly so the partitioned messages table only scans the
+    partitions that can hold the page.
     """
 
-    def __init__(self, db: AsyncSession) -> None:
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: Optional[HotHistoryCache] = None,
+        recent_window: Optional[datetime.timedelta] = None,
+    ) -> None:
         """
         Initialize the CustomHistoryService.
 
         Args:
             db (AsyncSession): The database session for interacting with the database.
+            cache (Optional[HotHistoryCache]): The cache of the newest messages per chat.
+            recent_window (Optional[datetime.timedelta]): How far back a page is first looked for.
+                Bounding the timestamp lets the messages table prune all but its newest partitions.
         """
         self.db = db
+        self.cache = cache
+        self.recent_window = recent_window
 
-    async def get_history(self, chat_id: UUID, limit: int, offset: int) -> Sequence[Message]:
+    async def get_history(
+        self, chat_id: UUID, limit: int, cursor: Optional[HistoryCursor] = None,
+    ) -> MessagePage:
         """
-        Retrieve the message history for a specific chat.
+        Retrieve a page of the message history for a specific chat.
+
+        Messages are returned newest first. Without a cursor the newest page is
+        returned; next_cursor points to older messages and prev_cursor to newer ones.
 
         Args:
             chat_id (UUID): The ID of the chat for which to retrieve the message history.
             limit (int): The maximum number of messages to retrieve.
-            offset (int): The number of messages to skip before starting to collect the result set.
+            cursor (Optional[HistoryCursor]): The position to continue from.
 
         Returns:
-            List[Message]: A list of messages for the specified chat.
+            MessagePage: The messages and the cursors of the neighbouring pages.
 
         Raises:
             Exception: Raises an exception if there is an issue with the database query.
         """
-        stmt = select(Message).where(Message.chat_id == chat_id).limit(limit).offset(offset)
+        backwards = cursor is None or cursor.direction is CursorDirection.BEFORE
+        if self.cache is not None and backwards:
+            before = (cursor.timestamp, cursor.id) if cursor is not None else None
+            cached = await self.cache.get_page(chat_id, limit, before)
+            if cached is not None:
+                messages, has_older = cached
+                return self._build_page(
+                    [MessageSchema.model_validate(message) for message in messages],
+                    has_older,
+                    cursor is not None,
+                )
+
+        if cursor is not None and cursor.direction is CursorDirection.AFTER:
+            rows = await self._fetch_newer(chat_id, limit + 1, cursor)
+        else:
+            rows = await self._fetch_older(chat_id, limit + 1, cursor)
+        has_more = len(rows) > limit
+        messages = [MessageSchema.model_validate(row) for row in rows[:limit]]
+
+        if self.cache is not None and cursor is None:
+            self.cache.fill(chat_id, [message.model_dump() for message in messages], complete=not has_more)
+
+        if cursor is not None and cursor.direction is CursorDirection.AFTER:
+            messages.reverse()
+            has_older, has_newer = True, has_more
+        else:
+            has_older, has_newer = has_more, cursor is not None
+
+        return self._build_page(messages, has_older, has_newer)
+
+    async def is_member(self, user_id: UUID, chat_id: UUID) -> bool:
+        stmt = select(
+            exists()
+            .where(Chat.id == chat_id, group_users.c.group_id == Chat.group_id, group_users.c.user_id == user_id),
+        )
+        res = await self.db.execute(stmt)
+        return res.scalar_one()
+
+    async def get_missed(self, after: dict[UUID, int], limit: int) -> list[ChatReplay]:
+        """
+        Get the messages following the last sequence number a client has of each chat.
+
+        Chats the hot cache holds gap-free are served from it; the rest are
+        read with one query that takes up to limit + 1 messages per chat from
+        the (chat_id, seq) index.
+
+        Args:
+            after (dict[UUID, int]): The last seq the client has per chat id.
+            limit (int): The maximum number of messages per chat.
+
+        Returns:
+            list[ChatReplay]: The missed messages per chat, oldest first. A truncated chat has
+            more messages after the last one returned.
+        """
+        replays: dict[UUID, list[MessageSchema]] = {}
+        uncached: dict[UUID, int] = {}
+        for chat_id, after_seq in after.items():
+            cached = await self.cache.get_since(chat_id, after_seq) if self.cache is not None else None
+            if cached is None:
+                uncached[chat_id] = after_seq
+            else:
+                replays[chat_id] = [MessageSchema.model_validate(message) for message in cached]
+
+        if uncached:
+            since = values(
+                column('chat_id', PG_UUID(as_uuid=True)),
+                column('after_seq', BigInteger),
+                name='since',
+            ).data(list(uncached.items()))
+            missed = (
+                select(Message.id, Message.chat_id, Message.sender_id, Message.text, Message.timestamp, Message.seq)
+                .where(Message.chat_id == since.c.chat_id, Message.seq > since.c.after_seq)
+                .order_by(Message.seq)
+                .limit(limit + 1)
+                .lateral('missed')
+            )
+            result = await self.db.execute(select(missed).select_from(since).join(missed, true()))
+            for chat_id in uncached:
+                replays[chat_id] = []
+            for row in result.mappings().all():
+                replays[row['chat_id']].append(MessageSchema.model_validate(dict(row)))
+
+        pages = []
+        for chat_id, messages in replays.items():
+            messages.sort(key=lambda message: message.seq)
+            pages.append(ChatReplay(chat_id=chat_id, items=messages[:limit], truncated=len(messages) > limit))
+        return pages
+
+    async def _fetch_newer(self, chat_id: UUID, count: int, cursor: HistoryCursor) -> list[Message]:
+        # The plain timestamp bound prunes partitions, the row comparison alone does not.
+        stmt = (
+            select(Message)
+            .where(
+                Message.chat_id == chat_id,
+                Message.timestamp >= cursor.timestamp,
+                tuple_(Message.timestamp, Message.id) > tuple_(cursor.timestamp, cursor.id),
+            )
+            .order_by(Message.timestamp.asc(), Message.id.asc())
+            .limit(count)
+        )
         result = await self.db.execute(stmt)
-        messages = result.scalars().all()
-        return messages
+        return list(result.scalars().all())
+
+    async def _fetch_older(self, chat_id: UUID, count: int, cursor: Optional[HistoryCursor]) -> list[Message]:
+        """
+        Fetch messages newest first, trying the recent window before the whole history.
+
+        Args:
+            chat_id (UUID): The chat's identifier.
+            count (int): The maximum number of messages.
+            cursor (Optional[HistoryCursor]): Only messages before this position are fetched.
+
+        Returns:
+            list[Message]: The messages.
+        """
+        stmt = select(Message).where(Message.chat_id == chat_id)
+        if cursor is not None:
+            stmt = stmt.where(
+                Message.timestamp <= cursor.timestamp,
+                tuple_(Message.timestamp, Message.id) < tuple_(cursor.timestamp, cursor.id),
+            )
+        stmt = stmt.order_by(Message.timestamp.desc(), Message.id.desc())
+        if self.recent_window is None:
+            result = await self.db.execute(stmt.limit(count))
+            return list(result.scalars().all())
+
+        upper = cursor.timestamp if cursor is not None else datetime.datetime.now(datetime.UTC)
+        lower = upper - self.recent_window
+        result = await self.db.execute(stmt.where(Message.timestamp >= lower).limit(count))
+        rows = list(result.scalars().all())
+        if len(rows) < count:
+            result = await self.db.execute(stmt.where(Message.timestamp < lower).limit(count - len(rows)))
+            rows.extend(result.scalars().all())
+        return rows
+
+    @staticmethod
+    def _build_page(messages: list[MessageSchema], has_older: bool, has_newer: bool) -> MessagePage:
+        next_cursor = prev_cursor = None
+        if messages and has_older:
+            last = messages[-1]
+            next_cursor = HistoryCursor(CursorDirection.BEFORE, last.timestamp, last.id).encode()
+        if messages and has_newer:
+            first = messages[0]
+            prev_cursor = HistoryCursor(CursorDirection.AFTER, first.timestamp, first.id).encode()
+        return MessagePage(
+            items=messages,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+        )
+
+
+async def export_chat(
+    session_factory: async_sessionmaker[AsyncSession],
+    chat_id: UUID,
+    batch_size: int = 1000,
+    compress_level: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Stream all messages of a chat as NDJSON, oldest first.
+
+    Rows are read from a server-side cursor batch_size at a time and never
+    turned into ORM objects, so memory stays flat however large the chat is.
+    The next batch is only fetched once the previous chunk was consumed, so a
+    slow client holds the cursor back instead of buffering the chat. The
+    session is opened by the generator itself: it must outlive the request
+    handler and is closed as soon as the stream ends or the client goes away.
+
+    Args:
+        session_factory (async_sessionmaker[AsyncSession]): The factory of the session holding the cursor.
+        chat_id (UUID): The chat's identifier.
+        batch_size (int): The number of rows per fetch and per yielded chunk.
+        compress_level (Optional[int]): The gzip level of the stream. Uncompressed if omitted.
+
+    Yields:
+        bytes: Chunks of the stream.
+    """
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, 31) if compress_level is not None else None
+    stmt = (
+        select(Message.id, Message.chat_id, Message.sender_id, Message.seq, Message.timestamp, Message.text)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.seq)
+        .execution_options(yield_per=batch_size)
+    )
+    async with session_factory() as db:
+        result = await db.stream(stmt)
+        async for rows in result.mappings().partitions():
+            chunk = b''.join(orjson.dumps(dict(row), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,296 @@
+import asyncio
+import datetime
+import logging
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy import BigInteger, column, func, insert, update, values
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.core.config import settings
+from src.db.postgres import async_session
+from src.models.entity import Chat, Message, ReadCursor
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() behind the pending messages; the flushing loop exits when it reaches it.
+STOP = object()
+
+
+class MessageWriterStats:
+    """
+    Counters and timings of the flushed batches.
+    """
+
+    __slots__ = (
+        'batches', 'rows', 'failed_batches', 'last_batch_size',
+        'last_flush_ms', 'max_flush_ms', 'total_flush_ms',
+    )
+
+    def __init__(self) -> None:
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def record(self, size: int, flush_ms: float) -> None:
+        self.batches += 1
+        self.rows += size
+        self.last_batch_size = size
+        self.last_flush_ms = flush_ms
+        self.max_flush_ms = max(self.max_flush_ms, flush_ms)
+        self.total_flush_ms += flush_ms
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats['avg_batch_size'] = self.rows / self.batches if self.batches else 0
+        stats['avg_flush_ms'] = self.total_flush_ms / self.batches if self.batches else 0
+        return stats
+
+
+class MessageBatchWriter:
+    """
+    Group-commit writer for chat messages.
+
+    Messages from all connections are collected for up to max_delay_ms or
+    max_batch_size rows and inserted with one multi-row INSERT in a single
+    transaction. A writer waits until the batch holding its message is
+    committed, so an acknowledged message is durable.
+
+    Before the INSERT, the same transaction bumps chats.message_count and
+    last_message_id once per chat in the batch, which allocates the
+    messages' per-chat seq numbers, and afterwards moves each sender's read
+    cursor to their own newest message, so unread counters never need a
+    COUNT over messages.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_batch_size: int = 500,
+        max_delay_ms: float = 5,
+        max_pending: int = 10000,
+    ) -> None:
+        """
+        Initialize the MessageBatchWriter.
+
+        Args:
+            session_factory (async_sessionmaker[AsyncSession]): The factory of sessions used for flushing.
+            max_batch_size (int): The maximum number of rows in one INSERT.
+            max_delay_ms (float): How long the first message of a batch may wait for others, in milliseconds.
+            max_pending (int): The maximum number of queued messages before writers have to wait.
+        """
+        if max_batch_size <= 0:
+            raise ValueError('max_batch_size must be greater than 0')
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.stats = MessageWriterStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._unresolved: list[tuple[dict, asyncio.Future]] = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """
+        Start the background flushing task.
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Flush the queued messages and stop the background task.
+
+        The task is not cancelled: it flushes the batch it is collecting or
+        writing and exits when it reaches the stop marker. Messages queued by
+        writers that were waiting for room are flushed afterwards, and any
+        message that still is not stored fails its writer instead of leaving
+        it waiting.
+        """
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        if not task.done():
+            await self._queue.put(STOP)
+        try:
+            await task
+        finally:
+            while not self._queue.empty():
+                batch = []
+                while not self._queue.empty() and len(batch) < self.max_batch_size:
+                    item = self._queue.get_nowait()
+                    if item is not STOP:
+                        batch.append(item)
+                if batch:
+                    await self._flush(batch)
+            for _, future in self._unresolved:
+                if not future.done():
+                    future.set_exception(RuntimeError('Message writer stopped before the message was stored'))
+            self._unresolved.clear()
+
+    async def write(self, chat_id: uuid.UUID, sender_id: uuid.UUID, text: str) -> dict:
+        """
+        Queue a message and wait until it is committed.
+
+        The arguments come from an already validated payload and go into the
+        row as they are.
+
+        Args:
+            chat_id (uuid.UUID): The chat's identifier.
+            sender_id (uuid.UUID): The sender's identifier.
+            text (str): The text of the message.
+
+        Returns:
+            dict: The stored row.
+        """
+        if self._task is None:
+            raise RuntimeError('Message writer is not started')
+        row = {
+            'id': uuid.uuid4(),
+            'chat_id': chat_id,
+            'sender_id': sender_id,
+            'text': text,
+            'timestamp': datetime.datetime.now(datetime.UTC),
+        }
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        await future
+        return row
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is STOP:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Kept until the flush resolves the batch, so stop() can fail it if the flush never finishes.
+            self._unresolved = batch
+            await self._flush(batch)
+            self._unresolved = []
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                rows = await self._allocate_seqs(db, [row for row, _ in batch])
+                if rows:
+                    await db.execute(insert(Message).values(rows))
+                    await self._move_sender_cursors(db, rows)
+                await db.commit()
+        except Exception as e:
+            self.stats.failed_batches += 1
+            logger.error(f'Failed to flush {len(batch)} messages: {e}')
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        flush_ms = (time.perf_counter() - started) * 1000
+        self.stats.record(len(rows), flush_ms)
+        logger.debug(f'Flushed {len(rows)} messages in {flush_ms:.2f} ms')
+        for row, future in batch:
+            if future.done():
+                continue
+            if 'seq' in row:
+                future.set_result(None)
+            else:
+                future.set_exception(ValueError(f"Chat {row['chat_id']} not found"))
+
+    @staticmethod
+    async def _allocate_seqs(db: AsyncSession, rows: list[dict]) -> list[dict]:
+        """
+        Reserve a range of sequence numbers per chat and number the rows with it.
+
+        Bumping chats.message_count row-locks the chats until commit, so
+        concurrent batches number the same chat one after the other and a
+        rolled back batch gives its numbers back.
+
+        Args:
+            db (AsyncSession): The session of the flush transaction.
+            rows (list[dict]): The rows of the batch, in arrival order.
+
+        Returns:
+            list[dict]: The rows of existing chats with their seq set.
+        """
+        chat_rows: dict[uuid.UUID, list[dict]] = {}
+        for row in rows:
+            chat_rows.setdefault(row['chat_id'], []).append(row)
+
+        counters = values(
+            column('chat_id', UUID(as_uuid=True)),
+            column('added', BigInteger),
+            column('last_message_id', UUID(as_uuid=True)),
+            name='batch',
+        ).data([(chat_id, len(items), items[-1]['id']) for chat_id, items in sorted(chat_rows.items())])
+        res = await db.execute(
+            update(Chat)
+            .where(Chat.id == counters.c.chat_id)
+            .values(message_count=Chat.message_count + counters.c.added, last_message_id=counters.c.last_message_id)
+            .returning(Chat.id, Chat.message_count),
+        )
+        for chat_id, message_count in res.all():
+            items = chat_rows[chat_id]
+            first_seq = message_count - len(items) + 1
+            for offset, row in enumerate(items):
+                row['seq'] = first_seq + offset
+        return [row for row in rows if 'seq' in row]
+
+    @staticmethod
+    async def _move_sender_cursors(db: AsyncSession, rows: list[dict]) -> None:
+        cursors: dict[tuple[uuid.UUID, uuid.UUID], dict] = {}
+        for row in rows:
+            cursors[(row['sender_id'], row['chat_id'])] = {
+                'user_id': row['sender_id'],
+                'chat_id': row['chat_id'],
+                'last_read_message_id': row['id'],
+                'last_read_count': row['seq'],
+            }
+        stmt = pg_insert(ReadCursor).values(list(cursors.values()))
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[ReadCursor.user_id, ReadCursor.chat_id],
+                set_={
+                    'last_read_message_id': stmt.excluded.last_read_message_id,
+                    'last_read_count': stmt.excluded.last_read_count,
+                    'updated_at': func.now(),
+                },
+                where=ReadCursor.last_read_count < stmt.excluded.last_read_count,
+            ),
+        )
+
+
+message_writer = MessageBatchWriter(
+    session_factory=async_session,
+    max_batch_size=settings.message_writer.max_batch_size,
+    max_delay_ms=settings.message_writer.max_delay_ms,
+    max_pending=settings.message_writer.max_pending,
+)
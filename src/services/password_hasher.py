@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+import bcrypt
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class PasswordHasherOverloaded(RuntimeError):
+    pass
+
+
+class PasswordHasherStats:
+    """
+    Counters and timings of the password hashing pool.
+    """
+
+    __slots__ = (
+        'hashed', 'verified', 'rejected', 'total_wait_ms', 'max_wait_ms',
+        'total_hash_ms', 'max_hash_ms',
+    )
+
+    def __init__(self) -> None:
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_hash_ms = 0.0
+        self.max_hash_ms = 0.0
+
+    def record(self, wait_ms: float, hash_ms: float) -> None:
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.total_hash_ms += hash_ms
+        self.max_hash_ms = max(self.max_hash_ms, hash_ms)
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        done = self.hashed + self.verified
+        stats['avg_wait_ms'] = self.total_wait_ms / done if done else 0
+        stats['avg_hash_ms'] = self.total_hash_ms / done if done else 0
+        return stats
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated thread pool so it never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so the pool threads use other
+    cores while the loop keeps serving sockets. At most max_workers hashes
+    run at once and at most max_queue more wait for a thread; beyond that
+    calls fail fast with PasswordHasherOverloaded instead of piling up.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 2, max_queue: int = 32) -> None:
+        """
+        Initialize the PasswordHasher.
+
+        Args:
+            rounds (int): The bcrypt cost factor of new hashes.
+            max_workers (int): The number of hashing threads.
+            max_queue (int): The number of calls that may wait for a thread.
+        """
+        if max_workers <= 0:
+            raise ValueError('max_workers must be greater than 0')
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.stats = PasswordHasherStats()
+        self.in_flight = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def info(self) -> dict:
+        return {
+            'rounds': self.rounds,
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            **self.stats.as_dict(),
+        }
+
+    async def hash(self, password: str) -> str:
+        """
+        Generate a bcrypt hash of a password.
+
+        Args:
+            password (str): The plain text password to hash.
+
+        Returns:
+            str: The hashed password.
+        """
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), salt)
+        self.stats.hashed += 1
+        return hashed.decode('utf-8')
+
+    async def verify(self, hashed_password: str, provided_password: str) -> bool:
+        """
+        Verify a provided password against a bcrypt hash.
+
+        Args:
+            hashed_password (str): The hashed password to verify against.
+            provided_password (str): The plain text password to verify.
+
+        Returns:
+            bool: True if the password matches, False otherwise.
+        """
+        matched = await self._run(bcrypt.checkpw, provided_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        self.stats.verified += 1
+        return matched
+
+    async def shutdown(self) -> None:
+        """
+        Stop the hashing threads once the running calls are done.
+
+        The threads are joined off the event loop, so sockets keep being
+        served while a last hash finishes.
+        """
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def _run(self, func: Callable[[bytes, bytes], T], password: bytes, salt_or_hash: bytes) -> T:
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.stats.rejected += 1
+            logger.warning(f'Reject password hashing, {self.in_flight} calls in flight')
+            raise PasswordHasherOverloaded('Password hashing is overloaded')
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+
+        submitted = time.perf_counter()
+
+        def timed() -> tuple[T, float, float]:
+            started = time.perf_counter()
+            result = func(password, salt_or_hash)
+            return result, started - submitted, time.perf_counter() - started
+
+        loop = asyncio.get_running_loop()
+
+        def done(_: Future) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._release)
+
+        # A cancelled caller does not stop a hash that already runs, so the slot
+        # is only released once the thread is done with it.
+        future = self._executor.submit(timed)
+        self.in_flight += 1
+        future.add_done_callback(done)
+        result, wait, elapsed = await asyncio.wrap_future(future)
+        self.stats.record(wait * 1000, elapsed * 1000)
+        return result
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.security.bcrypt_rounds,
+    max_workers=settings.security.hasher_workers,
+    max_queue=settings.security.hasher_max_queue,
+)
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+from typing import Iterable, Optional
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from src.managers.websocket_manager import WebSocketConnectionManager
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceState(str, Enum):
+    ONLINE = 'online'
+    AWAY = 'away'
+    OFFLINE = 'offline'
+
+
+class PresenceStats:
+    """
+    Counters of the presence service.
+    """
+
+    __slots__ = ('flushes', 'changes_published', 'heartbeats', 'errors')
+
+    def __init__(self) -> None:
+        self.flushes = 0
+        self.changes_published = 0
+        self.heartbeats = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PresenceService:
+    """
+    Cluster-wide online/away state of users.
+
+    Every user has a Redis hash presence:<user_id> with one field per node
+    holding their sockets, valued '<state>:<expires_at>'. Each node refreshes
+    the fields and the key TTL of all of its users in one pipeline every
+    heartbeat_interval seconds, so the fields of a crashed node go stale
+    after ttl seconds and its users read as offline.
+
+    Connects, disconnects and state changes only mark the user dirty. Every
+    flush_interval seconds the dirty users are written in one pipeline that
+    also reads their hashes back; users whose aggregate state differs from
+    the last one announced by this node are sent to each of their chats as
+    a single presence frame, so a burst of reconnects costs one frame per
+    chat instead of one per change.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        manager: WebSocketConnectionManager,
+        ttl: float = 30,
+        heartbeat_interval: float = 10,
+        flush_interval: float = 0.25,
+        key_prefix: str = 'presence',
+    ) -> None:
+        """
+        Initialize the PresenceService.
+
+        Args:
+            redis_client (Redis): The Redis client.
+            manager (WebSocketConnectionManager): The manager holding this node's connections.
+            ttl (float): How long a node's field stays valid without a heartbeat, in seconds.
+            heartbeat_interval (float): How often the fields of local users are refreshed, in seconds.
+            flush_interval (float): How often state changes are written and announced, in seconds.
+            key_prefix (str): The prefix of the per-user Redis hashes.
+        """
+        self.redis_client = redis_client
+        self.manager = manager
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.flush_interval = flush_interval
+        self.key_prefix = key_prefix
+        self.node_id = manager.node_id
+        self.stats = PresenceStats()
+        self.local: dict[UUID, PresenceState] = {}
+        self._dirty: dict[UUID, Optional[list[UUID]]] = {}
+        self._announced: dict[UUID, PresenceState] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        manager.user_online_listeners.append(self.user_online)
+        manager.user_offline_listeners.append(self.user_offline)
+
+    def key(self, user_id: UUID) -> str:
+        return f'{self.key_prefix}:{user_id}'
+
+    def user_online(self, user_id: UUID) -> None:
+        self.local[user_id] = PresenceState.ONLINE
+        self._dirty[user_id] = None
+
+    def user_offline(self, user_id: UUID, chat_ids: list[UUID]) -> None:
+        self.local.pop(user_id, None)
+        self._dirty[user_id] = chat_ids
+
+    def set_state(self, user_id: UUID, state: PresenceState) -> None:
+        """
+        Change the state of a user connected to this node.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            state (PresenceState): Either online or away.
+
+        Raises:
+            ValueError: If the user has no socket on this node or the state is offline.
+        """
+        state = PresenceState(state)
+        if state is PresenceState.OFFLINE:
+            raise ValueError('Offline is set by disconnecting')
+        if user_id not in self.local:
+            raise ValueError(f'User {user_id} is not connected')
+        if self.local[user_id] is not state:
+            self.local[user_id] = state
+            self._dirty.setdefault(user_id, None)
+
+    async def get_many(self, user_ids: Iterable[UUID]) -> dict[UUID, PresenceState]:
+        """
+        Get the state of many users in one Redis round trip.
+
+        Args:
+            user_ids (Iterable[UUID]): The users' identifiers.
+
+        Returns:
+            dict[UUID, PresenceState]: The state per user id.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        if not user_ids:
+            return {}
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.hgetall(self.key(user_id))
+            hashes = await pipe.execute()
+        now = time.time()
+        return {user_id: self._aggregate(fields, now) for user_id, fields in zip(user_ids, hashes)}
+
+    async def start(self) -> None:
+        """
+        Start the flush and heartbeat loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the loop and remove this node's fields of the local users.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if not self.local:
+            return
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for user_id in self.local:
+                    pipe.hdel(self.key(user_id), self.node_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f'Failed to clear presence of {len(self.local)} users: {e}')
+
+    async def flush(self) -> None:
+        """
+        Write the pending state changes and announce the resulting ones to the users' chats.
+        """
+        dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        expires_at = time.time() + self.ttl
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for user_id in dirty:
+                    key = self.key(user_id)
+                    state = self.local.get(user_id)
+                    if state is None:
+                        pipe.hdel(key, self.node_id)
+                    else:
+                        pipe.hset(key, self.node_id, f'{state.value}:{expires_at:.0f}')
+                        pipe.expire(key, int(self.ttl))
+                    pipe.hgetall(key)
+                results = await pipe.execute()
+        except Exception:
+            for user_id, chat_ids in dirty.items():
+                self._dirty.setdefault(user_id, chat_ids)
+            raise
+
+        hashes = iter(result for result in results if isinstance(result, dict))
+        now = time.time()
+        changes: dict[UUID, dict[str, str]] = {}
+        for (user_id, chat_ids), fields in zip(dirty.items(), hashes):
+            state = self._aggregate(fields, now)
+            if self._announced.get(user_id, PresenceState.OFFLINE) is state:
+                continue
+            if state is PresenceState.OFFLINE:
+                self._announced.pop(user_id, None)
+            else:
+                self._announced[user_id] = state
+            if chat_ids is None:
+                chat_ids = self.manager.chat_index.chats(user_id)
+            for chat_id in chat_ids:
+                changes.setdefault(chat_id, {})[str(user_id)] = state.value
+            self.stats.changes_published += 1
+        self.stats.flushes += 1
+
+        for chat_id, payload in changes.items():
+            await self.manager.send_chat_message(chat_id, {'type': 'presence', 'payload': payload})
+
+    async def heartbeat(self) -> None:
+        """
+        Refresh this node's fields and the TTLs of all local users.
+        """
+        if not self.local:
+            return
+        expires_at = time.time() + self.ttl
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for user_id, state in self.local.items():
+                key = self.key(user_id)
+                pipe.hset(key, self.node_id, f'{state.value}:{expires_at:.0f}')
+                pipe.expire(key, int(self.ttl))
+            await pipe.execute()
+        self.stats.heartbeats += 1
+
+    def info(self) -> dict:
+        return {
+            'local_users': len(self.local),
+            'pending': len(self._dirty),
+            **self.stats.as_dict(),
+        }
+
+    @staticmethod
+    def _aggregate(fields: dict, now: float) -> PresenceState:
+        result = PresenceState.OFFLINE
+        for value in fields.values():
+            if isinstance(value, bytes):
+                value = value.decode()
+            state, _, expires_at = value.partition(':')
+            if float(expires_at or 0) < now:
+                continue
+            if state == PresenceState.ONLINE.value:
+                return PresenceState.ONLINE
+            result = PresenceState.AWAY
+        return result
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_heartbeat = loop.time() + self.heartbeat_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if loop.time() >= next_heartbeat:
+                    next_heartbeat = loop.time() + self.heartbeat_interval
+                    await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error(f'Presence sync failed: {e}')
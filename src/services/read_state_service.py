@@ -0,0 +1,128 @@
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.entity import Chat, Message, ReadCursor, group_users
+
+
+class CustomReadStateService:
+    """
+    Service for per-user read cursors and unread counters.
+
+    A chat's unread count for a user is chats.message_count minus the
+    cursor's last_read_count; both are maintained on write, so reading them
+    never counts messages.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        """
+        Initialize the CustomReadStateService.
+
+        Args:
+            db (AsyncSession): The database session for interacting with the database.
+        """
+        self.db = db
+
+    async def mark_read(
+        self,
+        user_id: UUID,
+        chat_id: UUID,
+        message_id: Optional[UUID] = None,
+        seq: Optional[int] = None,
+    ) -> dict:
+        """
+        Move the user's read cursor forward to a message of the chat.
+
+        The cursor never moves backwards. A message is given either by its id
+        or by its seq; marking by seq needs no message lookup unless the id
+        of the message has to be reported.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            chat_id (UUID): The chat's identifier.
+            message_id (Optional[UUID]): The last read message.
+            seq (Optional[int]): The seq of the last read message. The newest message of the chat if
+                neither this nor message_id is given.
+
+        Raises:
+            ValueError: If the chat or the message does not exist.
+
+        Returns:
+            dict: The chat id, the last read message id and seq and the unread count.
+        """
+        res = await self.db.execute(select(Chat.message_count, Chat.last_message_id).where(Chat.id == chat_id))
+        chat = res.one_or_none()
+        if chat is None:
+            raise ValueError(f'Chat {chat_id} not found')
+        message_count, last_message_id = chat
+
+        if seq is not None:
+            read_count = max(0, min(seq, message_count))
+            read_message_id = last_message_id
+            if read_count != message_count:
+                res = await self.db.execute(
+                    select(Message.id).where(Message.chat_id == chat_id, Message.seq == read_count),
+                )
+                read_message_id = res.scalar_one_or_none()
+        elif message_id is None or message_id == last_message_id:
+            read_count, read_message_id = message_count, last_message_id
+        else:
+            res = await self.db.execute(
+                select(Message.seq).where(Message.id == message_id, Message.chat_id == chat_id),
+            )
+            read_count = res.scalar_one_or_none()
+            if read_count is None:
+                raise ValueError(f'Message {message_id} not found in chat {chat_id}')
+            read_message_id = message_id
+
+        stmt = insert(ReadCursor).values(
+            user_id=user_id, chat_id=chat_id, last_read_message_id=read_message_id, last_read_count=read_count,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReadCursor.user_id, ReadCursor.chat_id],
+            set_={
+                'last_read_message_id': stmt.excluded.last_read_message_id,
+                'last_read_count': stmt.excluded.last_read_count,
+                'updated_at': func.now(),
+            },
+            where=ReadCursor.last_read_count < stmt.excluded.last_read_count,
+        ).returning(ReadCursor.last_read_message_id, ReadCursor.last_read_count)
+        res = await self.db.execute(stmt)
+        updated = res.one_or_none()
+        if updated is None:
+            res = await self.db.execute(
+                select(ReadCursor.last_read_message_id, ReadCursor.last_read_count)
+                .where(ReadCursor.user_id == user_id, ReadCursor.chat_id == chat_id),
+            )
+            updated = res.one()
+        await self.db.commit()
+
+        read_message_id, read_count = updated
+        return {
+            'chat_id': chat_id,
+            'last_read_message_id': read_message_id,
+            'last_read_seq': read_count,
+            'unread': max(0, message_count - read_count),
+        }
+
+    async def unread_counts(self, user_id: UUID) -> dict[UUID, int]:
+        """
+        Get the unread counts of all chats of a user with one indexed query.
+
+        Args:
+            user_id (UUID): The user's identifier.
+
+        Returns:
+            dict[UUID, int]: The unread count per chat id.
+        """
+        stmt = (
+            select(Chat.id, Chat.message_count - func.coalesce(ReadCursor.last_read_count, 0))
+            .join(group_users, group_users.c.group_id == Chat.group_id)
+            .outerjoin(ReadCursor, (ReadCursor.chat_id == Chat.id) & (ReadCursor.user_id == user_id))
+            .where(group_users.c.user_id == user_id)
+        )
+        res = await self.db.execute(stmt)
+        return {chat_id: max(0, unread) for chat_id, unread in res.all()}
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import datetime
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+import orjson
+from sqlalchemy import REAL, cast, func, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.entity import SEARCH_CONFIG, Chat, Message, group_users
+from src.schemas.entity import SearchHit, SearchPage
+
+
+class SearchCursor(NamedTuple):
+    """
+    Position in a result list, ordered by (timestamp, id) descending.
+    """
+
+    timestamp: datetime.datetime
+    id: UUID
+
+    def encode(self) -> str:
+        raw = orjson.dumps([self.timestamp, self.id])
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    @classmethod
+    def decode(cls, value: str) -> 'SearchCursor':
+        """
+        Decode an opaque cursor.
+
+        Args:
+            value (str): The cursor returned by a previous page.
+
+        Returns:
+            SearchCursor: The decoded cursor.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+            timestamp, message_id = orjson.loads(raw)
+            return cls(datetime.datetime.fromisoformat(timestamp), UUID(message_id))
+        except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid cursor: {e}') from e
+
+
+class CustomSearchService:
+    """
+    Service for full-text search over the messages of a user's chats.
+
+    Matches come from the GIN index on messages.search_vector and are
+    restricted to the chats the user belongs to. Pages are taken newest first
+    by (timestamp, id) and continued with a keyset cursor, so a later page
+    never re-reads the rows of earlier ones. ts_rank is only computed for the
+    rows of the page, which is then ordered best match first; ordering by the
+    rank itself would score every match of the query on every page.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        """
+        Initialize the CustomSearchService.
+
+        Args:
+            db (AsyncSession): The database session for interacting with the database.
+        """
+        self.db = db
+
+    async def search(
+        self,
+        user_id: UUID,
+        query: str,
+        limit: int,
+        cursor: Optional[SearchCursor] = None,
+        chat_id: Optional[UUID] = None,
+    ) -> SearchPage:
+        """
+        Search the messages of the user's chats.
+
+        Args:
+            user_id (UUID): The user's identifier.
+            query (str): The search query in web search syntax ("quoted phrases", -excluded, or).
+            limit (int): The maximum number of results.
+            cursor (Optional[SearchCursor]): The position to continue from.
+            chat_id (Optional[UUID]): Restrict the search to one chat.
+
+        Returns:
+            SearchPage: The ranked results and the cursor of the next page.
+        """
+        ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), query)
+        user_chats = (
+            select(Chat.id)
+            .join(group_users, group_users.c.group_id == Chat.group_id)
+            .where(group_users.c.user_id == user_id)
+        )
+
+        matches = (
+            select(
+                Message.id, Message.chat_id, Message.sender_id, Message.text, Message.timestamp, Message.seq,
+                Message.search_vector,
+            )
+            .where(Message.search_vector.op('@@')(ts_query), Message.chat_id.in_(user_chats))
+        )
+        if chat_id is not None:
+            matches = matches.where(Message.chat_id == chat_id)
+        if cursor is not None:
+            matches = matches.where(tuple_(Message.timestamp, Message.id) < tuple_(cursor.timestamp, cursor.id))
+        page = matches.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1).subquery()
+
+        # Ranked outside the limited subquery, so only the rows of the page are scored.
+        rank = cast(func.ts_rank(page.c.search_vector, ts_query), REAL).label('rank')
+        stmt = select(
+            page.c.id, page.c.chat_id, page.c.sender_id, page.c.text, page.c.timestamp, page.c.seq, rank,
+        ).order_by(page.c.timestamp.desc(), page.c.id.desc())
+
+        result = await self.db.execute(stmt)
+        rows = result.mappings().all()
+        hits = [SearchHit.model_validate(dict(row)) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit and hits:
+            last = hits[-1]
+            next_cursor = SearchCursor(last.timestamp, last.id).encode()
+        hits.sort(key=lambda hit: hit.rank, reverse=True)
+        return SearchPage(items=hits, next_cursor=next_cursor)
@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+
+from src.core.config import settings
+from src.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCacheStats:
+    """
+    Counters of the verified-token cache and the revocation filter.
+    """
+
+    __slots__ = ('hits', 'misses', 'filter_passes', 'filter_hits', 'revoked')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.filter_passes = 0
+        self.filter_hits = 0
+        self.revoked = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of decoded JWT payloads keyed by the SHA-256 digest of the token.
+
+    An entry lives for at most ttl seconds and never past the token's exp
+    claim, so a cached payload is exactly what jwt.decode would return.
+    Revocation is checked separately on every use.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60) -> None:
+        """
+        Initialize the VerifiedTokenCache.
+
+        Args:
+            max_size (int): The maximum number of cached payloads.
+            ttl (float): How long a payload is trusted without decoding again, in seconds.
+        """
+        if max_size <= 0:
+            raise ValueError('max_size must be greater than 0')
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = TokenCacheStats()
+        self._entries: OrderedDict[bytes, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict[str, Any]]:
+        """
+        Get the payload of a previously verified token.
+
+        Args:
+            token (str): The encoded token.
+
+        Returns:
+            Optional[dict[str, Any]]: The payload, or None if the token has to be decoded.
+        """
+        key = self.digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return payload
+
+    def put(self, token: str, payload: dict[str, Any]) -> None:
+        """
+        Cache the payload of a token that has just been verified.
+
+        Args:
+            token (str): The encoded token.
+            payload (dict[str, Any]): The decoded payload.
+        """
+        expires_at = time.time() + self.ttl
+        if 'exp' in payload:
+            expires_at = min(expires_at, payload['exp'])
+        key = self.digest(token)
+        self._entries[key] = (expires_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        self._entries.pop(self.digest(token), None)
+
+
+class BloomFilter:
+    """
+    Bloom filter of strings sized for an expected capacity and false positive rate.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        """
+        Initialize an empty BloomFilter.
+
+        Args:
+            capacity (int): The expected number of items.
+            error_rate (float): The false positive rate at capacity.
+        """
+        if capacity <= 0:
+            raise ValueError('capacity must be greater than 0')
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Local replica of the revoked token ids as a Bloom filter.
+
+    Revoked ids are kept in a Redis sorted set scored by their expiry and
+    announced on a pub/sub channel, which every node applies to its filter.
+    A filter miss proves that a token is not revoked, so only filter hits
+    need the authoritative Redis lookup. The filter is rebuilt from the
+    sorted set every refresh_interval seconds to drop expired ids and to
+    recover announcements missed while disconnected. Until the first load
+    succeeds every id counts as a hit.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        refresh_interval: float = 300,
+        key: str = 'revoked_jtis',
+        channel: str = 'revoked_jtis',
+    ) -> None:
+        """
+        Initialize the RevocationList.
+
+        Args:
+            redis_client (Redis): The Redis client.
+            capacity (int): The expected number of live revoked ids.
+            error_rate (float): The false positive rate of the filter at capacity.
+            refresh_interval (float): How often the filter is rebuilt from Redis, in seconds.
+            key (str): The Redis sorted set of revoked ids.
+            channel (str): The Redis channel revocations are announced on.
+        """
+        self.redis_client = redis_client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.key = key
+        self.channel = channel
+        self.ready = False
+        self._filter = BloomFilter(capacity, error_rate)
+        self._task: Optional[asyncio.Task] = None
+
+    def might_contain(self, jti: str) -> bool:
+        return not self.ready or jti in self._filter
+
+    def info(self) -> dict:
+        return {
+            'ready': self.ready,
+            'items': self._filter.count,
+            'bits': self._filter.num_bits,
+            'hashes': self._filter.num_hashes,
+        }
+
+    async def start(self) -> None:
+        """
+        Load the revoked ids and start following announcements.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop following announcements.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.ready = False
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        Record a revoked id and announce it to all nodes.
+
+        Args:
+            jti (str): The revoked token id.
+            expires_at (float): When the token expires anyway, as a UNIX timestamp.
+        """
+        self._filter.add(jti)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.key, {jti: expires_at})
+            pipe.publish(self.channel, jti)
+            await pipe.execute()
+
+    async def reload(self) -> None:
+        """
+        Rebuild the filter from the sorted set, dropping expired ids.
+        """
+        now = time.time()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore(self.key, '-inf', now)
+            pipe.zrange(self.key, 0, -1)
+            _, members = await pipe.execute()
+        rebuilt = BloomFilter(max(self.capacity, len(members)), self.error_rate)
+        for member in members:
+            rebuilt.add(member.decode() if isinstance(member, bytes) else member)
+        self._filter = rebuilt
+        self.ready = True
+        logger.debug(f'Loaded {len(members)} revoked token ids')
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                await self.reload()
+                next_reload = loop.time() + self.refresh_interval
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        data = message['data']
+                        self._filter.add(data.decode() if isinstance(data, bytes) else data)
+                    if loop.time() >= next_reload:
+                        await self.reload()
+                        next_reload = loop.time() + self.refresh_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.ready = False
+                logger.error(f'Revocation list sync failed: {e}')
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_size=settings.security.token_cache_size,
+    ttl=settings.security.token_cache_ttl_seconds,
+)
+
+revocation_list = RevocationList(
+    redis_client,
+    capacity=settings.security.revocation_filter_capacity,
+    error_rate=settings.security.revocation_filter_error_rate,
+    refresh_interval=settings.security.revocation_refresh_seconds,
+)
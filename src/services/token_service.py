@@ -7,6 +7,7 @@ from typing import Optional, Any
 import jwt
 
 from src.db.token_storage import AsyncKeyValueStorage
+from src.services.token_cache import RevocationList, VerifiedTokenCache
 from src.schemas.entity import User
 from src.schemas.token import TOKEN_TYPE_FIELD, TokenType, TokenInfo
 
@@ -33,12 +34,12 @@ class TokenManageService(ABC):
         pass
 
     @abstractmethod
-    async def validate_token(self, token: str, token_type: TokenType) -> dict:
+    async def validate_token(self, token: str, token_type: Optional[TokenType] = None) -> dict:
         """
         Validate the given token and return its payload.
 
         :param token: The token to validate.
-        :param token_type: The type of the token.
+        :param token_type: The expected type of the token, any type if omitted.
         :return: The decoded token payload as a dictionary.
         """
         pass
@@ -65,6 +66,8 @@ class JWTManageService(TokenManageService):
         algorithm: str,
         access_token_expire_minutes: int,
         refresh_token_expire_days: int,
+        token_cache: Optional[VerifiedTokenCache] = None,
+        revocation_list: Optional[RevocationList] = None,
     ):
         """
         Initialize the JWTManageService.
@@ -75,10 +78,16 @@ class JWTManageService(TokenManageService):
             algorithm (str): The algorithm to use for encoding tokens.
             access_token_expire_minutes (int): The expiration time for access tokens in minutes.
             refresh_token_expire_days (int): The expiration time for refresh tokens in days.
+            token_cache (Optional[VerifiedTokenCache]): The cache of verified payloads.
+                Every token is decoded if omitted.
+            revocation_list (Optional[RevocationList]): The local filter of revoked token ids.
+                Every token is looked up in the storage if omitted.
         """
         if storage is None:
             raise ValueError('Storage cannot be None')
         self.storage = storage
+        self.token_cache = token_cache
+        self.revocation_list = revocation_list
         self._secret = secret
         self._algorithm = algorithm
         self._access_token_expire_minutes = access_token_expire_minutes
@@ -282,7 +291,10 @@ class JWTManageService(TokenManageService):
             str: The created refresh token.
         """
         try:
-            jwt_payload = {'sub': str(user.id)}
+            jwt_payload = {
+                'sub': str(user.id),
+                'jti': str(uuid.uuid4()),
+            }
             try:
                 refresh_token = self.create_token(
                     token_type=TokenType.REFRESH,
@@ -349,22 +361,30 @@ class JWTManageService(TokenManageService):
             logger.error(f"Failed to decode JWT: {e}")
             raise
 
-    async def validate_token(self, token: str, token_type: TokenType) -> dict:
+    async def validate_token(self, token: str, token_type: Optional[TokenType] = None) -> dict:
         """
         Validate the given token and return its payload.
 
+        The signature is verified once per token and cache TTL. Revocation is
+        checked on every call, in the local filter first and in the storage
+        only on a filter hit.
+
         Args:
             token (str): The token to validate.
-            token_type (TokenType): The type of the token.
+            token_type (Optional[TokenType]): The expected type of the token, any type if omitted.
 
         Returns:
             dict: The decoded token payload.
         """
         try:
-            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
-            if payload.get(TOKEN_TYPE_FIELD) != token_type:
+            payload = self.token_cache.get(token) if self.token_cache is not None else None
+            if payload is None:
+                payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+                if self.token_cache is not None:
+                    self.token_cache.put(token, payload)
+            if token_type is not None and payload.get(TOKEN_TYPE_FIELD) != token_type:
                 raise jwt.InvalidTokenError('Invalid token type')
-            if await self.storage.is_token_blacklisted(token):
+            if await self.is_token_revoked(payload.get('jti') or token):
                 raise jwt.InvalidTokenError('Token has been revoked')
             return payload
         except jwt.ExpiredSignatureError:
@@ -376,3 +396,47 @@ class JWTManageService(TokenManageService):
         except Exception as e:
             logger.error(f"Failed to validate token: {e}")
             raise
+
+    async def is_token_revoked(self, jti: str) -> bool:
+        """
+        Check whether a token id has been revoked.
+
+        Args:
+            jti (str): The token id, or the whole token if it has no id.
+
+        Returns:
+            bool: True if the token has been revoked.
+        """
+        if self.revocation_list is None:
+            return await self.storage.is_token_blacklisted(jti)
+        if not self.revocation_list.might_contain(jti):
+            if self.token_cache is not None:
+                self.token_cache.stats.filter_passes += 1
+            return False
+        if self.token_cache is not None:
+            self.token_cache.stats.filter_hits += 1
+        return await self.storage.is_token_blacklisted(jti)
+
+    async def revoke_token(self, token: str) -> None:
+        """
+        Revoke the given token until it expires.
+
+        Args:
+            token (str): The token to revoke.
+        """
+        try:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except jwt.ExpiredSignatureError:
+            return
+        except jwt.InvalidTokenError as e:
+            logger.error(f"Invalid token: {e}")
+            raise e
+
+        jti = payload.get('jti') or token
+        expire = max(1, int(payload['exp'] - datetime.datetime.now(datetime.UTC).timestamp()))
+        await self.storage.blacklist_token(jti, expire)
+        if self.revocation_list is not None:
+            await self.revocation_list.revoke(jti, payload['exp'])
+        if self.token_cache is not None:
+            self.token_cache.discard(token)
+            self.token_cache.stats.revoked += 1
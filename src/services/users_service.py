@@ -1,5 +1,4 @@
 import logging
-import bcrypt
 
 from uuid import UUID
 from sqlalchemy.future import select
@@ -9,6 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.encoders import jsonable_encoder
 from fastapi import HTTPException, status
 
+from src.services.password_hasher import PasswordHasherOverloaded, password_hasher
+
 
 class CustomUserService:
     """
@@ -25,38 +26,51 @@ class CustomUserService:
         self.db = db
 
     @staticmethod
-    def get_password_hash(password: str) -> str:
+    async def get_password_hash(password: str) -> str:
         """
-        Generate a hashed password using bcrypt.
+        Generate a hashed password using bcrypt in the hashing pool.
 
         Args:
             password (str): The plain text password to hash.
 
+        Raises:
+            HTTPException: If the hashing pool is saturated.
+
         Returns:
             str: The hashed password.
         """
-        pwd_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
-        pwd_hash = bcrypt.hashpw(password=pwd_bytes, salt=salt).decode('utf-8')
-        return pwd_hash
+        try:
+            return await password_hasher.hash(password)
+        except PasswordHasherOverloaded as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={'Retry-After': '1'},
+            )
 
     @staticmethod
-    def verify_password(hashed_password: str, provided_password: str) -> bool:
+    async def verify_password(hashed_password: str, provided_password: str) -> bool:
         """
-        Verify a provided password against a hashed password.
+        Verify a provided password against a hashed password in the hashing pool.
 
         Args:
             hashed_password (str): The hashed password to verify against.
             provided_password (str): The plain text password to verify.
 
+        Raises:
+            HTTPException: If the hashing pool is saturated.
+
         Returns:
             bool: True if the password matches, False otherwise.
         """
-        pwd_bytes = provided_password.encode('utf-8')
-        return bcrypt.checkpw(
-            password=pwd_bytes,
-            hashed_password=hashed_password.encode('utf-8'),
-        )
+        try:
+            return await password_hasher.verify(hashed_password, provided_password)
+        except PasswordHasherOverloaded as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={'Retry-After': '1'},
+            )
 
     async def get_user(
         self,
@@ -109,7 +123,7 @@ class CustomUserService:
         """
         user_dto = jsonable_encoder(new_user)
         user_dto.update(
-            password=self.get_password_hash(new_user.password),
+            password=await self.get_password_hash(new_user.password),
         )
         user = User(**user_dto)
         self.db.add(user)
@@ -1,126 +1,300 @@
 import logging
 from uuid import UUID
 from fastapi import Depends
-from fastapi.encoders import jsonable_encoder
 from typing import Annotated
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from src.models.entity import User, Group, Chat, Message
+from sqlalchemy.orm import selectinload
+from src.models.entity import User, Group, Chat
 
-from schemas.entity import MessageCreate
-from src.db.postgres import get_session
-from src.schemas.entity import GroupCreate, ChatCreate
+from src.core.config import settings
+from src.core.metrics import registry
+from src.db.postgres import async_session, get_session
+from src.db.redis import redis_client
+from src.schemas.actions import (
+    AddUserToGroupPayload, CreateGroupChatPayload, CreatePersonalChatPayload, EmptyPayload, MarkReadPayload,
+    NewMessagePayload, PresenceQueryPayload, ResumePayload, SetPresencePayload,
+)
+from src.services.read_state_service import CustomReadStateService
 
+from src.managers.broker import InMemoryBroker, MessageBroker, RedisBroker
+from src.managers.rate_limit import SlidingWindowLimiter
 from src.managers.websocket_manager import WebSocketConnectionManager
+from src.services.bootstrap_service import BootstrapCache, CustomBootstrapService
+from src.services.history_cache import HotHistoryCache
+from src.services.history_service import CustomHistoryService
+from src.services.message_writer import message_writer
+from src.services.presence import PresenceService, PresenceState
 
 logger = logging.getLogger(__name__)
 
-websocket_manager = WebSocketConnectionManager()
+
+def create_broker() -> MessageBroker:
+    if settings.broker.backend == 'redis':
+        return RedisBroker(redis_client)
+    return InMemoryBroker()
+
+
+websocket_manager = WebSocketConnectionManager(
+    broker=create_broker(),
+    channel_prefix=settings.broker.channel_prefix,
+    send_queue_size=settings.websocket.send_queue_size,
+    overflow_policy=settings.websocket.overflow_policy,
+    connection_rate_limits=settings.rate_limit.connection_limits,
+)
+
+user_rate_limiter = SlidingWindowLimiter(redis_client, settings.rate_limit.user_limits)
+
+history_cache = HotHistoryCache(
+    max_messages_per_chat=settings.history_cache.max_messages_per_chat,
+    max_bytes=settings.history_cache.max_bytes,
+    is_live=websocket_manager.chat_index.__contains__,
+    redis_client=redis_client if settings.history_cache.redis_enabled else None,
+    redis_ttl=settings.history_cache.redis_ttl_seconds,
+)
+
+presence_service = PresenceService(
+    redis_client,
+    websocket_manager,
+    ttl=settings.presence.ttl_seconds,
+    heartbeat_interval=settings.presence.heartbeat_seconds,
+    flush_interval=settings.presence.flush_interval_ms / 1000,
+)
+
+bootstrap_cache = BootstrapCache(
+    ttl=settings.bootstrap.cache_ttl_seconds,
+    max_size=settings.bootstrap.cache_max_size,
+    max_concurrency=settings.bootstrap.max_concurrency,
+)
+
+
+async def cache_remote_message(chat_id: UUID, frame: dict) -> None:
+    if frame.get('type') == 'new_message':
+        await history_cache.append(chat_id, frame['payload'], write_redis=False)
+
+
+registry.callback(
+    'chat_ws_connections', 'Open WebSocket connections on this node.', 'gauge',
+    lambda: sum(map(len, websocket_manager.active_connections.values())),
+)
+registry.callback(
+    'chat_ws_users', 'Users with at least one WebSocket on this node.', 'gauge',
+    lambda: len(websocket_manager.active_connections),
+)
+registry.callback(
+    'chat_ws_frames_sent_total', 'WebSocket frames written to clients.', 'counter',
+    lambda: websocket_manager.send_stats.sent,
+)
+registry.callback(
+    'chat_ws_frames_dropped_total', 'Outbound WebSocket frames dropped by the overflow policy.', 'counter',
+    lambda: websocket_manager.send_stats.dropped,
+)
+
+websocket_manager.chat_message_listeners.append(cache_remote_message)
+websocket_manager.chat_release_listeners.append(history_cache.release)
+websocket_manager.broker_gap_listeners.append(history_cache.clear)
+
+
+async def load_bootstrap(user_id: UUID) -> dict:
+    """
+    Get the user's bootstrap payload, shared by their sockets for a short while.
+
+    Args:
+        user_id (UUID): The user's identifier.
+
+    Returns:
+        dict: The chats with their last message, unread count and members.
+    """
+    async def load() -> dict:
+        async with async_session() as db:
+            return await CustomBootstrapService(db).load(user_id, settings.bootstrap.member_preview)
+
+    return await bootstrap_cache.get(user_id, load)
 
 
 @websocket_manager.handler('user_connected')
 async def user_connected(
+    payload: EmptyPayload,
     user_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
 ):
-    stmp = select(Group.id, Group.title).where(Group.users.any(id=user_id))
-    res = await db.execute(stmp)
-    groups = res.scalars().all()
-    message = ','.join([item.title for item in groups])
-    await websocket_manager.send_message(user_id=user_id, message=message)
+    return await load_bootstrap(user_id)
 
 
 @websocket_manager.handler('new_message')
 async def new_message(
-    chat_id: UUID,
-    sender_id: UUID,
-    text: str,
+    payload: NewMessagePayload,
+    user_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
 ):
-    try:
-        message = MessageCreate(chat_id=chat_id, sender_id=sender_id, text=text)
-        message_dto = jsonable_encoder(message.model_dump())
-        message = Message(**message_dto)
+    chat_id = payload.chat_id
+    if payload.sender_id is not None and payload.sender_id != user_id:
+        raise ValueError('sender_id does not match the connected user')
+    if not websocket_manager.chat_index.is_member(user_id, chat_id):
+        raise ValueError(f'User {user_id} is not a member of chat {chat_id}')
 
-        db.add(message)
-        await db.commit()
+    try:
+        stored = await message_writer.write(chat_id, user_id, payload.text)
 
     except Exception as e:
         raise ValueError(f'Error creating message. {e}')
-    logger.info(f'New message created {new_message=}')
+    logger.debug(f"New message created {stored['id']=}")
+
+    await websocket_manager.send_chat_message(chat_id, {'type': 'new_message', 'payload': stored})
+    await history_cache.append(chat_id, stored)
+    return stored
+
+
+@websocket_manager.handler('mark_read')
+async def mark_read(
+    payload: MarkReadPayload,
+    user_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+):
+    chat_id = payload.chat_id
+    if not websocket_manager.chat_index.is_member(user_id, chat_id):
+        raise ValueError(f'User {user_id} is not a member of chat {chat_id}')
+    state = await CustomReadStateService(db).mark_read(user_id, chat_id, payload.message_id, payload.seq)
+    bootstrap_cache.invalidate(user_id)
+    await websocket_manager.send_message(user_id, {'type': 'read', 'payload': state}, coalesce_key=f'read:{chat_id}')
+    return state
+
+
+@websocket_manager.handler('resume')
+async def resume(
+    payload: ResumePayload,
+    user_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+):
+    for chat_id in payload.chats:
+        if not websocket_manager.chat_index.is_member(user_id, chat_id):
+            raise ValueError(f'User {user_id} is not a member of chat {chat_id}')
+    replays = await CustomHistoryService(db, history_cache).get_missed(
+        payload.chats, settings.websocket.resume_max_messages,
+    )
+    return {'chats': [replay.model_dump() for replay in replays]}
+
+
+@websocket_manager.handler('unread_counts')
+async def unread_counts(
+    payload: EmptyPayload,
+    user_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+):
+    counts = await CustomReadStateService(db).unread_counts(user_id)
+    return {str(chat_id): unread for chat_id, unread in counts.items()}
+
+
+@websocket_manager.handler('set_presence')
+async def set_presence(
+    payload: SetPresencePayload,
+    user_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+):
+    presence_service.set_state(user_id, PresenceState(payload.state))
+    return {'state': payload.state}
+
+
+@websocket_manager.handler('presence')
+async def presence(
+    payload: PresenceQueryPayload,
+    user_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_session)],
+):
+    if len(payload.user_ids) > settings.presence.max_query_users:
+        raise ValueError(f'At most {settings.presence.max_query_users} users per presence query')
+    states = await presence_service.get_many(payload.user_ids)
+    return {str(item): state.value for item, state in states.items()}
 
 
 @websocket_manager.handler('add_user_to_group')
 async def add_user_to_group(
-    group_id: UUID,
+    payload: AddUserToGroupPayload,
     user_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
 ):
+    group_id = payload.group_id
+    member_id = payload.member_id or user_id
     async with (db.begin()):
 
-        stmt = select(Group).where(Group.id == user_id)
+        stmt = select(Group).where(Group.id == group_id).options(selectinload(Group.users))
         res = await db.execute(stmt)
         group = res.scalar_one_or_none()
         if not group:
             raise ValueError(f'Group with id {group_id} not found')
+        # Only the creator or a member of the group may add someone else to it.
+        if member_id != user_id and user_id != group.creator_id and all(
+            member.id != user_id for member in group.users
+        ):
+            raise ValueError(f'User {user_id} may not add members to group {group_id}')
 
-        stmt = select(User).where(User.id == user_id)
+        stmt = select(User).where(User.id == member_id)
         res = await db.execute(stmt)
         user = res.scalar_one_or_none()
         if not user:
-            raise ValueError(f'User with id {user_id} not found')
+            raise ValueError(f'User with id {member_id} not found')
 
         if user in group.users:
-            raise ValueError(f'User {user_id} already in group {group_id}')
+            raise ValueError(f'User {member_id} already in group {group_id}')
 
         group.users.append(user)
-        await db.commit()
-        logger.info(f'{user_id=} added to group {group_id=} ')
+        stmt = select(Chat.id).where(Chat.group_id == group_id)
+        res = await db.execute(stmt)
+        chat_ids = res.scalars().all()
+        logger.info(f'{member_id=} added to group {group_id=} ')
+
+    bootstrap_cache.invalidate(member_id)
+    for chat_id in chat_ids:
+        await websocket_manager.add_to_chat(member_id, chat_id)
+    return {'group_id': group_id, 'member_id': member_id, 'chat_ids': list(chat_ids)}
 
 
 @websocket_manager.handler('create_group_chat')
 async def create_group_chat(
-    chat_title: str,
-    group_title: str,
-    creator_id: UUID,
+    payload: CreateGroupChatPayload,
+    user_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
 ):
-    logger.info(f'Creating group chat {chat_title} {group_title}')
+    chat_title = payload.chat_title
+    if payload.creator_id is not None and payload.creator_id != user_id:
+        raise ValueError('creator_id does not match the connected user')
+    creator_id = user_id
+    logger.info(f'Creating group chat {chat_title} {payload.group_title}')
     try:
         async with db.begin():
             stmt = select(User).where(User.id == creator_id)
             res = await db.execute(stmt)
             user = res.scalar_one_or_none()
 
-            group_dto = jsonable_encoder(GroupCreate(title=group_title, creator_id=creator_id).model_dump())
-            new_group = Group(**group_dto)
+            new_group = Group(title=payload.group_title, creator_id=creator_id)
             db.add(new_group)
             new_group.users.append(user)
             await db.flush()
 
-            chat_dto = jsonable_encoder(
-                ChatCreate(
-                    title=chat_title,
-                    chat_type='group',
-                    group_id=new_group.id,
-                ).model_dump(),
-            )
-            new_chat = Chat(**chat_dto)
+            new_chat = Chat(title=chat_title, chat_type='group', group_id=new_group.id)
             db.add(new_chat)
-            await db.commit()
+            await db.flush()
 
     except Exception as e:
         logger.error(f'An error occurred while creating chat with title {chat_title}. {e}')
         raise ValueError(f'An error occurred while creating chat with title {chat_title}. {e}')
 
+    bootstrap_cache.invalidate(creator_id)
+    await websocket_manager.add_to_chat(creator_id, new_chat.id)
+    return {'chat_id': new_chat.id, 'group_id': new_group.id}
+
 
 @websocket_manager.handler('create_personal_chat')
 async def create_personal_chat(
-    creator_id: UUID,
-    other_user_id: UUID,
+    payload: CreatePersonalChatPayload,
+    user_id: UUID,
     db: Annotated[AsyncSession, Depends(get_session)],
 ):
+    other_user_id = payload.other_user_id
+    if payload.creator_id is not None and payload.creator_id != user_id:
+        raise ValueError('creator_id does not match the connected user')
+    creator_id = user_id
     logger.info(f'Creating personal chat {creator_id} {other_user_id}')
     try:
         async with db.begin():
@@ -143,18 +317,21 @@ async def create_personal_chat(
             db.add(new_group)
             await db.flush()
 
-            chat_dto = jsonable_encoder(
-                ChatCreate(
-                    title=f'Chat between {user.name} and {other_user.name}',
-                    chat_type='personal',
-                    group_id=new_group.id,
-                ).model_dump(),
+            new_chat = Chat(
+                title=f'Chat between {user.name} and {other_user.name}',
+                chat_type='personal',
+                group_id=new_group.id,
             )
-            new_chat = Chat(**chat_dto)
             db.add(new_chat)
-            await db.commit()
+            await db.flush()
     except Exception as e:
         logger.error(f'An error occurred while creating personal chat with user_id '
                      f'{creator_id} and other_user_id {other_user_id} {e}')
         raise ValueError(f'An error occurred while creating personal chat with user_id '
                          f'{creator_id} and other_user_id {other_user_id} {e}')
+
+    bootstrap_cache.invalidate(creator_id)
+    bootstrap_cache.invalidate(other_user_id)
+    await websocket_manager.add_to_chat(creator_id, new_chat.id)
+    await websocket_manager.add_to_chat(other_user_id, new_chat.id)
+    return {'chat_id': new_chat.id, 'group_id': new_group.id}
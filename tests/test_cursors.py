@@ -0,0 +1,57 @@
+import base64
+import datetime
+import string
+import unittest
+import uuid
+
+from src.services.history_service import CursorDirection, HistoryCursor
+from src.services.search_service import SearchCursor
+
+URL_SAFE = set(string.ascii_letters + string.digits + '-_')
+TIMESTAMP = datetime.datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=datetime.UTC)
+
+INVALID = [
+    '',
+    '***',
+    base64.urlsafe_b64encode(b'{"a": 1}').decode('ascii'),
+    base64.urlsafe_b64encode(b'["before", "yesterday", "x"]').decode('ascii'),
+]
+
+
+class HistoryCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        for direction in CursorDirection:
+            cursor = HistoryCursor(direction, TIMESTAMP, uuid.uuid4())
+            self.assertEqual(HistoryCursor.decode(cursor.encode()), cursor)
+
+    def test_encoded_cursor_is_url_safe(self):
+        value = HistoryCursor(CursorDirection.BEFORE, TIMESTAMP, uuid.uuid4()).encode()
+        self.assertTrue(set(value) <= URL_SAFE, value)
+
+    def test_invalid_cursor(self):
+        unknown_direction = base64.urlsafe_b64encode(
+            f'["sideways", "{TIMESTAMP.isoformat()}", "{uuid.uuid4()}"]'.encode(),
+        ).decode('ascii')
+        for value in [*INVALID, unknown_direction]:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                HistoryCursor.decode(value)
+
+
+class SearchCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        cursor = SearchCursor(TIMESTAMP, uuid.uuid4())
+        self.assertEqual(SearchCursor.decode(cursor.encode()), cursor)
+
+    def test_history_cursor_is_not_a_search_cursor(self):
+        value = HistoryCursor(CursorDirection.AFTER, TIMESTAMP, uuid.uuid4()).encode()
+        with self.assertRaises(ValueError):
+            SearchCursor.decode(value)
+
+    def test_invalid_cursor(self):
+        for value in INVALID:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                SearchCursor.decode(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
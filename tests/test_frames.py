@@ -0,0 +1,72 @@
+import unittest
+import uuid
+
+import orjson
+
+from src.managers.codecs import FrameDecodeError, json_codec
+from src.managers.websocket_manager import WebSocketConnectionManager
+from src.schemas.actions import EmptyPayload, NewMessagePayload
+
+
+def make_manager() -> WebSocketConnectionManager:
+    manager = WebSocketConnectionManager()
+
+    @manager.handler('new_message')
+    async def new_message(payload: NewMessagePayload, user_id: uuid.UUID, db=None):
+        pass
+
+    @manager.handler('user_connected')
+    async def user_connected(payload: EmptyPayload, user_id: uuid.UUID, db=None):
+        pass
+
+    return manager
+
+
+class DecodeFrameTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.manager = make_manager()
+
+    def decode_error(self, frame) -> FrameDecodeError:
+        raw = frame if isinstance(frame, (str, bytes)) else orjson.dumps(frame)
+        with self.assertRaises(FrameDecodeError) as context:
+            self.manager.decode_frame(raw, json_codec)
+        return context.exception
+
+    def test_valid_frame(self):
+        chat_id = uuid.uuid4()
+        action, payload = self.manager.decode_frame(
+            orjson.dumps({'type': 'new_message', 'payload': {'chat_id': str(chat_id), 'text': 'hello'}}), json_codec,
+        )
+        self.assertEqual(action, 'new_message')
+        self.assertIsInstance(payload, NewMessagePayload)
+        self.assertEqual(payload.chat_id, chat_id)
+        self.assertEqual(payload.text, 'hello')
+
+    def test_frame_without_payload(self):
+        action, payload = self.manager.decode_frame('{"type": "user_connected"}', json_codec)
+        self.assertEqual(action, 'user_connected')
+        self.assertIsInstance(payload, EmptyPayload)
+
+    def test_malformed_frame(self):
+        self.assertEqual(str(self.decode_error(b'{not json')), 'Wrong message format')
+        self.assertEqual(str(self.decode_error(b'[1, 2]')), 'Wrong message format')
+
+    def test_frame_without_type(self):
+        error = self.decode_error({'payload': {}})
+        self.assertEqual(str(error), 'No type in message')
+        self.assertIsNone(error.action)
+
+    def test_unknown_action(self):
+        error = self.decode_error({'type': 'drop_tables', 'payload': {}})
+        self.assertEqual(str(error), 'No handler for this action')
+        self.assertEqual(error.action, 'drop_tables')
+
+    def test_invalid_payload(self):
+        error = self.decode_error({'type': 'new_message', 'payload': {'chat_id': 'not a uuid'}})
+        self.assertEqual(str(error), 'Invalid payload')
+        self.assertEqual(error.action, 'new_message')
+        self.assertEqual({tuple(detail['loc']) for detail in error.details}, {('chat_id',), ('text',)})
+
+
+if __name__ == '__main__':
+    unittest.main()
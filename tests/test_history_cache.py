@@ -0,0 +1,136 @@
+import datetime
+import unittest
+import uuid
+
+import orjson
+
+from src.services.history_cache import HotHistoryCache, _entry_key
+
+START = datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC)
+
+
+def make_message(chat_id: uuid.UUID, seq: int) -> dict:
+    return {
+        'id': str(uuid.uuid4()),
+        'chat_id': str(chat_id),
+        'sender_id': str(uuid.uuid4()),
+        'text': f'message {seq}',
+        'timestamp': (START + datetime.timedelta(seconds=seq)).isoformat(),
+        'seq': seq,
+    }
+
+
+class FakeRedis:
+    """
+    The list commands of the Redis tier, kept in memory.
+    """
+
+    def __init__(self) -> None:
+        self.lists: dict[str, list[bytes]] = {}
+
+    async def lrange(self, key: str, start: int, end: int) -> list[bytes]:
+        return list(self.lists.get(key, []))
+
+
+class HotHistoryCacheWindowTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.chat_id = uuid.uuid4()
+        self.cache = HotHistoryCache(max_messages_per_chat=100)
+
+    async def fill(self, seqs) -> dict[int, dict]:
+        messages = {}
+        for seq in seqs:
+            messages[seq] = make_message(self.chat_id, seq)
+            await self.cache.append(self.chat_id, messages[seq])
+        return messages
+
+    async def test_newest_page_is_served_newest_first(self):
+        await self.fill(range(1, 21))
+        page = await self.cache.get_page(self.chat_id, 5)
+        self.assertIsNotNone(page)
+        messages, has_older = page
+        self.assertEqual([message['seq'] for message in messages], [20, 19, 18, 17, 16])
+        self.assertTrue(has_older)
+
+    async def test_page_before_anchor(self):
+        messages = await self.fill(range(1, 21))
+        page = await self.cache.get_page(self.chat_id, 5, before=_entry_key(messages[10]))
+        self.assertEqual([message['seq'] for message in page[0]], [9, 8, 7, 6, 5])
+
+    async def test_gap_inside_window_is_a_miss(self):
+        await self.fill([seq for seq in range(1, 21) if seq != 18])
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 5))
+        self.assertEqual(self.cache.stats.misses, 1)
+
+    async def test_gap_next_to_anchor_is_a_miss(self):
+        messages = await self.fill([seq for seq in range(1, 61) if seq != 51])
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 10, before=_entry_key(messages[52])))
+
+    async def test_gap_before_window_is_a_miss(self):
+        messages = await self.fill([seq for seq in range(1, 21) if seq != 10])
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 5, before=_entry_key(messages[16])))
+
+    async def test_window_away_from_gap_is_served(self):
+        messages = await self.fill([seq for seq in range(1, 21) if seq != 3])
+        page = await self.cache.get_page(self.chat_id, 5, before=_entry_key(messages[15]))
+        self.assertEqual([message['seq'] for message in page[0]], [14, 13, 12, 11, 10])
+
+    async def test_complete_chat_missing_its_first_message_is_a_miss(self):
+        messages = [make_message(self.chat_id, seq) for seq in range(2, 6)]
+        self.cache.fill(self.chat_id, messages, complete=True)
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 10))
+
+    async def test_complete_chat_is_served_past_its_oldest_message(self):
+        messages = [make_message(self.chat_id, seq) for seq in range(1, 6)]
+        self.cache.fill(self.chat_id, messages, complete=True)
+        messages, has_older = await self.cache.get_page(self.chat_id, 10)
+        self.assertEqual(len(messages), 5)
+        self.assertFalse(has_older)
+
+    async def test_released_and_cleared_chats_are_misses(self):
+        await self.fill(range(1, 11))
+        self.cache.release(self.chat_id)
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 5))
+        await self.fill(range(11, 21))
+        self.cache.clear()
+        self.assertEqual(self.cache.size, 0)
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 5))
+
+    async def test_chat_not_live_is_a_miss(self):
+        cache = HotHistoryCache(is_live=lambda chat_id: False)
+        await cache.append(self.chat_id, make_message(self.chat_id, 1), write_redis=False)
+        self.assertIsNone(await cache.get_page(self.chat_id, 1))
+
+    async def test_get_since_needs_every_newer_message(self):
+        await self.fill([seq for seq in range(1, 21) if seq != 15])
+        self.assertEqual(
+            [message['seq'] for message in await self.cache.get_since(self.chat_id, 15)], [16, 17, 18, 19, 20],
+        )
+        self.assertIsNone(await self.cache.get_since(self.chat_id, 10))
+
+
+class HotHistoryCacheRedisTierTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.chat_id = uuid.uuid4()
+        self.redis = FakeRedis()
+        self.cache = HotHistoryCache(is_live=lambda chat_id: False, redis_client=self.redis)
+
+    def store(self, seqs) -> dict[int, dict]:
+        messages = {seq: make_message(self.chat_id, seq) for seq in seqs}
+        self.redis.lists[self.cache.redis_key(self.chat_id)] = [orjson.dumps(message) for message in messages.values()]
+        return messages
+
+    async def test_contiguous_window_is_served(self):
+        self.store(range(1, 21))
+        messages, _ = await self.cache.get_page(self.chat_id, 5)
+        self.assertEqual([message['seq'] for message in messages], [20, 19, 18, 17, 16])
+        self.assertEqual(self.cache.stats.redis_hits, 1)
+
+    async def test_gap_next_to_anchor_is_a_miss(self):
+        messages = self.store([seq for seq in range(1, 61) if seq != 51])
+        self.assertIsNone(await self.cache.get_page(self.chat_id, 10, before=_entry_key(messages[52])))
+        self.assertEqual(self.cache.stats.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+import uuid
+
+from src.services.message_writer import MessageBatchWriter
+
+
+class RecordingWriter(MessageBatchWriter):
+    """
+    A writer that stores batches in memory instead of the database.
+    """
+
+    def __init__(self, fail: bool = False, **kwargs) -> None:
+        super().__init__(session_factory=None, **kwargs)
+        self.fail = fail
+        self.flushed: list[dict] = []
+
+    async def _flush(self, batch) -> None:
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError('database is gone')
+        for seq, (row, future) in enumerate(batch, start=len(self.flushed) + 1):
+            row['seq'] = seq
+            self.flushed.append(row)
+            future.set_result(None)
+
+
+class MessageBatchWriterStopTest(unittest.IsolatedAsyncioTestCase):
+    async def write_many(self, writer: MessageBatchWriter, count: int) -> list[asyncio.Task]:
+        chat_id = uuid.uuid4()
+        tasks = [asyncio.create_task(writer.write(chat_id, uuid.uuid4(), f'message {i}')) for i in range(count)]
+        await asyncio.sleep(0)
+        return tasks
+
+    async def test_stop_flushes_queued_messages(self):
+        writer = RecordingWriter(max_batch_size=3, max_delay_ms=50)
+        await writer.start()
+        tasks = await self.write_many(writer, 10)
+        await writer.stop()
+        rows = await asyncio.gather(*tasks)
+        self.assertEqual(len(writer.flushed), 10)
+        self.assertEqual([row['seq'] for row in rows], list(range(1, 11)))
+
+    async def test_stop_flushes_writers_waiting_for_room(self):
+        writer = RecordingWriter(max_batch_size=2, max_delay_ms=50, max_pending=2)
+        await writer.start()
+        tasks = await self.write_many(writer, 8)
+        await writer.stop()
+        await asyncio.gather(*tasks)
+        self.assertEqual(len(writer.flushed), 8)
+        self.assertEqual(writer.pending, 0)
+
+    async def test_stop_fails_messages_of_a_broken_flush(self):
+        writer = RecordingWriter(fail=True, max_batch_size=5, max_delay_ms=50)
+        await writer.start()
+        tasks = await self.write_many(writer, 3)
+        with self.assertRaises(RuntimeError):
+            await writer.stop()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(writer.flushed, [])
+
+    async def test_write_needs_a_started_writer(self):
+        writer = RecordingWriter()
+        with self.assertRaises(RuntimeError):
+            await writer.write(uuid.uuid4(), uuid.uuid4(), 'hello')
+        await writer.start()
+        await writer.stop()
+        with self.assertRaises(RuntimeError):
+            await writer.write(uuid.uuid4(), uuid.uuid4(), 'hello')
+
+
+if __name__ == '__main__':
+    unittest.main()